@@ -0,0 +1,131 @@
+"""
+Side-by-side latency/accuracy comparison of YOLO inference backends.
+Runs offline on sample images (ultralytics' bundled assets by default) and
+compares every backend's detections against the PyTorch (ultralytics) path.
+
+Usage:
+    python benchmark_backends.py
+    python benchmark_backends.py --backends ultralytics onnxruntime opencv-dnn --runs 20
+    python benchmark_backends.py --images ./my_frames --model yolov8n.onnx
+    python benchmark_backends.py --backends onnxruntime-int8 --calib-dir ./camera_frames
+"""
+import argparse
+import time
+import numpy as np
+import cv2
+
+from detect import COCO_CLASSES, box_iou
+from yolo_backends import BACKENDS, load_backend, sample_images
+
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """
+    Greedily match candidate detections to reference detections of the same class.
+
+    Returns:
+        tuple: (number of matches, list of matched IoUs)
+    """
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0, []
+
+    ious = box_iou(reference.xyxy, candidate.xyxy)
+    ious[reference.cls[:, None] != candidate.cls[None, :]] = 0
+
+    matched_ious = []
+    for ref_index in np.argsort(-reference.conf):
+        cand_index = int(np.argmax(ious[ref_index]))
+        if ious[ref_index, cand_index] >= iou_threshold:
+            matched_ious.append(float(ious[ref_index, cand_index]))
+            ious[:, cand_index] = 0
+    return len(matched_ious), matched_ious
+
+
+def benchmark_backend(backend, images, runs, confidence):
+    """
+    Time a backend on every image.
+
+    Returns:
+        tuple: (list of latencies in ms, list of BackendResult per image)
+    """
+    # Warm up so one-time graph/kernel setup isn't counted
+    backend.predict(images[0], conf=confidence)
+
+    latencies = []
+    results = []
+    for image in images:
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = backend.predict(image, conf=confidence)
+            latencies.append((time.perf_counter() - start) * 1000)
+        results.append(result)
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare YOLO inference backends")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--images", default=None, help="Image directory (default: ultralytics sample images)")
+    parser.add_argument("--model", default=None, help="ONNX graph for the ONNX-based backends")
+    parser.add_argument("--calib-dir", default=None,
+                        help="Representative frames (50+) to calibrate int8 quantization "
+                             "(default: $AURA_YOLO_CALIB_DIR, else the sample images)")
+    parser.add_argument("--runs", type=int, default=10, help="Timed runs per image")
+    parser.add_argument("--conf", type=float, default=0.25)
+    args = parser.parse_args()
+
+    paths = sample_images(args.images)
+    if not paths:
+        raise SystemExit("No sample images found. Pass --images DIR.")
+    images = [cv2.imread(path) for path in paths]
+    print(f"Benchmarking on {len(images)} images x {args.runs} runs")
+
+    reference = None
+    if "ultralytics" in args.backends:
+        backend_names = ["ultralytics"] + [name for name in args.backends if name != "ultralytics"]
+    else:
+        backend_names = args.backends
+        print("Note: ultralytics not selected, accuracy columns compare against the first backend")
+
+    rows = []
+    for name in backend_names:
+        model_path = args.model if name != "ultralytics" else None
+        try:
+            start = time.perf_counter()
+            backend = load_backend(name, model_path, class_names=COCO_CLASSES, calibration_dir=args.calib_dir)
+            load_ms = (time.perf_counter() - start) * 1000
+        except (ImportError, FileNotFoundError) as e:
+            print(f"  Skipping {name}: {e}")
+            continue
+
+        latencies, results = benchmark_backend(backend, images, args.runs, args.conf)
+        if reference is None:
+            reference = results
+
+        matched = ref_total = cand_total = 0
+        all_ious = []
+        for ref, cand in zip(reference, results):
+            count, ious = match_detections(ref, cand)
+            matched += count
+            ref_total += len(ref)
+            cand_total += len(cand)
+            all_ious.extend(ious)
+
+        rows.append({
+            "backend": name,
+            "load_ms": load_ms,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "recall": matched / ref_total if ref_total else 1.0,
+            "precision": matched / cand_total if cand_total else 1.0,
+            "mean_iou": float(np.mean(all_ious)) if all_ious else 0.0,
+            "detections": cand_total,
+        })
+
+    print(f"\n{'backend':<18}{'load ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'recall':>9}{'precision':>11}{'mIoU':>8}{'dets':>7}")
+    for row in rows:
+        print(f"{row['backend']:<18}{row['load_ms']:>10.0f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+              f"{row['recall']:>9.2f}{row['precision']:>11.2f}{row['mean_iou']:>8.3f}{row['detections']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Scalar vs batch inverse kinematics benchmark.
+Times calculate_arm_angles/fake_ik_to_us in a Python loop against
+calculate_arm_angles_batch/fake_ik_to_us_batch on the same random targets,
+and checks that both give the same answers. Then checks the generic
+kinematic chain (kinematic_chain.py) against the closed-form solver for the
+current arm and times its DLS solver cold, warm-started and batched.
+
+Usage:
+    python benchmark_kinematics.py
+    python benchmark_kinematics.py --targets 10000 --runs 5
+"""
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+
+from kinematic_chain import APPROACH_DOWN, DLSSolver, load_chain
+from kinematics import (calculate_arm_angles, calculate_arm_angles_batch, fake_ik_to_us,
+                        fake_ik_to_us_batch, load_calibration)
+
+JOINTS = ("base_deg", "shoulder_deg", "elbow_deg", "wrist_deg")
+
+
+def random_targets(count, seed=0):
+    """Targets over the table (x, y in ±0.3 m) at 0-10 cm height."""
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(-0.3, 0.3, count)
+    y = rng.uniform(-0.3, 0.3, count)
+    z = rng.uniform(0.0, 0.1, count)
+    return x, y, z
+
+
+def best_time(fn, runs):
+    """Best wall time of `runs` calls, in seconds."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def chain_benchmark(calibration, x, y, z, scalar_count, runs):
+    """Closed-form IK vs the kinematic chain's forward kinematics and DLS IK."""
+    chain = load_chain(calibration=calibration)
+    closed = calculate_arm_angles_batch(x, y, z, calibration)
+    targets = np.stack([x, y, z], axis=1)[closed["reachable"]]
+    base, shoulder, elbow = (closed[joint][closed["reachable"]] for joint in JOINTS[:3])
+    # Same base/shoulder/elbow conventions; the chain's wrist is relative to the lower arm
+    q_closed = np.stack([base, shoulder, elbow, elbow - shoulder - 180], axis=1)
+
+    position, _ = chain.forward_kinematics(q_closed)
+    fk_error = float(np.max(np.linalg.norm(position - targets, axis=1)))
+    print(f"\nKinematic chain ({chain.dof} joints: {', '.join(chain.names)}) on {len(targets)} reachable targets")
+    print(f"Chain FK of closed-form solutions, max position error: {fk_error:.2e} m")
+
+    within_limits = np.all((q_closed >= chain.min_deg) & (q_closed <= chain.max_deg), axis=1)
+    solver = DLSSolver(chain)
+    cold = solver.solve_batch(targets, approach=APPROACH_DOWN)
+    ok = cold["converged"]
+    angle_error = np.abs(cold["q_deg"][ok, :3] - q_closed[ok, :3]).max(axis=1)
+    print(f"DLS from home: {int(ok.sum())}/{len(targets)} converged "
+          f"({int(np.count_nonzero(~within_limits))} closed-form solutions are outside the joint limits), "
+          f"{cold['iterations'][ok].mean():.1f} iterations avg")
+    print(f"Base/shoulder/elbow difference from closed form: median {np.median(angle_error):.3f} deg, "
+          f"max {angle_error.max():.3f} deg (near full extension)")
+
+    # Warm starts: a target sliding across the workspace in 2 mm steps, like a tracked bottle
+    steps = np.linspace(0, 1, 100)
+    path = np.stack([0.05 + 0.10 * steps, 0.10 - 0.05 * steps, np.full_like(steps, 0.02)], axis=1)
+
+    def solve_path(warm):
+        solver.reset()
+        iterations = 0
+        for px, py, pz in path:
+            if not warm:
+                solver.reset()
+            iterations += solver.solve(px, py, pz, approach=APPROACH_DOWN)["iterations"]
+        return iterations / len(path)
+
+    scalar_targets = targets[within_limits][:scalar_count]
+
+    def closed_scalar():
+        for px, py, pz in scalar_targets:
+            calculate_arm_angles(px, py, pz, calibration)
+
+    def dls_scalar():
+        for px, py, pz in scalar_targets:
+            solver.reset()
+            solver.solve(px, py, pz, approach=APPROACH_DOWN)
+
+    rows = [
+        ("closed form, scalar", best_time(closed_scalar, runs) / len(scalar_targets), None),
+        ("DLS cold, scalar", best_time(dls_scalar, runs) / len(scalar_targets), None),
+        ("DLS warm path, scalar", best_time(lambda: solve_path(True), runs) / len(path), solve_path(True)),
+        ("DLS cold path, scalar", best_time(lambda: solve_path(False), runs) / len(path), solve_path(False)),
+        ("closed form, batch", best_time(lambda: calculate_arm_angles_batch(x, y, z, calibration), runs) / len(x), None),
+        ("DLS cold, batch", best_time(lambda: solver.solve_batch(targets, approach=APPROACH_DOWN), runs) / len(targets),
+         None),
+    ]
+    print(f"\n{'solver':<24}{'us/target':>10}{'iterations':>12}")
+    for name, seconds, iterations in rows:
+        iterations_text = f"{iterations:>12.1f}" if iterations is not None else f"{'':>12}"
+        print(f"{name:<24}{seconds * 1e6:>10.1f}{iterations_text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare scalar and batch inverse kinematics")
+    parser.add_argument("--targets", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs (best is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chain-targets", type=int, default=200, help="Targets for the per-target DLS timings")
+    args = parser.parse_args()
+
+    calibration = load_calibration()
+    x, y, z = random_targets(args.targets, args.seed)
+    points = list(zip(x.tolist(), y.tolist(), z.tolist()))
+
+    # The scalar path prints a warning per unreachable target; keep that out of the timing
+    def scalar_angles():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return [calculate_arm_angles(px, py, pz, calibration) for px, py, pz in points]
+
+    def scalar_us():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return [fake_ik_to_us(px, py, pz, calibration) for px, py, pz in points]
+
+    # Correctness against the scalar reference
+    reference = scalar_angles()
+    batch = calculate_arm_angles_batch(x, y, z, calibration)
+    max_error = max(
+        float(np.max(np.abs(np.array([r[joint] for r in reference]) - batch[joint]))) for joint in JOINTS
+    )
+    us_reference = np.array(scalar_us())
+    us_batch, reachable = fake_ik_to_us_batch(x, y, z, calibration)
+    us_mismatches = int(np.count_nonzero(np.any(us_reference != us_batch, axis=1)))
+
+    print(f"{args.targets} targets, {int(reachable.sum())} reachable")
+    print(f"Max angle difference: {max_error:.2e} deg, servo command mismatches: {us_mismatches}")
+
+    rows = [
+        ("calculate_arm_angles", best_time(scalar_angles, args.runs),
+         best_time(lambda: calculate_arm_angles_batch(x, y, z, calibration), args.runs)),
+        ("fake_ik_to_us", best_time(scalar_us, args.runs),
+         best_time(lambda: fake_ik_to_us_batch(x, y, z, calibration), args.runs)),
+    ]
+    print(f"\n{'function':<22}{'scalar ms':>11}{'batch ms':>10}{'speedup':>9}")
+    for name, scalar_s, batch_s in rows:
+        print(f"{name:<22}{scalar_s * 1000:>11.1f}{batch_s * 1000:>10.2f}{scalar_s / batch_s:>8.0f}x")
+
+    chain_benchmark(calibration, x, y, z, args.chain_targets, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Throughput comparison of the JSON and binary serial protocols.
+Runs ESP32Controller against a firmware emulator on a local pty pair, so no
+ESP32 is needed. Reports commands per second and bytes per command for
+fire-and-forget servo updates and for ack round trips, plus the rate each
+protocol could reach on a real UART at the given baud rate.
+
+Usage:
+    python benchmark_serial.py
+    python benchmark_serial.py --commands 5000 --baud 115200
+    python benchmark_serial.py --max-send-rate 50   # cap for the setpoint coalescing run
+    python benchmark_serial.py --legacy-firmware   # emulate firmware without binary support (auto falls back)
+"""
+import argparse
+import json
+import os
+import select
+import statistics
+import threading
+import time
+import tty
+
+from esp32_control import (
+    ACK_OK, OP_ACK, OP_SERVOS, OP_TEST, SERVOS_ACK_DATA, SERVOS_PAYLOAD,
+    ACK_TIMEOUT, ESP32Controller, Frame, FrameDecoder, encode_command, encode_frame,
+)
+
+BITS_PER_BYTE = 10  # 8N1: start + 8 data + stop
+
+
+class FirmwareEmulator:
+    """Replies to commands on the master side of a pty like esp32_servo_control.ino."""
+
+    def __init__(self, fd, binary=True):
+        self.fd = fd
+        self.binary = binary
+        self.decoder = FrameDecoder()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+
+    def _run(self):
+        while self.running:
+            ready, _, _ = select.select([self.fd], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.fd, 4096)
+            except OSError:
+                break
+            replies = [self._reply(item) for item in self.decoder.feed(data)]
+            out = b''.join(reply for reply in replies if reply)
+            if out:
+                os.write(self.fd, out)
+
+    def _reply(self, item):
+        if isinstance(item, Frame):
+            if not self.binary:
+                return None
+            if item.opcode == OP_SERVOS and len(item.payload) == SERVOS_PAYLOAD.size:
+                applied = [min(max(v, 900), 2100) for v in SERVOS_PAYLOAD.unpack(item.payload)[:3]]
+                data = bytes((OP_SERVOS, ACK_OK)) + SERVOS_ACK_DATA.pack(*applied)
+            elif item.opcode == OP_TEST:
+                data = bytes((OP_TEST, ACK_OK))
+            else:
+                data = bytes((item.opcode, 2))
+            return encode_frame(OP_ACK, item.seq, data)
+
+        try:
+            command = json.loads(item)
+        except ValueError as e:
+            return f"ERROR: Invalid JSON - {e}\n".encode()
+        op = command.get("op", "")
+        if op == "servos":
+            applied = [min(max(int(command.get(name, 1500)), 900), 2100) for name in ("base", "shoulder", "elbow")]
+            reply = "OK: servos set to " + ",".join(map(str, applied))
+        elif op == "proto" and self.binary:
+            reply = "OK: binary 1"
+        elif op == "test":
+            reply = "OK: ESP32 is responding"
+        else:
+            reply = f"ERROR: Unknown operation - {op}"
+        if "seq" in command and self.binary:  # Firmware without binary frames doesn't echo seq either
+            reply += f" seq={command['seq']}"
+        return (reply + "\n").encode()
+
+
+def servo_setpoints(count):
+    """Varying servo values so every command is a real update."""
+    return [(1200 + i % 600, 1500 - i % 400, 1800 - i % 700) for i in range(count)]
+
+
+def command_size(protocol):
+    """Bytes on the wire for one servo update."""
+    command = {"op": "servos", "base": 1500, "shoulder": 1500, "elbow": 1500, "wrist": 1500}
+    if protocol == "binary":
+        return len(encode_command(command, 0))
+    return len(json.dumps(dict(command, seq=255))) + 1  # JSON commands carry a seq for ack matching
+
+
+def benchmark_protocol(port, protocol, commands, round_trips):
+    """
+    Time fire-and-forget servo updates and ack round trips over one connection.
+
+    Returns:
+        dict: 'protocol' negotiated, 'bytes_per_command', 'send_rate', 'round_trip_ms' (median
+              of the awaited round trips), 'lost' acks and the controller's 'link' stats
+    """
+    controller = ESP32Controller(port=port, protocol=protocol)
+    if not controller.connect():
+        raise RuntimeError(f"Could not connect to emulator on {port}")
+    try:
+        setpoints = servo_setpoints(commands)
+
+        start = time.perf_counter()
+        for base, shoulder, elbow in setpoints:
+            controller.set_servos(base, shoulder, elbow)
+        elapsed = time.perf_counter() - start
+
+        # Let the acks for the burst arrive before timing round trips
+        deadline = time.monotonic() + ACK_TIMEOUT * 2
+        while controller.pending_count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        round_trip_ms = []
+        lost = 0
+        for base, shoulder, elbow in setpoints[:round_trips]:
+            start_rt = time.perf_counter()
+            future = controller.submit_servos(base, shoulder, elbow)
+            if future is not None and future.result(timeout=ACK_TIMEOUT * 2).ok:
+                round_trip_ms.append((time.perf_counter() - start_rt) * 1000)
+            else:
+                lost += 1
+        return {
+            "protocol": controller.active_protocol,
+            "bytes_per_command": command_size(controller.active_protocol),
+            "send_rate": commands / elapsed,
+            "round_trip_ms": statistics.median(round_trip_ms) if round_trip_ms else float('nan'),
+            "lost": lost,
+            "link": controller.link_stats(),
+        }
+    finally:
+        controller.disconnect()
+
+
+def benchmark_coalescing(port, max_send_rate, seconds=1.0, producer_hz=2000):
+    """
+    Stream setpoints faster than max_send_rate through a coalescing controller.
+
+    Returns:
+        dict: 'offered' setpoints, the controller's 'link' stats and 'final_ms' (time
+              from the last setpoint to the ack that confirms it)
+    """
+    controller = ESP32Controller(port=port, protocol="auto", max_send_rate=max_send_rate)
+    if not controller.connect():
+        raise RuntimeError(f"Could not connect to emulator on {port}")
+    try:
+        offered = 0
+        start = time.monotonic()
+        while time.monotonic() - start < seconds:
+            # Every tenth setpoint repeats the previous one (a target that didn't move)
+            controller.set_servos(1200 + (offered - (offered % 10 == 9)) % 600, 1500, 1500)
+            offered += 1
+            time.sleep(1.0 / producer_hz)
+        final_start = time.perf_counter()
+        future = controller.submit_servos(2000, 1500, 1500)
+        future.result(timeout=ACK_TIMEOUT * 2)
+        return {"offered": offered + 1, "link": controller.link_stats(),
+                "final_ms": (time.perf_counter() - final_start) * 1000}
+    finally:
+        controller.disconnect()
+
+
+def check_decoder():
+    """
+    Regression checks for FrameDecoder recovery: replies after a corrupt frame
+    must still come through, in both JSON and binary mode. Raises AssertionError.
+    """
+    # A stray sync byte with a bad CRC in JSON mode, then text replies fed separately
+    decoder = FrameDecoder()
+    assert decoder.feed(b'\xa5\x01\x02\x03xyzzz\n') == []
+    assert decoder.feed(b"OK: ESP32 is responding seq=1\n") == ["OK: ESP32 is responding seq=1"]
+    assert decoder.feed(b"OK: servos set to 1,2,3 seq=2\n") == ["OK: servos set to 1,2,3 seq=2"]
+
+    # Bad length, then a valid frame split across reads
+    ack = encode_frame(OP_ACK, 7, bytes((OP_TEST, ACK_OK)))
+    decoder = FrameDecoder()
+    assert decoder.feed(b'\xa5\x01\x02\xff' + ack[:3]) == []
+    assert decoder.feed(ack[3:]) == [Frame(OP_ACK, 7, bytes((OP_TEST, ACK_OK)))]
+
+    # Corrupted CRC, then a good frame and a text line
+    bad = bytearray(ack)
+    bad[-1] ^= 0xFF
+    decoder = FrameDecoder()
+    assert decoder.feed(bytes(bad) + ack + b"OK: ESP32 is responding\n") == [
+        Frame(OP_ACK, 7, bytes((OP_TEST, ACK_OK))), "OK: ESP32 is responding"]
+    assert decoder.errors == 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON and binary serial protocol throughput over a pty")
+    parser.add_argument("--commands", type=int, default=2000, help="Fire-and-forget servo updates per protocol")
+    parser.add_argument("--round-trips", type=int, default=200, help="Command + ack round trips per protocol")
+    parser.add_argument("--baud", type=int, default=115200, help="UART baud rate for the link-limited rate")
+    parser.add_argument("--max-send-rate", type=float, default=100.0,
+                        help="Send-rate cap for the coalescing run (0 to skip it)")
+    parser.add_argument("--legacy-firmware", action="store_true", help="Emulate firmware without binary frames")
+    args = parser.parse_args()
+
+    check_decoder()
+    master, slave = os.openpty()
+    tty.setraw(master)
+    emulator = FirmwareEmulator(master, binary=not args.legacy_firmware)
+    emulator.start()
+    port = os.ttyname(slave)
+    print(f"Firmware emulator on {port}" + (" (no binary support)" if args.legacy_firmware else ""))
+
+    results = {}
+    try:
+        for protocol in ("json", "auto"):
+            print(f"\n[{protocol}]")
+            results[protocol] = benchmark_protocol(port, protocol, args.commands, args.round_trips)
+        coalescing = None
+        if args.max_send_rate:
+            print(f"\n[auto, coalesced to {args.max_send_rate:g} Hz]")
+            coalescing = benchmark_coalescing(port, args.max_send_rate)
+    finally:
+        emulator.stop()
+        os.close(slave)
+        os.close(master)
+
+    link_bytes_per_second = args.baud / BITS_PER_BYTE
+    print(f"\n{'requested':<11}{'speaks':<8}{'bytes/cmd':>10}{'sent/s':>10}{'ack rtt ms':>12}"
+          f"{f'@{args.baud} baud':>16}")
+    for protocol, result in results.items():
+        link_rate = link_bytes_per_second / result["bytes_per_command"]
+        print(f"{protocol:<11}{result['protocol']:<8}{result['bytes_per_command']:>10}"
+              f"{result['send_rate']:>10.0f}{result['round_trip_ms']:>12.3f}{link_rate:>12.0f} cmd/s"
+              + (f"  ({result['lost']} acks lost)" if result["lost"] else ""))
+    for protocol, result in results.items():
+        link = result["link"]
+        print(f"{protocol}: {link['sent']} sent, {link['acked']} acked, {link['nacked']} nacked, "
+              f"{link['unacked']} unacked, {link['pending']} pending; reader-measured round trip "
+              f"p50 {link['round_trip']['p50_ms']:.3f} ms, p95 {link['round_trip']['p95_ms']:.3f} ms")
+    json_size = results["json"]["bytes_per_command"]
+    auto_size = results["auto"]["bytes_per_command"]
+    if auto_size < json_size:
+        print(f"\nBinary frames are {json_size / auto_size:.1f}x smaller, so the UART carries "
+              f"{json_size / auto_size:.1f}x more servo updates per second.")
+    if coalescing:
+        link = coalescing["link"]
+        print(f"\nCoalescing at {args.max_send_rate:g} Hz: {coalescing['offered']} setpoints offered in ~1 s, "
+              f"{link['sent']} sent, {link['coalesced']} coalesced, {link['deduplicated']} deduplicated; "
+              f"last setpoint acked after {coalescing['final_ms']:.1f} ms")
+    print("Note: a pty has no baud limit; on hardware the link-limited column is the ceiling.")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,9 @@ Helps you calibrate the camera-to-table coordinate mapping.
 """
 import cv2
 import json
+import numpy as np
 from kinematics import load_calibration, save_calibration, px_to_table, table_to_px
+from camera import LatestFrameCapture
 
 print("=== Camera-to-Table Calibration ===")
 print("\nThis script helps you calibrate the coordinate mapping between")
@@ -21,13 +23,17 @@ print(f"  Origin (pixels): {calibration['origin_px']}")
 print(f"  Scale: {calibration['scale_x']*1000:.2f} mm/px (X), {calibration['scale_y']*1000:.2f} mm/px (Y)")
 print(f"  Table size: {calibration['table_width_m']*100:.0f}cm x {calibration['table_height_m']*100:.0f}cm")
 
-cap = cv2.VideoCapture(0)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+cap = LatestFrameCapture()
+if not cap.open():
+    raise SystemExit("Camera not available. Check camera permissions.")
 
 click_points = []
 click_mode = "origin"  # origin, scale_x, scale_y
 
+# 7x7 grid of offsets (in 50px steps) around the origin; labels only on the axes
+GRID_OFFSETS_I, GRID_OFFSETS_J = (a.ravel() for a in np.meshgrid(np.arange(-3, 4), np.arange(-3, 4), indexing="ij"))
+GRID_ON_AXES = (GRID_OFFSETS_I == 0) | (GRID_OFFSETS_J == 0)
+
 def mouse_callback(event, x, y, flags, param):
     """Handle mouse clicks for calibration."""
     global click_points, click_mode
@@ -85,19 +91,18 @@ while True:
         cv2.putText(vis, str(i+1), (pt[0] + 10, pt[1]),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 0, 0), 1)
     
-    # Draw coordinate grid
+    # Draw coordinate grid (all grid points converted in one call)
     origin_x, origin_y = origin
-    for i in range(-3, 4):
-        for j in range(-3, 4):
-            px_x = origin_x + i * 50
-            px_y = origin_y + j * 50
-            if 0 <= px_x < 640 and 0 <= px_y < 480:
-                table_x, table_y = px_to_table(px_x, px_y, calibration)
-                cv2.circle(vis, (px_x, px_y), 2, (128, 128, 128), -1)
-                if i == 0 or j == 0:
-                    cv2.putText(vis, f"({table_x:.2f},{table_y:.2f})", 
-                               (px_x + 5, px_y - 5),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.3, (128, 128, 128), 1)
+    px_x = origin_x + GRID_OFFSETS_I * 50
+    px_y = origin_y + GRID_OFFSETS_J * 50
+    visible = (px_x >= 0) & (px_x < 640) & (px_y >= 0) & (px_y < 480)
+    table_x, table_y = px_to_table(px_x, px_y, calibration)
+    for x, y in zip(px_x[visible].tolist(), px_y[visible].tolist()):
+        cv2.circle(vis, (x, y), 2, (128, 128, 128), -1)
+    for k in np.flatnonzero(visible & GRID_ON_AXES):
+        cv2.putText(vis, f"({table_x[k]:.2f},{table_y[k]:.2f})", 
+                   (int(px_x[k]) + 5, int(px_y[k]) - 5),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.3, (128, 128, 128), 1)
     
     # Show current calibration info
     info_text = [
@@ -3,15 +3,13 @@ Camera test script to verify webcam access on macOS.
 Press 'q' to quit.
 """
 import cv2
+from camera import LatestFrameCapture
 
-cap = cv2.VideoCapture(0)  # try 1 if black
+cap = LatestFrameCapture()  # set "index" in camera.json if black
 
-if not cap.isOpened():
+if not cap.open():
     raise SystemExit("Camera not available. Try index 1 and allow Camera access in macOS settings.")
 
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-
 while True:
     ok, frame = cap.read()
     if not ok:
@@ -0,0 +1,208 @@
+"""
+Low-latency camera capture.
+Reads frames in a background thread and always hands out the newest one, so a
+slow processing loop never acts on frames queued up in the driver buffer.
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+import profiling
+
+# Camera settings (can be saved/loaded from file)
+CAMERA_CONFIG_FILE = "camera.json"
+
+DEFAULT_CAMERA_CONFIG = {
+    "index": 0,            # Camera index to open first
+    "fallback_index": 1,   # Camera index to try if the first one fails (None = no fallback)
+    "width": 640,          # Capture width in pixels
+    "height": 480,         # Capture height in pixels
+    "fps": 30,             # Requested frame rate (None = driver default)
+    "buffer_size": 1,      # Driver buffer size in frames (1 = lowest latency)
+    "fourcc": "MJPG",      # Pixel format (MJPG lets USB cameras hit full fps; None = driver default)
+}
+
+CapturedFrame = namedtuple("CapturedFrame", ["frame", "timestamp", "seq"])
+
+
+def load_camera_config():
+    """Load camera settings from file, filling in defaults for missing keys."""
+    config = DEFAULT_CAMERA_CONFIG.copy()
+    if os.path.exists(CAMERA_CONFIG_FILE):
+        try:
+            with open(CAMERA_CONFIG_FILE, 'r') as f:
+                config.update(json.load(f))
+                print(f"Loaded camera config from {CAMERA_CONFIG_FILE}")
+        except Exception as e:
+            print(f"Error loading camera config: {e}, using defaults")
+    return config
+
+
+class LatestFrameCapture:
+    """
+    Threaded camera capture with latest-frame semantics.
+
+    A background thread reads frames as fast as the camera delivers them and
+    keeps only the newest one. read_frame() returns that frame with its
+    capture timestamp and sequence number; frames overwritten before anyone
+    read them are counted in `dropped`.
+
+    read() mirrors cv2.VideoCapture.read() so it can replace one directly.
+    """
+
+    def __init__(self, config=None):
+        """
+        Args:
+            config: Camera settings dict (default: load_camera_config())
+        """
+        self.config = config if config is not None else load_camera_config()
+        self.cap = None
+        self.index = None
+        self.captured = 0
+        self.delivered = 0
+        self.dropped = 0
+
+        self._latest = None
+        self._last_delivered_seq = -1
+        self._ended = False
+        self._running = False
+        self._thread = None
+        self._cond = threading.Condition()
+
+    def _open_index(self, index):
+        cap = cv2.VideoCapture(index)
+        if not cap.isOpened():
+            cap.release()
+            return None
+
+        # Apply low-latency settings; drivers silently ignore unsupported ones
+        if self.config.get("fourcc"):
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.config["fourcc"]))
+        if self.config.get("width"):
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.config["width"])
+        if self.config.get("height"):
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config["height"])
+        if self.config.get("fps"):
+            cap.set(cv2.CAP_PROP_FPS, self.config["fps"])
+        if self.config.get("buffer_size"):
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, self.config["buffer_size"])
+        return cap
+
+    def open(self):
+        """
+        Open the camera (trying the fallback index if needed) and start the reader thread.
+
+        Returns:
+            bool: True if a camera was opened
+        """
+        if self.cap is not None:
+            return True
+
+        indices = [self.config.get("index", 0)]
+        if self.config.get("fallback_index") is not None:
+            indices.append(self.config["fallback_index"])
+
+        for index in indices:
+            cap = self._open_index(index)
+            if cap is not None:
+                self.cap = cap
+                self.index = index
+                break
+            print(f"Error: Camera {index} not available.")
+
+        if self.cap is None:
+            return False
+
+        print(f"Using camera {self.index}")
+        self._running = True
+        self._thread = threading.Thread(target=self._reader, daemon=True)
+        self._thread.start()
+        return True
+
+    def _reader(self):
+        """Background loop: grab frames and keep only the newest."""
+        seq = 0
+        while self._running:
+            ok = self.cap.grab()
+            timestamp = time.monotonic()
+            if ok:
+                ok, frame = self.cap.retrieve()
+            if not ok:
+                with self._cond:
+                    self._ended = True
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                if self._latest is not None and self._latest.seq != self._last_delivered_seq:
+                    self.dropped += 1
+                self._latest = CapturedFrame(frame, timestamp, seq)
+                self.captured += 1
+                self._cond.notify_all()
+            seq += 1
+
+    @profiling.timed("cap.read")
+    def read_frame(self, timeout=2.0):
+        """
+        Get the newest frame not handed out yet, waiting for one if needed.
+
+        Args:
+            timeout: Seconds to wait for a new frame
+
+        Returns:
+            CapturedFrame: (frame, timestamp, seq), or None if the camera
+                           stopped or no frame arrived in time
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._latest is None or self._latest.seq == self._last_delivered_seq:
+                remaining = deadline - time.monotonic()
+                if self._ended or not self._running or remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            self._last_delivered_seq = self._latest.seq
+            self.delivered += 1
+            return self._latest
+
+    def read(self):
+        """cv2.VideoCapture-compatible read: (ok, frame) for the newest frame."""
+        captured = self.read_frame()
+        if captured is None:
+            return False, None
+        return True, captured.frame
+
+    def isOpened(self):
+        return self.cap is not None and not self._ended
+
+    def stats(self):
+        """
+        Get capture counters.
+
+        Returns:
+            dict: 'captured', 'delivered' and 'dropped' frame counts
+        """
+        with self._cond:
+            return {"captured": self.captured, "delivered": self.delivered, "dropped": self.dropped}
+
+    def release(self):
+        """Stop the reader thread and release the camera."""
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
@@ -2,26 +2,297 @@
 Object detection using color-based masking and YOLO object detection.
 Supports both color-based and label-based object detection.
 """
+import time
 import cv2
 import numpy as np
+from functools import lru_cache
+from yolo_backends import load_backend
+import profiling
 
-# YOLO model (lazy-loaded)
+# YOLO inference backend (lazy-loaded, see yolo_backends.py)
 _yolo_model = None
+_backend_name = None
+_backend_model_path = None
+
+# Detections for the most recent frame (see get_frame_detections)
+_frame_detections = None
+
+# COCO class names (YOLO uses COCO dataset)
+COCO_CLASSES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
+    'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat',
+    'dog', 'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack',
+    'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball',
+    'kite', 'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket',
+    'bottle', 'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple',
+    'sandwich', 'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake',
+    'chair', 'couch', 'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop',
+    'mouse', 'remote', 'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink',
+    'refrigerator', 'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier',
+    'toothbrush'
+]
+
+# Label -> class id index (built once instead of searching COCO_CLASSES per call)
+COCO_CLASS_IDS = {name: cls_id for cls_id, name in enumerate(COCO_CLASSES)}
+
+# HSV ranges for color detection: (lower, upper) or two ranges for red
+COLOR_RANGES = {
+    "black": ((0, 0, 0), (179, 255, 50)),
+    "red": ((0, 120, 100), (10, 255, 255), (170, 120, 100), (179, 255, 255)),
+    "green": ((40, 50, 50), (80, 255, 255)),
+    "blue": ((100, 50, 50), (130, 255, 255)),
+    "yellow": ((20, 50, 50), (30, 255, 255)),
+    "orange": ((10, 50, 50), (20, 255, 255)),
+}
+
+# Map common labels to COCO class names
+LABEL_MAP = {
+    "apple": "apple",
+    "bottle": "bottle",
+    "marker": "marker",  # Not in COCO, will try other names
+    "cube": "cube",  # Not in COCO
+    "block": "block",  # Not in COCO
+    "cap": "bottle",  # Approximate
+    "screw": "screwdriver",  # Approximate
+}
 
 
 def _get_yolo_model():
-    """Lazy-load YOLO model to avoid loading on import."""
+    """
+    Lazy-load the YOLO inference backend to avoid loading on import.
+    
+    The backend (ultralytics, onnxruntime, onnxruntime-int8, opencv-dnn,
+    openvino) comes from $AURA_YOLO_BACKEND or set_yolo_backend().
+    """
     global _yolo_model
     if _yolo_model is None:
-        try:
-            from ultralytics import YOLO
-            _yolo_model = YOLO('yolov8n.pt')  # nano model for speed
-        except ImportError:
-            raise ImportError("ultralytics not installed. Run: pip install ultralytics")
+        _yolo_model = load_backend(_backend_name, _backend_model_path, class_names=COCO_CLASSES)
     return _yolo_model
 
 
-def find_cup(frame_bgr, confidence=0.25):
+def set_yolo_backend(name=None, model_path=None):
+    """
+    Select the YOLO inference backend used by all detector functions.
+    
+    Args:
+        name: Backend name from yolo_backends.BACKENDS (None = env var/default)
+        model_path: Weights or ONNX graph path (None = env var/backend default)
+    """
+    global _yolo_model, _backend_name, _backend_model_path, _frame_detections
+    _backend_name = name
+    _backend_model_path = model_path
+    _yolo_model = None
+    _frame_detections = None
+
+
+def warmup_yolo_model(frame_shape=(480, 640, 3)):
+    """
+    Load the YOLO backend and run one dummy inference.
+
+    The first predict() pays for lazy setup (graph optimization, kernel
+    selection, memory allocation); doing it at startup keeps that off the
+    first real frame.
+
+    Args:
+        frame_shape: Shape of the dummy frame (match the camera resolution)
+
+    Returns:
+        tuple: (load_seconds, warmup_seconds)
+    """
+    start = time.perf_counter()
+    model = _get_yolo_model()
+    loaded = time.perf_counter()
+    model.predict(np.zeros(frame_shape, dtype=np.uint8), conf=0.25)
+    return loaded - start, time.perf_counter() - loaded
+
+
+class FrameDetections:
+    """
+    YOLO detections for a single frame.
+    
+    Inference runs once when the object is created. find_cup, find_by_label,
+    detect_all_objects and find_object are then cheap queries over the same
+    result instead of each running their own model pass.
+    
+    Boxes are kept as whole NumPy arrays (xyxy, conf, cls) pulled off the
+    device once, so filtering and argmax never loop over boxes in Python.
+    """
+    
+    def __init__(self, frame_bgr, confidence=0.25, frame_id=None, classes=None):
+        """
+        Run YOLO on a frame.
+        
+        Args:
+            frame_bgr: Input frame in BGR format
+            confidence: Confidence threshold used for inference (default: 0.25)
+            frame_id: Optional frame sequence number used as the cache key
+            classes: Optional iterable of COCO class ids to detect (default: all)
+        """
+        self.frame = frame_bgr
+        self.frame_id = frame_id
+        self.confidence = confidence
+        self.classes = frozenset(classes) if classes is not None else None
+        self._annotated = None
+        
+        model = _get_yolo_model()
+        class_list = sorted(self.classes) if self.classes is not None else None
+        with profiling.span("yolo.predict"):
+            self.result = model.predict(frame_bgr, conf=confidence, classes=class_list)
+        
+        known = self.result.cls < len(COCO_CLASSES)
+        self.xyxy = self.result.xyxy[known]
+        self.conf = self.result.conf[known]
+        self.cls = self.result.cls[known]
+    
+    def __len__(self):
+        return len(self.conf)
+    
+    def matches(self, frame_bgr, confidence=0.25, frame_id=None, classes=None):
+        """
+        Check whether these detections can answer a query for a frame.
+        
+        Frames are matched by frame_id when one is given, otherwise by identity.
+        Cached detections computed at a higher threshold, or restricted to
+        fewer classes, than requested are not reused.
+        """
+        if confidence < self.confidence:
+            return False
+        if self.classes is not None and (classes is None or not self.classes.issuperset(classes)):
+            return False
+        if frame_id is not None:
+            return frame_id == self.frame_id
+        return frame_bgr is self.frame
+    
+    def _mask(self, class_ids=None, confidence=None):
+        """Boolean mask of boxes matching class ids and confidence."""
+        mask = np.ones(len(self.conf), dtype=bool)
+        if confidence is not None and confidence > self.confidence:
+            mask &= self.conf >= confidence
+        if class_ids is not None:
+            mask &= np.isin(self.cls, list(class_ids))
+        return mask
+    
+    def _to_dicts(self, indices):
+        """Build detection dicts for the given box indices."""
+        xyxy = self.xyxy[indices]
+        # Truncate like int() so results match the per-box code this replaced
+        xs = xyxy[:, 0].astype(np.int64)
+        ys = xyxy[:, 1].astype(np.int64)
+        ws = (xyxy[:, 2] - xyxy[:, 0]).astype(np.int64)
+        hs = (xyxy[:, 3] - xyxy[:, 1]).astype(np.int64)
+        cxs = xs + ws // 2
+        cys = ys + hs // 2
+        
+        return [
+            {
+                "cx": cx,
+                "cy": cy,
+                "bbox": (x, y, w, h),
+                "label": COCO_CLASSES[cls_id],
+                "confidence": conf
+            }
+            for cx, cy, x, y, w, h, cls_id, conf in zip(
+                cxs.tolist(), cys.tolist(), xs.tolist(), ys.tolist(), ws.tolist(), hs.tolist(),
+                self.cls[indices].tolist(), self.conf[indices].tolist()
+            )
+        ]
+    
+    def all(self, confidence=None, class_ids=None):
+        """
+        Get all detections at or above a confidence threshold.
+        
+        Args:
+            confidence: Minimum confidence (default: inference threshold)
+            class_ids: Optional iterable of COCO class ids to keep
+        
+        Returns:
+            list: Detection dicts with 'cx', 'cy', 'bbox', 'label', 'confidence'
+        """
+        return self._to_dicts(np.flatnonzero(self._mask(class_ids, confidence)))
+    
+    def best(self, class_ids, confidence=None):
+        """
+        Get the highest-confidence detection among the given classes.
+        
+        Args:
+            class_ids: Iterable of COCO class ids to consider
+            confidence: Minimum confidence (default: inference threshold)
+        
+        Returns:
+            dict: Best matching detection, or None
+        """
+        candidates = np.flatnonzero(self._mask(class_ids, confidence))
+        if len(candidates) == 0:
+            return None
+        best_index = candidates[np.argmax(self.conf[candidates])]
+        return self._to_dicts([best_index])[0]
+    
+    def annotated(self):
+        """
+        Get the frame with YOLO boxes drawn.
+        
+        Plotting is the only full-frame allocation here, so it only happens
+        when asked for and at most once per frame.
+        """
+        if self._annotated is None:
+            self._annotated = self.result.plot()
+        return self._annotated
+
+
+def get_frame_detections(frame_bgr, confidence=0.25, frame_id=None, classes=None):
+    """
+    Get YOLO detections for a frame, running inference at most once per frame.
+    
+    The most recent result is cached, so calling several detector functions on
+    the same frame (same object, or same frame_id) shares one model pass.
+    Query the full set of classes first if several callers share a frame;
+    a class-restricted result cannot answer a later unrestricted query.
+    
+    Args:
+        frame_bgr: Input frame in BGR format
+        confidence: Minimum confidence threshold (default: 0.25)
+        frame_id: Optional frame sequence number (default: match by frame identity)
+        classes: Optional iterable of COCO class ids passed to the model's
+                 classes= filter (default: all classes)
+    
+    Returns:
+        FrameDetections: Detections for this frame
+    """
+    global _frame_detections
+    if _frame_detections is None or not _frame_detections.matches(frame_bgr, confidence, frame_id, classes):
+        _frame_detections = FrameDetections(frame_bgr, confidence, frame_id, classes)
+    return _frame_detections
+
+
+def _normalize_label(label):
+    """Map a user-facing label to the COCO label to search for."""
+    label_lower = label.lower()
+    return LABEL_MAP.get(label_lower, label_lower)
+
+
+@lru_cache(maxsize=None)
+def class_ids_for_label(label):
+    """
+    Get the COCO class ids matching a label.
+    
+    A class matches when either name contains the other, same as the
+    per-box comparison find_by_label used to do. Results are cached per label.
+    
+    Args:
+        label: Object label (mapped through LABEL_MAP)
+    
+    Returns:
+        tuple: Matching COCO class ids (empty if the label is not in COCO)
+    """
+    search_label = _normalize_label(label)
+    return tuple(
+        cls_id for cls_id, name in enumerate(COCO_CLASSES)
+        if search_label in name or name in search_label
+    )
+
+
+@profiling.timed("find_cup")
+def find_cup(frame_bgr, confidence=0.25, frame_id=None, annotate=False):
     """
     Find a bottle in the frame, ignoring other objects.
     Prioritizes bottles and filters out other detections.
@@ -29,67 +300,261 @@ def find_cup(frame_bgr, confidence=0.25):
     Args:
         frame_bgr: Input frame in BGR format
         confidence: Minimum confidence threshold (default: 0.25)
+        frame_id: Optional frame sequence number for sharing inference
+        annotate: Draw YOLO boxes on a copy of the frame (default: False)
     
     Returns:
         tuple: (dict with 'cx', 'cy', 'bbox', 'label', 'confidence' keys, annotated frame) 
-               or (None, frame) if no bottle found
+               or (None, annotated frame) if no bottle found.
+               The annotated frame is None unless annotate=True.
     """
-    model = _get_yolo_model()
+    bottle_ids = (COCO_CLASS_IDS['bottle'],)
+    detections = get_frame_detections(frame_bgr, confidence, frame_id, classes=bottle_ids)
     
-    # COCO class names (YOLO uses COCO dataset)
-    coco_classes = [
-        'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
-        'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat',
-        'dog', 'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack',
-        'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball',
-        'kite', 'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket',
-        'bottle', 'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple',
-        'sandwich', 'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake',
-        'chair', 'couch', 'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop',
-        'mouse', 'remote', 'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink',
-        'refrigerator', 'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier',
-        'toothbrush'
-    ]
-    
-    # Run YOLO detection
-    results = model(frame_bgr, conf=confidence, verbose=False)
-    
-    if not results or len(results) == 0:
-        return None, frame_bgr
+    # Only look for bottles
+    best_bottle = detections.best(bottle_ids, confidence)
     
-    # Get detections from first result
-    result = results[0]
-    annotated_frame = result.plot()
+    return best_bottle, detections.annotated() if annotate else None
+
+
+class ColorBlobDetector:
+    """
+    Single-pass multi-color blob detection.
     
-    # Find bottle specifically
-    best_bottle = None
-    best_confidence = 0
+    The frame is converted to HSV once. Each HSV range is a box, so membership
+    splits per channel: a 256-entry lookup table per channel maps H, S and V to
+    bitmasks of the ranges that contain them, and ANDing the three gives every
+    range a pixel falls in. A second table turns those bits into one color
+    label per pixel, the label image is median-filtered once, and a single
+    connectedComponentsWithStats pass splits all colors into blobs.
     
-    if result.boxes is not None and len(result.boxes) > 0:
-        for box in result.boxes:
-            cls_id = int(box.cls[0])
-            conf = float(box.conf[0])
-            
-            if cls_id < len(coco_classes):
-                detected_label = coco_classes[cls_id]
-                
-                # Only look for bottles
-                if detected_label == 'bottle':
-                    if conf > best_confidence:
-                        best_confidence = conf
-                        # Get bounding box coordinates
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        x, y, w, h = int(x1), int(y1), int(x2 - x1), int(y2 - y1)
-                        cx, cy = x + w // 2, y + h // 2
-                        best_bottle = {
-                            "cx": cx,
-                            "cy": cy,
-                            "bbox": (x, y, w, h),
-                            "label": detected_label,
-                            "confidence": conf
-                        }
-    
-    return best_bottle, annotated_frame
+    Where ranges overlap on a boundary value (e.g. hue 10 is both red and
+    orange) the label image gives the pixel to the color listed first in
+    color_ranges. Single-color lookups (find, color_mask) use only that
+    color's own range bits, so such a pixel counts for every color it matches.
+    """
+    
+    def __init__(self, color_ranges=None):
+        """
+        Args:
+            color_ranges: Dict of color -> (lower, upper) HSV range, or
+                          (lower1, upper1, lower2, upper2) for two ranges
+                          (default: COLOR_RANGES)
+        """
+        self.color_ranges = dict(color_ranges or COLOR_RANGES)
+        self.colors = list(self.color_ranges)
+        
+        # Each (lower, upper) box gets one bit
+        boxes = []
+        for label, color in enumerate(self.colors, 1):
+            ranges = self.color_ranges[color]
+            for i in range(0, len(ranges), 2):
+                boxes.append((label, ranges[i], ranges[i + 1]))
+        if len(boxes) > 8:
+            raise ValueError("ColorBlobDetector supports at most 8 HSV ranges")
+        
+        values = np.arange(256)
+        channel_luts = [np.zeros(256, dtype=np.uint8) for _ in range(3)]
+        for bit, (label, lower, upper) in enumerate(boxes):
+            for channel in range(3):
+                inside = (values >= lower[channel]) & (values <= upper[channel])
+                channel_luts[channel][inside] |= 1 << bit
+        
+        # Pixels in several ranges go to the first color (lowest label)
+        bits_to_label = np.zeros(256, dtype=np.uint8)
+        for bits in range(1, 256):
+            labels = [label for bit, (label, _, _) in enumerate(boxes) if bits & (1 << bit)]
+            if labels:
+                bits_to_label[bits] = min(labels)
+        
+        # Per color: bits -> 255 if any of its own ranges is set (like cv2.inRange)
+        color_luts = {}
+        for label, color in enumerate(self.colors, 1):
+            own = sum(1 << bit for bit, box in enumerate(boxes) if box[0] == label)
+            color_luts[color] = np.where(np.arange(256) & own, 255, 0).astype(np.uint8)
+        
+        # Background -> 255 so a min filter finds the smallest *color* label nearby
+        background_high = np.arange(256, dtype=np.uint8)
+        background_high[0] = 255
+        
+        self._channel_luts = channel_luts
+        self._bits_to_label = bits_to_label
+        self._color_luts = color_luts
+        self._background_high = background_high
+        self._kernel = np.ones((3, 3), dtype=np.uint8)
+    
+    def label_image(self, frame_bgr, blur=5):
+        """
+        Compute the cleaned-up color label image for a frame.
+        
+        Args:
+            frame_bgr: Input frame in BGR format
+            blur: Median filter size (0 to disable)
+        
+        Returns:
+            np.ndarray: uint8 image, 0 = no color, i = self.colors[i - 1]
+        """
+        labels = cv2.LUT(self._range_bits(frame_bgr), self._bits_to_label)
+        
+        # Median of a label image matches the per-mask median wherever at most
+        # two labels meet, so one filter cleans up every color at once
+        if blur:
+            labels = cv2.medianBlur(labels, blur)
+        return labels
+    
+    def _range_bits(self, frame_bgr):
+        """Bitmask image of every HSV range each pixel falls in."""
+        hsv = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2HSV)
+        h_lut, s_lut, v_lut = self._channel_luts
+        h, s, v = cv2.split(hsv)
+        bits = cv2.bitwise_and(cv2.LUT(h, h_lut), cv2.LUT(s, s_lut))
+        return cv2.bitwise_and(bits, cv2.LUT(v, v_lut))
+    
+    def color_mask(self, frame_bgr, color, blur=5):
+        """
+        Compute one color's cleaned-up 0/255 mask from its own HSV ranges,
+        regardless of overlaps with other colors (same as cv2.inRange per range).
+        
+        Args:
+            frame_bgr: Input frame in BGR format
+            color: Configured color name
+            blur: Median filter size (0 to disable)
+        
+        Returns:
+            np.ndarray: uint8 mask
+        """
+        mask = cv2.LUT(self._range_bits(frame_bgr), self._color_luts[color])
+        if blur:
+            mask = cv2.medianBlur(mask, blur)
+        return mask
+    
+    def find(self, frame_bgr, color, min_area=500):
+        """
+        Find the blobs of one color, using color_mask.
+        
+        Args:
+            frame_bgr: Input frame in BGR format
+            color: Configured color name
+            min_area: Minimum blob area in pixels (default: 500)
+        
+        Returns:
+            tuple: (list of blobs sorted by area (largest first), mask image)
+        """
+        mask = self.color_mask(frame_bgr, color)
+        if cv2.countNonZero(mask) < min_area:
+            return [], mask
+        _, keep, stats, centroids = self._components(mask, min_area)
+        return [self._blob(stats, centroids, index, color) for index in keep], mask
+    
+    def _separate_colors(self, labels):
+        """
+        Foreground mask where touching blobs of different colors don't connect.
+        
+        Pixels with a different color label in their 3x3 neighborhood are
+        dropped, so one connected-components pass never merges two colors.
+        """
+        nearest_low = cv2.erode(cv2.LUT(labels, self._background_high), self._kernel)
+        nearest_high = cv2.dilate(labels, self._kernel)
+        mask = cv2.compare(labels, 0, cv2.CMP_GT)
+        mask[nearest_low != nearest_high] = 0
+        return mask
+    
+    @staticmethod
+    def _components(mask, min_area):
+        """Connected components above min_area, largest first."""
+        n, components, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(
+            mask, 8, cv2.CV_32S, cv2.CCL_BBDT)
+        # Row 0 is the background component
+        keep = np.flatnonzero(stats[1:, cv2.CC_STAT_AREA] >= min_area) + 1
+        keep = keep[np.argsort(-stats[keep, cv2.CC_STAT_AREA], kind="stable")]
+        return components, keep, stats, centroids
+    
+    @staticmethod
+    def _blob(stats, centroids, index, color):
+        x, y, w, h, area = stats[index].tolist()
+        cx, cy = centroids[index].tolist()
+        return {
+            "cx": int(round(cx)),
+            "cy": int(round(cy)),
+            "bbox": (x, y, w, h),
+            "area": area,
+            "label": color
+        }
+    
+    def detect(self, frame_bgr, colors=None, min_area=500, labels=None):
+        """
+        Find every blob of every requested color.
+        
+        Args:
+            frame_bgr: Input frame in BGR format
+            colors: Colors to report (default: all configured colors)
+            min_area: Minimum blob area in pixels (default: 500)
+            labels: Precomputed label_image() output to reuse
+        
+        Returns:
+            tuple: (dict of color -> list of blobs sorted by area (largest first),
+                    label image). Each blob has 'cx', 'cy', 'bbox', 'area', 'label'.
+        """
+        if labels is None:
+            labels = self.label_image(frame_bgr)
+        if colors is None:
+            colors = self.colors
+        
+        blobs = {color: [] for color in colors}
+        wanted = [color for color in colors if color in self.color_ranges]
+        
+        if len(wanted) == 1:
+            # One color: its own mask, no need to separate touching colors
+            color = wanted[0]
+            mask = self.mask(labels, color)
+            if cv2.countNonZero(mask) < min_area:
+                return blobs, labels
+            _, keep, stats, centroids = self._components(mask, min_area)
+            blobs[color] = [self._blob(stats, centroids, index, color) for index in keep]
+            return blobs, labels
+        
+        # All colors at once: one components pass over the combined mask
+        components, keep, stats, centroids = self._components(self._separate_colors(labels), min_area)
+        for index in keep:
+            # Any pixel of the component tells us its color; use one on its top row
+            x, y, w = stats[index, cv2.CC_STAT_LEFT], stats[index, cv2.CC_STAT_TOP], stats[index, cv2.CC_STAT_WIDTH]
+            row = components[y, x:x + w]
+            color = self.colors[labels[y, x + int(np.argmax(row == index))] - 1]
+            if color in blobs:
+                blobs[color].append(self._blob(stats, centroids, index, color))
+        
+        return blobs, labels
+    
+    def mask(self, labels, color):
+        """Get the 0/255 mask of one color from a label image."""
+        return cv2.compare(labels, self.colors.index(color) + 1, cv2.CMP_EQ)
+
+
+_color_detector = None
+
+
+def _get_color_detector():
+    """Lazy-build the default color detector (lookup tables are built once)."""
+    global _color_detector
+    if _color_detector is None:
+        _color_detector = ColorBlobDetector(COLOR_RANGES)
+    return _color_detector
+
+
+def detect_colors(frame_bgr, colors=None, min_area=500):
+    """
+    Find all blobs of several colors in one pass.
+    
+    Args:
+        frame_bgr: Input frame in BGR format
+        colors: List of colors to detect (default: all in COLOR_RANGES)
+        min_area: Minimum blob area in pixels (default: 500)
+    
+    Returns:
+        tuple: (dict of color -> list of dicts with 'cx', 'cy', 'bbox', 'area', 'label'
+                keys, largest first; label image)
+    """
+    return _get_color_detector().detect(frame_bgr, colors, min_area)
 
 
 def find_by_color(frame_bgr, color="black", min_area=500):
@@ -99,63 +564,25 @@ def find_by_color(frame_bgr, color="black", min_area=500):
     Args:
         frame_bgr: Input frame in BGR format
         color: Color to detect ("red", "black", "green", etc.)
-        min_area: Minimum contour area to consider (default: 500 pixels)
+        min_area: Minimum blob area to consider (default: 500 pixels)
     
     Returns:
-        tuple: (dict with 'cx', 'cy', 'bbox' keys, mask image) or (None, mask) if not found
-    """
-    # Convert BGR to HSV
-    hsv = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2HSV)
-    
-    # Define HSV ranges for different colors
-    color_ranges = {
-        "black": ((0, 0, 0), (179, 255, 50)),
-        "red": ((0, 120, 100), (10, 255, 255), (170, 120, 100), (179, 255, 255)),
-        "green": ((40, 50, 50), (80, 255, 255)),
-        "blue": ((100, 50, 50), (130, 255, 255)),
-        "yellow": ((20, 50, 50), (30, 255, 255)),
-        "orange": ((10, 50, 50), (20, 255, 255)),
-    }
-    
-    if color not in color_ranges:
+        tuple: (dict with 'cx', 'cy', 'bbox', 'area' keys, mask image) or (None, mask) if not found
+    """
+    if color not in COLOR_RANGES:
         # Default to black
         color = "black"
     
-    ranges = color_ranges[color]
+    # Own ranges only: a hue shared with another color still counts for this one
+    blobs, mask = _get_color_detector().find(frame_bgr, color, min_area)
     
-    # Create mask
-    if len(ranges) == 2:
-        # Single range
-        mask = cv2.inRange(hsv, ranges[0], ranges[1])
-    else:
-        # Two ranges (for red)
-        mask1 = cv2.inRange(hsv, ranges[0], ranges[1])
-        mask2 = cv2.inRange(hsv, ranges[2], ranges[3])
-        mask = cv2.bitwise_or(mask1, mask2)
-    
-    # Clean up mask
-    mask = cv2.medianBlur(mask, 5)
-    
-    # Find contours
-    cnts, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    if not cnts:
-        return None, mask
-    
-    # Find largest contour
-    c = max(cnts, key=cv2.contourArea)
-    
-    if cv2.contourArea(c) < min_area:
+    if not blobs:
         return None, mask
     
-    # Get bounding box and centroid
-    x, y, w, h = cv2.boundingRect(c)
-    cx, cy = x + w // 2, y + h // 2
-    
-    return {"cx": cx, "cy": cy, "bbox": (x, y, w, h), "label": color}, mask
+    return blobs[0], mask
 
 
-def find_by_label(frame_bgr, label, confidence=0.25):
+def find_by_label(frame_bgr, label, confidence=0.25, frame_id=None, annotate=False):
     """
     Find the centroid and bounding box of a specific object by label using YOLO.
     
@@ -163,145 +590,43 @@ def find_by_label(frame_bgr, label, confidence=0.25):
         frame_bgr: Input frame in BGR format
         label: Object label to detect (e.g., "apple", "bottle", "cup")
         confidence: Minimum confidence threshold (default: 0.25)
+        frame_id: Optional frame sequence number for sharing inference
+        annotate: Draw YOLO boxes on a copy of the frame (default: False)
     
     Returns:
-        tuple: (dict with 'cx', 'cy', 'bbox', 'label' keys, annotated frame) or (None, frame) if not found
+        tuple: (dict with 'cx', 'cy', 'bbox', 'label' keys, annotated frame) or (None, annotated frame) if not found.
+               The annotated frame is None unless annotate=True.
     """
-    model = _get_yolo_model()
-    
-    # Map common labels to COCO class names
-    label_map = {
-        "apple": "apple",
-        "bottle": "bottle",
-        "marker": "marker",  # Not in COCO, will try other names
-        "cube": "cube",  # Not in COCO
-        "block": "block",  # Not in COCO
-        "cap": "bottle",  # Approximate
-        "screw": "screwdriver",  # Approximate
-    }
-    
-    # COCO class names (YOLO uses COCO dataset)
-    coco_classes = [
-        'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
-        'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat',
-        'dog', 'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack',
-        'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball',
-        'kite', 'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket',
-        'bottle', 'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple',
-        'sandwich', 'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake',
-        'chair', 'couch', 'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop',
-        'mouse', 'remote', 'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink',
-        'refrigerator', 'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier',
-        'toothbrush'
-    ]
-    
-    # Normalize label
-    label_lower = label.lower()
-    if label_lower in label_map:
-        search_label = label_map[label_lower]
-    else:
-        search_label = label_lower
-    
-    # Run YOLO detection
-    results = model(frame_bgr, conf=confidence, verbose=False)
+    class_ids = class_ids_for_label(label)
+    if not class_ids:
+        # Label is not a COCO class, no point running the model
+        return None, frame_bgr if annotate else None
     
-    if not results or len(results) == 0:
-        return None, frame_bgr
-    
-    # Get detections from first result
-    result = results[0]
-    annotated_frame = result.plot()
+    detections = get_frame_detections(frame_bgr, confidence, frame_id, classes=class_ids)
+    best_match = detections.best(class_ids, confidence)
     
-    # Find matching object
-    best_match = None
-    best_confidence = 0
-    
-    if result.boxes is not None and len(result.boxes) > 0:
-        for box in result.boxes:
-            cls_id = int(box.cls[0])
-            conf = float(box.conf[0])
-            
-            if cls_id < len(coco_classes):
-                detected_label = coco_classes[cls_id]
-                
-                # Check if this matches our target label
-                if search_label in detected_label or detected_label in search_label:
-                    if conf > best_confidence:
-                        best_confidence = conf
-                        # Get bounding box coordinates
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        x, y, w, h = int(x1), int(y1), int(x2 - x1), int(y2 - y1)
-                        cx, cy = x + w // 2, y + h // 2
-                        best_match = {
-                            "cx": cx,
-                            "cy": cy,
-                            "bbox": (x, y, w, h),
-                            "label": detected_label,
-                            "confidence": conf
-                        }
-    
-    return best_match, annotated_frame
-
-
-def detect_all_objects(frame_bgr, confidence=0.25):
+    return best_match, detections.annotated() if annotate else None
+
+
+@profiling.timed("detect_all_objects")
+def detect_all_objects(frame_bgr, confidence=0.25, frame_id=None, annotate=False):
     """
     Detect all objects in the frame using YOLO.
     
     Args:
         frame_bgr: Input frame in BGR format
         confidence: Minimum confidence threshold (default: 0.25)
+        frame_id: Optional frame sequence number for sharing inference
+        annotate: Draw YOLO boxes on a copy of the frame (default: False)
     
     Returns:
-        tuple: (list of detections, annotated frame)
+        tuple: (list of detections, annotated frame or None unless annotate=True)
     """
-    model = _get_yolo_model()
-    
-    # COCO class names
-    coco_classes = [
-        'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
-        'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat',
-        'dog', 'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack',
-        'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball',
-        'kite', 'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket',
-        'bottle', 'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple',
-        'sandwich', 'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake',
-        'chair', 'couch', 'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop',
-        'mouse', 'remote', 'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink',
-        'refrigerator', 'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier',
-        'toothbrush'
-    ]
-    
-    results = model(frame_bgr, conf=confidence, verbose=False)
-    
-    detections = []
-    annotated_frame = frame_bgr.copy()
-    
-    if results and len(results) > 0:
-        result = results[0]
-        annotated_frame = result.plot()
-        
-        if result.boxes is not None and len(result.boxes) > 0:
-            for box in result.boxes:
-                cls_id = int(box.cls[0])
-                conf = float(box.conf[0])
-                
-                if cls_id < len(coco_classes):
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    x, y, w, h = int(x1), int(y1), int(x2 - x1), int(y2 - y1)
-                    cx, cy = x + w // 2, y + h // 2
-                    
-                    detections.append({
-                        "cx": cx,
-                        "cy": cy,
-                        "bbox": (x, y, w, h),
-                        "label": coco_classes[cls_id],
-                        "confidence": conf
-                    })
-    
-    return detections, annotated_frame
-
-
-def find_object(frame_bgr, target_type, target_value=None, confidence=0.25):
+    detections = get_frame_detections(frame_bgr, confidence, frame_id)
+    return detections.all(confidence), detections.annotated() if annotate else None
+
+
+def find_object(frame_bgr, target_type, target_value=None, confidence=0.25, frame_id=None, annotate=False):
     """
     Unified function to find objects by color or label.
     
@@ -310,13 +635,407 @@ def find_object(frame_bgr, target_type, target_value=None, confidence=0.25):
         target_type: "color" or "label"
         target_value: Color name or object label
         confidence: Minimum confidence for label detection
+        frame_id: Optional frame sequence number for sharing inference
+        annotate: For label detection, draw YOLO boxes (default: False)
     
     Returns:
-        tuple: (detection dict, processed frame)
+        tuple: (detection dict, processed frame). For label detection the
+               frame is None unless annotate=True; color detection always
+               returns its mask.
     """
     if target_type == "color":
         return find_by_color(frame_bgr, target_value)
     elif target_type == "label":
-        return find_by_label(frame_bgr, target_value, confidence)
+        return find_by_label(frame_bgr, target_value, confidence, frame_id, annotate)
     else:
         return None, frame_bgr
+
+
+def box_iou(boxes_a, boxes_b):
+    """
+    IoU matrix between two sets of boxes.
+    
+    Args:
+        boxes_a: (N, 4) array of x1, y1, x2, y2
+        boxes_b: (M, 4) array of x1, y1, x2, y2
+    
+    Returns:
+        np.ndarray: (N, M) IoU values
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+class Track:
+    """
+    One tracked object with a constant-velocity Kalman filter on its box.
+    
+    State is (cx, cy, w, h) plus their velocities in pixels per frame.
+    """
+    
+    def __init__(self, track_id, xyxy, label, confidence):
+        self.id = track_id
+        self.label = label
+        self.confidence = confidence
+        self.hits = 1
+        self.missed = 0
+        
+        kf = cv2.KalmanFilter(8, 4)
+        kf.transitionMatrix = np.eye(8, dtype=np.float32)
+        kf.transitionMatrix[:4, 4:] = np.eye(4, dtype=np.float32)
+        kf.measurementMatrix = np.eye(4, 8, dtype=np.float32)
+        kf.processNoiseCov = np.diag([1, 1, 1, 1, 0.5, 0.5, 0.1, 0.1]).astype(np.float32)
+        kf.measurementNoiseCov = np.eye(4, dtype=np.float32) * 4
+        kf.errorCovPost = np.diag([10, 10, 10, 10, 100, 100, 100, 100]).astype(np.float32)
+        kf.statePost = np.zeros((8, 1), dtype=np.float32)
+        kf.statePost[:4, 0] = self._to_cxcywh(xyxy)
+        self.kf = kf
+    
+    @staticmethod
+    def _to_cxcywh(xyxy):
+        x1, y1, x2, y2 = xyxy
+        return [(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1]
+    
+    @property
+    def xyxy(self):
+        """Current box estimate as (x1, y1, x2, y2)."""
+        cx, cy, w, h = self.kf.statePost[:4, 0]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], dtype=np.float32)
+    
+    def predict(self):
+        """Advance the filter one frame and return the predicted box."""
+        # OpenCV copies the prediction into statePost until a correction arrives
+        self.kf.predict()
+        return self.xyxy
+    
+    def update(self, xyxy, confidence):
+        """Correct the filter with a matched detection."""
+        self.kf.correct(np.array(self._to_cxcywh(xyxy), dtype=np.float32).reshape(4, 1))
+        self.confidence = confidence
+        self.hits += 1
+        self.missed = 0
+    
+    def to_detection(self):
+        """Track as a detection dict (same keys as find_cup plus 'track_id')."""
+        x1, y1, x2, y2 = self.xyxy.tolist()
+        x, y, w, h = int(x1), int(y1), int(x2 - x1), int(y2 - y1)
+        return {
+            "cx": x + w // 2,
+            "cy": y + h // 2,
+            "bbox": (x, y, w, h),
+            "label": self.label,
+            "confidence": self.confidence,
+            "track_id": self.id
+        }
+
+
+class ObjectTracker:
+    """
+    IoU tracker assigning stable IDs to detections across frames.
+    
+    Each frame, tracks are predicted forward with their Kalman filter and
+    greedily matched to same-label detections by IoU.
+    """
+    
+    def __init__(self, iou_threshold=0.3, max_missed=5):
+        """
+        Args:
+            iou_threshold: Minimum IoU to match a detection to a track
+            max_missed: Frames a track may go unmatched before it is dropped
+        """
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks = []
+        self._next_id = 1
+    
+    def predict(self):
+        """Predict every track one frame ahead."""
+        return [track.predict() for track in self.tracks]
+    
+    def update(self, xyxy, conf, labels, create=True):
+        """
+        Match detections to the (already predicted) tracks.
+        
+        Args:
+            xyxy: (N, 4) detection boxes
+            conf: (N,) detection confidences
+            labels: List of N detection labels
+            create: Start new tracks for unmatched detections
+        
+        Returns:
+            int: Number of tracks dropped this frame
+        """
+        matched_tracks = set()
+        matched_dets = set()
+        
+        if self.tracks and len(conf):
+            ious = box_iou(np.array([track.xyxy for track in self.tracks]), xyxy)
+            for t, track in enumerate(self.tracks):
+                for d, label in enumerate(labels):
+                    if label != track.label:
+                        ious[t, d] = 0
+            
+            # Greedy matching, best pairs first
+            while True:
+                t, d = np.unravel_index(np.argmax(ious), ious.shape)
+                if ious[t, d] < self.iou_threshold:
+                    break
+                self.tracks[t].update(xyxy[d], float(conf[d]))
+                matched_tracks.add(t)
+                matched_dets.add(d)
+                ious[t, :] = 0
+                ious[:, d] = 0
+        
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+        
+        before = len(self.tracks)
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+        dropped = before - len(self.tracks)
+        
+        if create:
+            for d in range(len(conf)):
+                if d not in matched_dets:
+                    self.tracks.append(Track(self._next_id, xyxy[d], labels[d], float(conf[d])))
+                    self._next_id += 1
+        
+        return dropped
+
+
+class TrackingDetector:
+    """
+    Region-of-interest tracking mode for YOLO.
+    
+    After an initial full-frame detection, YOLO only runs on a padded crop
+    around each track, at a network size matched to the crop. Full-frame
+    detection runs again every redetect_interval frames, whenever a track is
+    lost, and for free whenever this frame's full detections are already
+    cached (e.g. because detect_all_objects ran on it).
+    """
+    
+    def __init__(self, classes=None, confidence=0.25, redetect_interval=15, padding=0.5,
+                 min_crop=160, max_crop_fraction=0.5, iou_threshold=0.3, max_missed=5):
+        """
+        Args:
+            classes: COCO class ids to track (default: all)
+            confidence: Minimum detection confidence
+            redetect_interval: Force a full-frame detection every N frames
+            padding: Crop padding as a fraction of the track's larger side
+            min_crop: Minimum crop side in pixels
+            max_crop_fraction: Run full-frame instead once crops cover more
+                               than this fraction of the frame
+            iou_threshold: Minimum IoU to match a detection to a track
+            max_missed: Frames a track may go unmatched before it is dropped
+        """
+        self.classes = tuple(classes) if classes is not None else None
+        self.confidence = confidence
+        self.redetect_interval = redetect_interval
+        self.padding = padding
+        self.min_crop = min_crop
+        self.max_crop_fraction = max_crop_fraction
+        self.tracker = ObjectTracker(iou_threshold, max_missed)
+        self._frames_since_full = None
+        self._lost_track = False
+        self.full_frame_runs = 0
+        self.crop_runs = 0
+    
+    def _crop_region(self, xyxy, frame_shape):
+        """Padded crop (x0, y0, x1, y1) around a box, clipped to the frame."""
+        frame_h, frame_w = frame_shape[:2]
+        x1, y1, x2, y2 = xyxy
+        side = max(x2 - x1, y2 - y1)
+        pad = side * self.padding
+        half_w = max((x2 - x1) / 2 + pad, self.min_crop / 2)
+        half_h = max((y2 - y1) / 2 + pad, self.min_crop / 2)
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        x0 = int(max(0, cx - half_w))
+        y0 = int(max(0, cy - half_h))
+        x1 = int(min(frame_w, cx + half_w))
+        y1 = int(min(frame_h, cy + half_h))
+        return x0, y0, x1, y1
+    
+    def _full_frame(self, frame_bgr, frame_id):
+        """Full-frame detections as (xyxy, conf, labels)."""
+        detections = get_frame_detections(frame_bgr, self.confidence, frame_id, self.classes)
+        keep = detections._mask(self.classes, self.confidence)
+        self.full_frame_runs += 1
+        self._frames_since_full = 0
+        labels = [COCO_CLASSES[cls_id] for cls_id in detections.cls[keep].tolist()]
+        return detections.xyxy[keep], detections.conf[keep], labels
+    
+    def _crops(self, frame_bgr, predicted):
+        """Run YOLO on a crop around each predicted track box."""
+        model = _get_yolo_model()
+        all_xyxy, all_conf, all_labels = [], [], []
+        
+        for track, box in zip(self.tracker.tracks, predicted):
+            x0, y0, x1, y1 = self._crop_region(box, frame_bgr.shape)
+            if x1 - x0 < 8 or y1 - y0 < 8:
+                continue
+            crop = frame_bgr[y0:y1, x0:x1]
+            # Network size: crop's larger side rounded up to the model stride
+            imgsz = min(640, int(np.ceil(max(x1 - x0, y1 - y0) / 32) * 32))
+            result = model.predict(crop, conf=self.confidence,
+                                   classes=[COCO_CLASS_IDS[track.label]], imgsz=imgsz)
+            self.crop_runs += 1
+            if len(result) == 0:
+                continue
+            # Map crop coordinates back to the full frame
+            all_xyxy.append(result.xyxy + np.array([x0, y0, x0, y0], dtype=np.float32))
+            all_conf.append(result.conf)
+            all_labels.extend(COCO_CLASSES[cls_id] for cls_id in result.cls.tolist())
+        
+        if not all_conf:
+            return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), []
+        return np.concatenate(all_xyxy), np.concatenate(all_conf), all_labels
+    
+    def _crop_area_fraction(self, predicted, frame_shape):
+        frame_area = frame_shape[0] * frame_shape[1]
+        area = 0
+        for box in predicted:
+            x0, y0, x1, y1 = self._crop_region(box, frame_shape)
+            area += (x1 - x0) * (y1 - y0)
+        return area / frame_area
+    
+    @profiling.timed("track_bottle")
+    def update(self, frame_bgr, frame_id=None):
+        """
+        Detect and track objects in the next frame.
+        
+        Args:
+            frame_bgr: Input frame in BGR format
+            frame_id: Optional frame sequence number for sharing inference
+        
+        Returns:
+            list: Detection dicts for current tracks (with 'track_id'),
+                  highest confidence first
+        """
+        predicted = self.tracker.predict()
+        
+        full_cached = (_frame_detections is not None and
+                       _frame_detections.matches(frame_bgr, self.confidence, frame_id, self.classes))
+        need_full = (
+            full_cached or
+            not self.tracker.tracks or
+            self._lost_track or
+            self._frames_since_full is None or
+            self._frames_since_full >= self.redetect_interval or
+            self._crop_area_fraction(predicted, frame_bgr.shape) > self.max_crop_fraction
+        )
+        
+        if need_full:
+            xyxy, conf, labels = self._full_frame(frame_bgr, frame_id)
+            self.tracker.update(xyxy, conf, labels, create=True)
+            self._lost_track = False
+        else:
+            xyxy, conf, labels = self._crops(frame_bgr, predicted)
+            self._frames_since_full += 1
+            # A missed track triggers full-frame re-detection next frame
+            dropped = self.tracker.update(xyxy, conf, labels, create=False)
+            self._lost_track = dropped > 0 or any(track.missed for track in self.tracker.tracks)
+        
+        detections = [track.to_detection() for track in self.tracker.tracks if track.missed == 0]
+        detections.sort(key=lambda det: det["confidence"], reverse=True)
+        return detections
+    
+    def reset(self):
+        """Drop all tracks and force full-frame detection on the next frame."""
+        self.tracker = ObjectTracker(self.tracker.iou_threshold, self.tracker.max_missed)
+        self._frames_since_full = None
+        self._lost_track = False
+
+
+class MotionGate:
+    """
+    Cheap change detector that decides whether a frame needs new inference.
+    
+    Frames are shrunk to a small blurred grayscale thumbnail and compared with
+    the thumbnail from the last frame that ran inference. If few enough
+    pixels changed, the caller can reuse its previous detections. Comparing
+    against the last *inferred* frame (not the previous frame) means slow
+    drift still adds up and triggers a refresh. A refresh is also forced once
+    the cached result is older than max_age seconds.
+    """
+    
+    def __init__(self, thumb_width=80, pixel_threshold=12, changed_fraction=0.002, max_age=2.0):
+        """
+        Args:
+            thumb_width: Width of the comparison thumbnail in pixels
+            pixel_threshold: Gray-level difference that counts as a change
+            changed_fraction: Fraction of changed thumbnail pixels that
+                              triggers inference
+            max_age: Force inference after this many seconds (None = never)
+        """
+        self.thumb_width = thumb_width
+        self.pixel_threshold = pixel_threshold
+        self.changed_fraction = changed_fraction
+        self.max_age = max_age
+        self.executed = 0
+        self.skipped = 0
+        self._reference = None
+        self._reference_time = None
+    
+    def _thumbnail(self, frame_bgr):
+        h, w = frame_bgr.shape[:2]
+        thumb_height = max(1, int(round(h * self.thumb_width / w)))
+        small = cv2.resize(frame_bgr, (self.thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (3, 3), 0)
+    
+    def check(self, frame_bgr, now=None):
+        """
+        Decide whether a frame needs inference, and count the decision.
+        
+        Args:
+            frame_bgr: Input frame in BGR format
+            now: Current time in seconds (default: time.monotonic())
+        
+        Returns:
+            bool: True to run inference, False to reuse the previous result
+        """
+        if now is None:
+            now = time.monotonic()
+        thumb = self._thumbnail(frame_bgr)
+        
+        run = (
+            self._reference is None or
+            self._reference.shape != thumb.shape or
+            (self.max_age is not None and now - self._reference_time >= self.max_age)
+        )
+        if not run:
+            diff = cv2.absdiff(thumb, self._reference)
+            _, changed = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+            run = cv2.countNonZero(changed) > self.changed_fraction * changed.size
+        
+        if run:
+            self._reference = thumb
+            self._reference_time = now
+            self.executed += 1
+        else:
+            self.skipped += 1
+        return run
+    
+    def invalidate(self):
+        """Force inference on the next frame (e.g. after the arm moved)."""
+        self._reference = None
+    
+    def stats(self):
+        """
+        Get inference counters.
+        
+        Returns:
+            dict: 'executed', 'skipped' and 'skip_ratio'
+        """
+        total = self.executed + self.skipped
+        return {
+            "executed": self.executed,
+            "skipped": self.skipped,
+            "skip_ratio": self.skipped / total if total else 0.0
+        }
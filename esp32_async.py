@@ -0,0 +1,496 @@
+"""
+asyncio ESP32 controller.
+Same wire protocols as ESP32Controller (JSON lines or binary frames, acks
+matched by seq), but every operation is a coroutine on non-blocking serial
+I/O: reads are driven by the event loop watching the port (no reader
+thread), writes never block and acks are asyncio futures. The vision loop,
+a task scheduler and several arms can then share one event loop.
+
+Usage:
+    async with AsyncESP32Controller("/dev/ttyUSB0", protocol="auto") as arm:
+        ack = await arm.set_servos(1500, 1200, 2100)
+        async for item in arm.telemetry():
+            print(item)
+"""
+import asyncio
+import json
+import os
+import time
+
+import serial
+
+import profiling
+from esp32_control import (
+    ACK_TIMEOUT, HANDSHAKE_DEADLINE, HANDSHAKE_TIMEOUT, PROTOCOL_VERSION, PROTOCOLS, READER_POLL_INTERVAL,
+    RESPONSE_QUEUE_SIZE, SERIAL_ACKS, SERIAL_BYTES_RECEIVED, SERIAL_BYTES_SENT, SERIAL_COMMANDS, SERIAL_ERRORS,
+    SERIAL_NACKS, SERIAL_RECONNECTS, SERIAL_ROUND_TRIP_SECONDS, SERIAL_UNACKED,
+    Ack, FrameDecoder, encode_command, find_esp32_port, is_ack, open_serial, remember_port, reply_seq,
+)
+
+NEGOTIATE_TIMEOUT = 0.5  # Seconds to wait for the firmware's answer to {"op": "proto"}
+
+
+class AsyncESP32Controller:
+    """asyncio controller for one ESP32 robot arm (see module docstring)."""
+
+    def __init__(self, port=None, baud_rate=115200, protocol="json", ack_timeout=ACK_TIMEOUT):
+        """
+        Args:
+            port: Serial port (e.g. '/dev/ttyUSB0'); None auto-detects on connect
+            baud_rate: Serial baud rate
+            protocol: 'json', 'auto' or 'binary' (see ESP32Controller)
+            ack_timeout: Seconds before an unanswered command resolves as unacked
+        """
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown protocol '{protocol}'. Choose from: {', '.join(PROTOCOLS)}")
+        self.port = port
+        self.baud_rate = baud_rate
+        self.protocol = protocol
+        self.ack_timeout = ack_timeout
+        self.active_protocol = "json"
+        self.serial_conn = None
+        self.connected = False
+        self.connect_count = 0
+        self.last_ack_time = None
+
+        self._loop = None
+        self._fd = None
+        self._poll_task = None  # Used instead of add_reader where the loop can't watch the port
+        self._decoder = FrameDecoder()
+        self._out = bytearray()  # Bytes the port didn't take yet (flushed when writable)
+        self._drained = None  # Event set while _out is empty
+        self._subscribers = []  # telemetry() queues
+        self._seq = 0
+        self._pending = {}  # seq -> (Future, write time, JSON mode, expiry handle)
+        self.commands_sent = 0
+        self.acked = 0
+        self.nacked = 0
+        self.unacked = 0
+        self.round_trips = profiling.LatencyRing("serial_round_trip")
+
+    async def connect(self):
+        """
+        Open the port, ping until the ESP32 answers and negotiate the protocol.
+
+        Returns:
+            bool: True if connected successfully, False otherwise
+        """
+        if self.connected:
+            return True
+        self._loop = asyncio.get_running_loop()
+        if self.port is None:
+            self.port = await self._loop.run_in_executor(None, find_esp32_port)
+            if self.port is None:
+                print("Error: Could not find ESP32. Please specify port manually.")
+                return False
+
+        try:
+            print(f"Connecting to ESP32 on {self.port} at {self.baud_rate} baud...")
+            start = time.monotonic()
+            # timeout=0: reads return whatever is buffered, never wait
+            self.serial_conn = open_serial(self.port, self.baud_rate, 0, 0)
+        except serial.SerialException as e:
+            SERIAL_ERRORS.inc(stage="connect")
+            print(f"Error connecting to ESP32: {e}")
+            return False
+
+        self.connected = True
+        self._decoder = FrameDecoder()
+        self._out.clear()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._start_reading()
+        self.active_protocol = "json"
+        if not await self._handshake():
+            print(f"Error: ESP32 on {self.port} did not answer within {HANDSHAKE_DEADLINE:g}s")
+            self._close()
+            return False
+
+        if self.protocol != "json" and not await self._negotiate_binary():
+            if self.protocol == "binary":
+                print("Error: Firmware does not support the binary protocol")
+                await self.disconnect()
+                return False
+            print("Firmware has no binary protocol support, using JSON")
+        if self.connect_count:
+            SERIAL_RECONNECTS.inc()
+        self.connect_count += 1
+        await self._loop.run_in_executor(None, remember_port, self.port)
+        print(f"Connected to ESP32 successfully! ({self.active_protocol} protocol, "
+              f"ready in {(time.monotonic() - start) * 1000:.0f} ms)")
+        return True
+
+    async def _handshake(self):
+        """Ping with {"op": "test"} until the firmware answers (see ESP32Controller._handshake)."""
+        deadline = time.monotonic() + HANDSHAKE_DEADLINE
+        while time.monotonic() < deadline:
+            future = self.submit({"op": "test"})
+            if future is None:
+                return False
+            try:
+                ack = await asyncio.wait_for(asyncio.shield(future),
+                                             min(HANDSHAKE_TIMEOUT, max(0.0, deadline - time.monotonic())))
+                if ack.ok:
+                    return True
+                await asyncio.sleep(HANDSHAKE_TIMEOUT)  # Rejected (e.g. garbled during boot): try again shortly
+            except asyncio.TimeoutError:
+                # Sent while the ESP32 was still booting: it will never answer, so don't count it as lost
+                for seq, entry in list(self._pending.items()):
+                    if entry[0] is future:
+                        entry[3].cancel()
+                        del self._pending[seq]
+                future.cancel()
+        return False
+
+    async def _negotiate_binary(self):
+        """Ask the firmware to accept binary frames (it keeps accepting JSON too)."""
+        future = self.submit({"op": "proto", "version": PROTOCOL_VERSION})
+        if future is None:
+            return False
+        try:
+            ack = await asyncio.wait_for(asyncio.shield(future), NEGOTIATE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return False
+        if ack.ok and isinstance(ack.response, str) and ack.response.startswith("OK: binary"):
+            self.active_protocol = "binary"
+            return True
+        return False  # Older firmware: "ERROR: Unknown operation - proto"
+
+    async def disconnect(self):
+        """Flush pending writes (briefly), stop reading and close the port."""
+        if self.connected and self._out:
+            try:
+                await asyncio.wait_for(self._drained.wait(), 0.5)
+            except asyncio.TimeoutError:
+                pass
+        self._close()
+        print("Disconnected from ESP32")
+
+    def _close(self):
+        self._stop_reading()
+        if self.serial_conn and self.serial_conn.is_open:
+            self.serial_conn.close()
+        self.connected = False
+        self.active_protocol = "json"
+        self._out.clear()
+        if self._drained:
+            self._drained.set()
+        for seq in list(self._pending):
+            self._expire(seq)
+
+    async def __aenter__(self):
+        if not await self.connect():
+            raise ConnectionError(f"Could not connect to ESP32 on {self.port}")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
+
+    # ----- reading -----
+
+    def _start_reading(self):
+        try:
+            self._fd = self.serial_conn.fileno()
+            self._loop.add_reader(self._fd, self._on_readable)
+        except (OSError, NotImplementedError):
+            # e.g. Windows' proactor loop: poll the port from a task instead
+            self._fd = None
+            self._poll_task = self._loop.create_task(self._poll_port())
+
+    def _stop_reading(self):
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._loop.remove_writer(self._fd)
+            self._fd = None
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+
+    def _on_readable(self):
+        try:
+            data = self.serial_conn.read(self.serial_conn.in_waiting or 1)
+        except Exception as e:
+            self._fail("read", e)
+            return
+        if data:
+            self._receive(data)
+
+    async def _poll_port(self):
+        while self.connected:
+            self._on_readable()
+            if self._out:
+                self._flush()
+            await asyncio.sleep(READER_POLL_INTERVAL)
+
+    def _fail(self, stage, error):
+        SERIAL_ERRORS.inc(stage=stage)
+        print(f"Error {'reading response' if stage == 'read' else 'sending command'}: {error}")
+        self._close()
+
+    def _receive(self, data):
+        """Decode received bytes: count them, resolve acked commands and publish everything."""
+        SERIAL_BYTES_RECEIVED.inc(len(data))
+        now = time.monotonic()
+        for item in self._decoder.feed(data):
+            ok = is_ack(item)
+            if ok:
+                self.last_ack_time = now
+                SERIAL_ACKS.inc()
+            seq = reply_seq(item)
+            if seq is not None:
+                self._resolve(seq, ok, item, now)
+            for queue in self._subscribers:
+                if queue.full():
+                    queue.get_nowait()  # Slow consumer: drop its oldest item
+                queue.put_nowait(item)
+
+    def _resolve(self, seq, ok, item, now):
+        """Complete the pending command a reply answers (the oldest JSON one if the reply has no seq)."""
+        if seq < 0:
+            seq = next((s for s, entry in self._pending.items() if entry[2]), None)
+        entry = self._pending.pop(seq, None)
+        if entry is None:
+            return  # Already expired, or a reply to nothing we sent
+        future, sent, _, expiry = entry
+        expiry.cancel()
+        round_trip = now - sent
+        self.round_trips.record(round_trip)
+        SERIAL_ROUND_TRIP_SECONDS.observe(round_trip)
+        profiling.record("serial_round_trip", round_trip)
+        if ok:
+            self.acked += 1
+        else:
+            self.nacked += 1
+            SERIAL_NACKS.inc()
+        if not future.done():
+            future.set_result(Ack(seq, ok, item, round_trip))
+
+    def _expire(self, seq):
+        entry = self._pending.pop(seq, None)
+        if entry is None:
+            return
+        future, _, _, expiry = entry
+        expiry.cancel()
+        self.unacked += 1
+        SERIAL_UNACKED.inc()
+        if not future.done():
+            future.set_result(Ack(seq, False, None, None))
+
+    async def telemetry(self, maxsize=RESPONSE_QUEUE_SIZE):
+        """
+        Async iterator over everything the ESP32 sends (text lines and Frames),
+        from the moment of the call until disconnect. Each caller gets its own
+        stream; a consumer that falls more than maxsize items behind loses the
+        oldest ones.
+        """
+        queue = asyncio.Queue(maxsize)
+        self._subscribers.append(queue)
+        try:
+            while self.connected or not queue.empty():
+                try:
+                    yield await asyncio.wait_for(queue.get(), READER_POLL_INTERVAL * 10)
+                except asyncio.TimeoutError:
+                    continue
+        finally:
+            self._subscribers.remove(queue)
+
+    # ----- writing -----
+
+    def submit(self, command):
+        """
+        Queue a command for sending without waiting for its reply.
+
+        Args:
+            command: dict with command data
+
+        Returns:
+            asyncio.Future: Resolves to an Ack (ok=False if no reply within
+            ack_timeout, or if 256 newer commands reused its seq first), or None if not connected
+        """
+        if not self.connected:
+            return None
+        self._seq = (self._seq + 1) & 0xFF
+        seq = self._seq
+        data = encode_command(command, seq) if self.active_protocol == "binary" else None
+        json_mode = data is None
+        if json_mode:
+            data = (json.dumps(dict(command, seq=seq)) + '\n').encode('utf-8')
+        self._expire(seq)  # seq wrapped around onto a command that never got its reply
+        future = self._loop.create_future()
+        expiry = self._loop.call_later(self.ack_timeout, self._expire, seq)
+        self._pending[seq] = (future, time.monotonic(), json_mode, expiry)
+
+        self._out += data
+        self._flush()
+        if not self.connected:
+            return None  # Write failed; _close() already resolved the future
+        self.commands_sent += 1
+        SERIAL_BYTES_SENT.inc(len(data))
+        SERIAL_COMMANDS.inc(op=command.get("op", ""))
+        return future
+
+    def _flush(self):
+        """Write as much of the output buffer as the port takes now; the rest goes when it's writable."""
+        try:
+            if self._fd is not None:
+                written = os.write(self._fd, self._out)
+            else:
+                written = self.serial_conn.write(bytes(self._out)) or 0
+        except BlockingIOError:
+            written = 0
+        except Exception as e:
+            self._fail("write", e)
+            return
+        del self._out[:written]
+        if self._out:
+            self._drained.clear()
+            if self._fd is not None:
+                self._loop.add_writer(self._fd, self._on_writable)
+        else:
+            self._drained.set()
+
+    def _on_writable(self):
+        self._flush()
+        if not self._out and self._fd is not None:
+            self._loop.remove_writer(self._fd)
+
+    async def drain(self):
+        """Wait until every queued byte has been handed to the port."""
+        await self._drained.wait()
+
+    async def send_command(self, command, timeout=None):
+        """
+        Send a command and wait for the ESP32's reply.
+
+        Args:
+            command: dict with command data
+            timeout: Seconds to wait (default: ack_timeout)
+
+        Returns:
+            Ack: ok is False if it couldn't be sent, was rejected or got no reply
+        """
+        future = self.submit(command)
+        if future is None:
+            return Ack(None, False, None, None)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return Ack(None, False, None, None)
+
+    def submit_servos(self, base_us, shoulder_us, elbow_us, wrist_us=1500):
+        """Queue a servo update (see submit); returns its ack future, or None if not connected."""
+        return self.submit({
+            "op": "servos",
+            "base": int(base_us),
+            "shoulder": int(shoulder_us),
+            "elbow": int(elbow_us),
+            "wrist": int(wrist_us)
+        })
+
+    async def set_servos(self, base_us, shoulder_us, elbow_us, wrist_us=1500):
+        """
+        Set all servo positions and wait for the ESP32 to confirm.
+
+        Args:
+            base_us, shoulder_us, elbow_us: Servo microseconds (900-2100)
+            wrist_us: Optional, defaults to 1500 (ignored by the firmware)
+
+        Returns:
+            Ack: ok is True once the ESP32 applied the values (response holds the applied values)
+        """
+        future = self.submit_servos(base_us, shoulder_us, elbow_us, wrist_us)
+        if future is None:
+            return Ack(None, False, None, None)
+        return await future
+
+    async def set_servos_from_us_list(self, us_list):
+        """set_servos from [base, shoulder, elbow] or [base, shoulder, elbow, wrist]."""
+        if len(us_list) not in (3, 4):
+            print(f"Error: Expected 3 or 4 servo values, got {len(us_list)}")
+            return Ack(None, False, None, None)
+        return await self.set_servos(*us_list)
+
+    @property
+    def pending_count(self):
+        """Commands sent but not yet acked (or expired)."""
+        return len(self._pending)
+
+    def seconds_since_ack(self):
+        """Seconds since the last OK response, or None if none yet."""
+        if self.last_ack_time is None:
+            return None
+        return time.monotonic() - self.last_ack_time
+
+    def link_stats(self):
+        """Same as ESP32Controller.link_stats."""
+        return {
+            "sent": self.commands_sent,
+            "acked": self.acked,
+            "nacked": self.nacked,
+            "unacked": self.unacked,
+            "pending": self.pending_count,
+            "round_trip": self.round_trips.summary(),
+        }
+
+
+async def run_sequence(arm, steps, start, rate_hz=None, settle=None, **limits):
+    """
+    Run a waypoint sequence as streamed trajectories without blocking the event loop.
+
+    Like trajectory.run_sequence: setpoints go out on absolute deadlines and
+    are not awaited individually; each move ends by awaiting the ack of its
+    final setpoint before the settle time.
+
+    Args:
+        arm: Connected AsyncESP32Controller
+        steps: Sequence steps with 'servos' waypoints (e.g. PICKUP_SEQUENCE)
+        start: Joint positions before the first step
+        rate_hz, settle: Default to trajectory.STREAM_RATE_HZ / WAYPOINT_SETTLE
+        **limits: max_velocity / max_acceleration overrides
+
+    Returns:
+        list: Per step {'elapsed', 'setpoints', 'failed', 'predicted', 'ack'}
+    """
+    from trajectory import STREAM_RATE_HZ, WAYPOINT_SETTLE, sequence_moves
+
+    rate_hz = rate_hz or STREAM_RATE_HZ
+    settle = WAYPOINT_SETTLE if settle is None else settle
+    results = []
+    for step, move in zip(steps, sequence_moves(start, steps, **limits)):
+        begin = time.monotonic()
+        sent = failed = 0
+        future = None
+        for t, setpoint in move.setpoints(rate_hz):
+            delay = begin + t - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            future = arm.submit_servos(*setpoint)
+            failed += future is None
+            sent += 1
+        ack = await future if future is not None else None
+        results.append({"elapsed": time.monotonic() - begin, "setpoints": sent, "failed": failed,
+                        "predicted": move.duration, "ack": ack})
+        await asyncio.sleep(settle + step.get("hold", 0.0))
+    return results
+
+
+async def _demo(ports, protocol):
+    """Connect to every port concurrently, ping each arm and print its link stats."""
+    arms = [AsyncESP32Controller(port, protocol=protocol) for port in ports]
+    connected = await asyncio.gather(*(arm.connect() for arm in arms))
+    arms = [arm for arm, ok in zip(arms, connected) if ok]
+    acks = await asyncio.gather(*(arm.send_command({"op": "test"}) for arm in arms))
+    for arm, ack in zip(arms, acks):
+        rtt = f"{ack.round_trip * 1000:.1f} ms" if ack.round_trip is not None else "no reply"
+        print(f"{arm.port}: {ack.response} ({rtt})")
+    await asyncio.gather(*(arm.disconnect() for arm in arms))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Connect to one or more ESP32 arms on one event loop")
+    parser.add_argument("ports", nargs="*", help="Serial ports (default: auto-detect one)")
+    parser.add_argument("--protocol", choices=PROTOCOLS, default="json")
+    args = parser.parse_args()
+    asyncio.run(_demo(args.ports or [None], args.protocol))
@@ -4,15 +4,333 @@ Handles communication between Python and ESP32 for servo control.
 """
 import serial
 import serial.tools.list_ports
+import binascii
 import json
+import os
+import re
+import struct
+import threading
 import time
 import sys
+from collections import deque, namedtuple
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import metrics
+import profiling
+
+# Serial link metrics (scraped via metrics.MetricsServer)
+SERIAL_BYTES_SENT = metrics.counter("aura_serial_bytes_sent_total", "Bytes written to the ESP32")
+SERIAL_BYTES_RECEIVED = metrics.counter("aura_serial_bytes_received_total", "Bytes read from the ESP32")
+SERIAL_COMMANDS = metrics.counter("aura_serial_commands_total", "Commands sent to the ESP32", labels=("op",))
+SERIAL_ERRORS = metrics.counter("aura_serial_errors_total", "Serial connect/write/read failures", labels=("stage",))
+SERIAL_RECONNECTS = metrics.counter("aura_serial_reconnects_total", "Successful reconnects after the first connect")
+SERIAL_ACKS = metrics.counter("aura_serial_acks_total", "OK responses received from the ESP32")
+SERIAL_FRAME_ERRORS = metrics.counter("aura_serial_frame_errors_total", "Binary frames dropped for a bad CRC or length")
+SERIAL_NACKS = metrics.counter("aura_serial_nacks_total", "Commands the ESP32 answered with an error")
+SERIAL_UNACKED = metrics.counter("aura_serial_unacked_total", "Commands with no reply within ACK_TIMEOUT")
+SERIAL_COALESCED = metrics.counter("aura_serial_coalesced_total", "Servo setpoints replaced by a newer one before being sent")
+SERIAL_DEDUPLICATED = metrics.counter("aura_serial_deduplicated_total",
+                                      "Servo setpoints dropped as identical to the arm's current target")
+SERIAL_ROUND_TRIP_SECONDS = metrics.histogram(
+    "aura_serial_round_trip_seconds", "Command write to matching ack",
+    buckets=(0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+ACK_TIMEOUT = 1.0  # Seconds before an unanswered command counts as unacked
+# Connecting: instead of a fixed wait for the reset, ping with {"op": "test"} until it answers
+HANDSHAKE_TIMEOUT = 0.25  # Seconds to wait for each ping's reply
+HANDSHAKE_DEADLINE = 3.0  # Give up after this long (an ESP32 that did reset needs ~2 s to boot)
+AVOID_RESET = True  # Open the port with DTR/RTS released so the ESP32 doesn't reboot (most adapters honor it)
+RECONNECT_INITIAL_DELAY = 0.1  # Seconds before the first background reconnect attempt (doubles per failure)
+RECONNECT_MAX_DELAY = 5.0
+PORT_CACHE_FILE = "esp32_port.json"  # Last good port, found again by USB serial number if renamed
+READER_POLL_INTERVAL = 0.05  # Serial read timeout of the reader thread (also how often stale commands expire)
+RESPONSE_QUEUE_SIZE = 256  # Unread responses kept for read_response/poll_responses (oldest dropped first)
+SEQ_SUFFIX = re.compile(r" seq=(\d+)$")  # JSON-mode replies end with the command's seq
+
+# Binary protocol (opt-in; negotiated at connect with {"op": "proto"}, JSON lines otherwise).
+# Frame: SYNC | opcode | seq | payload length | payload | CRC-16/CCITT-FALSE (little-endian)
+# over opcode..payload. A servo update is 14 bytes instead of ~70 bytes of JSON.
+PROTOCOLS = ("json", "auto", "binary")
+PROTOCOL_VERSION = 1
+FRAME_SYNC = 0xA5  # Never appears in the (ASCII) JSON lines, so both can share the link
+FRAME_HEADER_SIZE = 4  # sync, opcode, seq, payload length
+FRAME_MAX_PAYLOAD = 32
+OP_SERVOS = 0x01  # payload: base, shoulder, elbow, wrist as uint16 microseconds
+OP_TEST = 0x02  # payload: none
+OP_ACK = 0x80  # payload: acked opcode, status[, data] (servos: applied base, shoulder, elbow)
+ACK_OK = 0
+ACK_STATUS = {ACK_OK: "ok", 1: "bad crc", 2: "unknown op", 3: "bad length"}
+BINARY_OPS = {"servos": OP_SERVOS, "test": OP_TEST}
+SERVOS_PAYLOAD = struct.Struct("<4H")
+SERVOS_ACK_DATA = struct.Struct("<3H")
+
+Frame = namedtuple("Frame", ["opcode", "seq", "payload"])
+# Outcome of a command: ok is False for an error reply and for no reply within
+# ACK_TIMEOUT (then response and round_trip are None)
+Ack = namedtuple("Ack", ["seq", "ok", "response", "round_trip"])
+
+
+def crc16(data):
+    """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF), as computed by the firmware."""
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encode_frame(opcode, seq, payload=b''):
+    """
+    Build a binary frame.
+
+    Args:
+        opcode: OP_* code
+        seq: Sequence number (0-255, echoed in the ack)
+        payload: Payload bytes (up to FRAME_MAX_PAYLOAD)
+
+    Returns:
+        bytes: The frame
+    """
+    if len(payload) > FRAME_MAX_PAYLOAD:
+        raise ValueError(f"Payload too long: {len(payload)} bytes (max {FRAME_MAX_PAYLOAD})")
+    body = bytes((opcode, seq & 0xFF, len(payload))) + payload
+    return bytes((FRAME_SYNC,)) + body + struct.pack("<H", crc16(body))
+
+
+def encode_command(command, seq):
+    """
+    Binary frame for a JSON-style command dict, or None if it has no binary form.
+
+    Args:
+        command: Command dict as passed to send_command (e.g. {"op": "servos", ...})
+        seq: Sequence number
+    """
+    opcode = BINARY_OPS.get(command.get("op"))
+    if opcode == OP_SERVOS:
+        values = [int(command.get(name, 1500)) for name in ("base", "shoulder", "elbow", "wrist")]
+        return encode_frame(OP_SERVOS, seq, SERVOS_PAYLOAD.pack(*(min(max(v, 0), 0xFFFF) for v in values)))
+    if opcode == OP_TEST:
+        return encode_frame(OP_TEST, seq)
+    return None
+
+
+def describe_frame(frame):
+    """Text form of a received frame, in the firmware's JSON-mode reply style."""
+    if frame.opcode != OP_ACK or len(frame.payload) < 2:
+        return f"FRAME: op=0x{frame.opcode:02x} seq={frame.seq} payload={frame.payload.hex()}"
+    acked, status = frame.payload[0], frame.payload[1]
+    if status != ACK_OK:
+        return f"ERROR: seq {frame.seq} {ACK_STATUS.get(status, status)}"
+    if acked == OP_SERVOS and len(frame.payload) == 2 + SERVOS_ACK_DATA.size:
+        base, shoulder, elbow = SERVOS_ACK_DATA.unpack(frame.payload[2:])
+        return f"OK: servos set to {base},{shoulder},{elbow}"
+    return "OK: ESP32 is responding" if acked == OP_TEST else f"OK: op 0x{acked:02x}"
+
+
+def servos_command(values):
+    """Servos command dict from (base, shoulder, elbow, wrist) microseconds."""
+    base, shoulder, elbow, wrist = values
+    return {"op": "servos", "base": base, "shoulder": shoulder, "elbow": elbow, "wrist": wrist}
+
+
+def _chain_future(source, target):
+    """Resolve target with source's Ack once source is done."""
+    def copy_result(done):
+        if not target.done():
+            target.set_result(done.result() if not done.cancelled() else Ack(None, False, None, None))
+    source.add_done_callback(copy_result)
+
+
+def _failed_future():
+    """Future already resolved with the Ack of a command that was never sent."""
+    future = Future()
+    future.set_result(Ack(None, False, None, None))
+    return future
+
+
+def _was_sent(future):
+    """False for submit()'s None and for the failed future it returns while reconnecting."""
+    return future is not None and not (future.done() and not future.cancelled() and future.result().seq is None)
+
+
+def is_ack(item):
+    """True for an OK text line or a successful binary ack."""
+    if isinstance(item, Frame):
+        return item.opcode == OP_ACK and len(item.payload) >= 2 and item.payload[1] == ACK_OK
+    return item.startswith("OK")
+
+
+def reply_seq(item):
+    """
+    Sequence number a reply answers.
+
+    Returns:
+        int: The seq, -1 for a JSON-mode reply without one (older firmware),
+             or None if the item isn't a reply to a command
+    """
+    if isinstance(item, Frame):
+        return item.seq if item.opcode == OP_ACK else None
+    if not item.startswith(("OK", "ERROR")):
+        return None  # Boot messages etc.
+    match = SEQ_SUFFIX.search(item)
+    return int(match.group(1)) if match else -1
+
+
+class FrameDecoder:
+    """
+    Incremental decoder for the mixed byte stream from the firmware: binary
+    frames and text lines (boot messages, JSON-mode replies).
+
+    Frames with a bad CRC or length are dropped and decoding resumes at the
+    next sync byte or after the next newline, whichever comes first (the
+    bytes in between are the rest of the bad frame, or a stray 0xA5 in text).
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.errors = 0
+        self._resyncing = False
+
+    def feed(self, data):
+        """
+        Add received bytes.
+
+        Returns:
+            list: Complete items, each a Frame or a text line (str, stripped)
+        """
+        self.buffer += data
+        items = []
+        buffer = self.buffer
+        while buffer:
+            if buffer[0] == FRAME_SYNC:
+                if len(buffer) < FRAME_HEADER_SIZE:
+                    break
+                length = buffer[3]
+                if length > FRAME_MAX_PAYLOAD:
+                    self._drop_sync()
+                    continue
+                end = FRAME_HEADER_SIZE + length + 2
+                if len(buffer) < end:
+                    break
+                body = bytes(buffer[1:end - 2])
+                if crc16(body) != struct.unpack_from("<H", buffer, end - 2)[0]:
+                    self._drop_sync()
+                    continue
+                items.append(Frame(body[0], body[1], body[3:]))
+                del buffer[:end]
+            elif self._resyncing:
+                sync = buffer.find(bytes((FRAME_SYNC,)))
+                newline = buffer.find(b'\n')
+                if sync < 0 and newline < 0:
+                    buffer.clear()
+                    break
+                if newline >= 0 and (sync < 0 or newline < sync):
+                    del buffer[:newline + 1]  # JSON mode never sends another sync byte
+                else:
+                    del buffer[:sync]
+                self._resyncing = False
+            else:
+                newline = buffer.find(b'\n')
+                sync = buffer.find(bytes((FRAME_SYNC,)))
+                if newline < 0 or (0 <= sync < newline):
+                    if sync < 0:
+                        break  # Partial line; wait for the rest
+                    # Text interrupted by a frame (e.g. a reset mid-line): flush what we have
+                    end, skip = sync, 0
+                else:
+                    end, skip = newline, 1
+                line = bytes(buffer[:end]).decode('utf-8', errors='replace').strip()
+                del buffer[:end + skip]
+                if line:
+                    items.append(line)
+        return items
+
+    def _drop_sync(self):
+        self.errors += 1
+        self._resyncing = True
+        SERIAL_FRAME_ERRORS.inc()
+        del self.buffer[:1]
+
+
+def load_port_cache():
+    """Last good port as saved by remember_port ({} if none)."""
+    if not os.path.exists(PORT_CACHE_FILE):
+        return {}
+    try:
+        with open(PORT_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error loading {PORT_CACHE_FILE}: {e}")
+        return {}
+
+
+def remember_port(device):
+    """Save the USB serial number of a port that answered, so find_esp32_port tries it first."""
+    for port in serial.tools.list_ports.comports():
+        if port.device == device and port.serial_number:
+            entry = {"device": port.device, "serial_number": port.serial_number, "description": port.description}
+            if load_port_cache() != entry:
+                try:
+                    with open(PORT_CACHE_FILE, 'w') as f:
+                        json.dump(entry, f, indent=2)
+                except Exception as e:
+                    print(f"Error saving {PORT_CACHE_FILE}: {e}")
+            return
+
+
+def find_esp32_port():
+    """
+    Try to auto-detect ESP32 serial port.
+    
+    The port that last answered (see remember_port) wins, even under a new
+    device name; otherwise the first port with a known USB-serial chip.
+
+    Returns:
+        str: Port name if found, None otherwise
+    """
+    ports = serial.tools.list_ports.comports()
+    cached_serial = load_port_cache().get("serial_number")
+    if cached_serial:
+        for port in ports:
+            if port.serial_number == cached_serial:
+                print(f"Found ESP32 (serial number {cached_serial}): {port.device}")
+                return port.device
+
+    # Common ESP32 USB-to-Serial chip identifiers
+    esp32_identifiers = [
+        'CP210',  # Silicon Labs CP210x
+        'CH340',  # WCH CH340
+        'CH341',  # WCH CH341
+        'FTDI',   # FTDI
+        'USB Serial',  # Generic
+        'SLAB',   # Silicon Labs
+    ]
+
+    for port in ports:
+        description = port.description.upper()
+        for identifier in esp32_identifiers:
+            if identifier.upper() in description:
+                print(f"Found potential ESP32: {port.device} - {port.description}")
+                return port.device
+
+    return None
+
+
+def open_serial(port, baud_rate, timeout, write_timeout):
+    """Open a serial port, without resetting the ESP32 if AVOID_RESET (DTR/RTS stay released)."""
+    conn = serial.Serial()
+    conn.port = port
+    conn.baudrate = baud_rate
+    conn.timeout = timeout
+    conn.write_timeout = write_timeout
+    if AVOID_RESET:
+        conn.dtr = False
+        conn.rts = False
+    conn.open()
+    return conn
 
 
 class ESP32Controller:
     """Controller for ESP32 robot arm via serial communication."""
     
-    def __init__(self, port=None, baud_rate=115200, timeout=1.0):
+    def __init__(self, port=None, baud_rate=115200, timeout=1.0, protocol="json", coalesce=False, max_send_rate=None,
+                 auto_reconnect=True):
         """
         Initialize ESP32 controller.
         
@@ -21,12 +339,62 @@ class ESP32Controller:
                  If None, will try to auto-detect ESP32
             baud_rate: Serial baud rate (default: 115200)
             timeout: Serial timeout in seconds (default: 1.0)
+            protocol: 'json' (text lines), 'auto' (binary frames if the firmware
+                      supports them, else JSON) or 'binary' (fail to connect without it)
+            coalesce: Send servo setpoints from a background writer with
+                      latest-wins semantics: a newer setpoint replaces one not
+                      yet sent, and one equal to the arm's current target is dropped
+            max_send_rate: Maximum servo commands per second (implies coalesce)
+            auto_reconnect: After the link drops, reconnect in a background
+                            thread with exponential backoff; commands fail fast meanwhile
         """
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown protocol '{protocol}'. Choose from: {', '.join(PROTOCOLS)}")
         self.port = port
+        self.detect_port = port is None  # Re-detect after a failed reconnect (the device may be renamed)
         self.baud_rate = baud_rate
         self.timeout = timeout
+        self.protocol = protocol
+        self.auto_reconnect = auto_reconnect
+        self.active_protocol = "json"  # What the current connection speaks
         self.serial_conn = None
         self.connected = False
+        self.connect_count = 0
+        self.last_ack_time = None  # time.monotonic() of the last OK response
+        self._decoder = FrameDecoder()
+        self._seq = 0
+        
+        # Filled by the reader thread; read_response/poll_responses consume it
+        self._responses = deque(maxlen=RESPONSE_QUEUE_SIZE)
+        self._responses_ready = threading.Condition()
+        self._reader = None
+        self._reader_stop = threading.Event()
+        
+        # Commands awaiting their ack: seq -> (Future, write time, JSON mode)
+        self._pending = {}
+        self._lock = threading.Lock()  # Guards _seq and _pending
+        self._write_lock = threading.Lock()
+        self.commands_sent = 0
+        self.acked = 0
+        self.nacked = 0
+        self.unacked = 0
+        self.round_trips = profiling.LatencyRing("serial_round_trip")
+        
+        # Latest-wins servo setpoints (coalesce mode), guarded by _slot_ready
+        self.coalesce = coalesce or max_send_rate is not None
+        self.max_send_rate = max_send_rate
+        self._servo_slot = None  # (values, Future) waiting for the writer thread
+        self._servo_sent = None  # (values, Future) of the last servo command written
+        self._slot_ready = threading.Condition()
+        self._writer = None
+        self._writer_stop = threading.Event()
+        self.coalesced = 0
+        self.deduplicated = 0
+        
+        self._connect_lock = threading.Lock()
+        self._reconnector = None  # Guarded by _lock, so only one reconnect loop ever runs
+        self._reconnect_stop = threading.Event()  # Replaced for each reconnect loop
+        self._closed = False  # Set by disconnect(): stay down until connect() is called again
         
     def find_esp32_port(self):
         """
@@ -35,93 +403,306 @@ class ESP32Controller:
         Returns:
             str: Port name if found, None otherwise
         """
-        # Common ESP32 USB-to-Serial chip identifiers
-        esp32_identifiers = [
-            'CP210',  # Silicon Labs CP210x
-            'CH340',  # WCH CH340
-            'CH341',  # WCH CH341
-            'FTDI',   # FTDI
-            'USB Serial',  # Generic
-            'SLAB',   # Silicon Labs
-        ]
-        
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            description = port.description.upper()
-            for identifier in esp32_identifiers:
-                if identifier.upper() in description:
-                    print(f"Found potential ESP32: {port.device} - {port.description}")
-                    return port.device
-        
-        return None
+        return find_esp32_port()
     
     def connect(self):
         """
         Connect to ESP32 via serial.
         
+        A failed connect also stops the background reconnect, so a caller that
+        gives up on the controller isn't left with a thread reopening the port.
+        
         Returns:
             bool: True if connected successfully, False otherwise
         """
-        if self.connected and self.serial_conn and self.serial_conn.is_open:
+        self._closed = False
+        if self._connect():
             return True
-        
-        # Auto-detect port if not specified
-        if self.port is None:
-            self.port = self.find_esp32_port()
+        if threading.current_thread() is not self._reconnector:
+            # The reader may have lost the link mid-handshake and started one
+            self._stop_reconnect()
+        return False
+    
+    def _connect(self, stop=None):
+        """connect() without stopping the reconnect thread; gives up at once if stop is set."""
+        with self._connect_lock:
+            if stop is not None and (stop.is_set() or self._closed):
+                return False  # disconnect() or a failed connect() stopped us while we waited for the lock
+            if self.connected and self.serial_conn and self.serial_conn.is_open:
+                return True
+            
+            # Auto-detect port if not specified
             if self.port is None:
-                print("Error: Could not find ESP32. Please specify port manually.")
+                self.port = self.find_esp32_port()
+                if self.port is None:
+                    print("Error: Could not find ESP32. Please specify port manually.")
+                    return False
+            
+            # Close a connection left open by a failed write before reopening
+            self._close_port()
+            
+            try:
+                print(f"Connecting to ESP32 on {self.port} at {self.baud_rate} baud...")
+                start = time.monotonic()
+                self.serial_conn = open_serial(self.port, self.baud_rate,
+                                               READER_POLL_INTERVAL,  # Only the reader thread reads
+                                               self.timeout)
+                self.connected = True
+                self._start_reader()
+                if not self._handshake():
+                    print(f"Error: ESP32 on {self.port} did not answer within {HANDSHAKE_DEADLINE:g}s")
+                    self._close_port()
+                    return False
+                if self.protocol != "json" and not self._negotiate_binary():
+                    if self.protocol == "binary":
+                        print("Error: Firmware does not support the binary protocol")
+                        self._close_port()
+                        return False
+                    print("Firmware has no binary protocol support, using JSON")
+                if self.connect_count:
+                    SERIAL_RECONNECTS.inc()
+                self.connect_count += 1
+                remember_port(self.port)
+                print(f"Connected to ESP32 successfully! ({self.active_protocol} protocol, "
+                      f"ready in {(time.monotonic() - start) * 1000:.0f} ms)")
+                return True
+            except serial.SerialException as e:
+                SERIAL_ERRORS.inc(stage="connect")
+                self._close_port()
+                print(f"Error connecting to ESP32: {e}")
+                print(f"Available ports:")
+                for port in serial.tools.list_ports.comports():
+                    print(f"  - {port.device}: {port.description}")
                 return False
+    
+    def _handshake(self):
+        """
+        Ping with {"op": "test"} until the firmware answers, so connecting takes
+        one round trip when the ESP32 didn't reset and ~2 s only when it did.
         
-        try:
-            print(f"Connecting to ESP32 on {self.port} at {self.baud_rate} baud...")
-            self.serial_conn = serial.Serial(
-                port=self.port,
-                baudrate=self.baud_rate,
-                timeout=self.timeout,
-                write_timeout=self.timeout
-            )
-            time.sleep(2)  # Wait for ESP32 to reset
-            self.connected = True
-            print(f"Connected to ESP32 successfully!")
-            return True
-        except serial.SerialException as e:
-            print(f"Error connecting to ESP32: {e}")
-            print(f"Available ports:")
-            for port in serial.tools.list_ports.comports():
-                print(f"  - {port.device}: {port.description}")
-            return False
+        Returns:
+            bool: True once a ping was acked within HANDSHAKE_DEADLINE
+        """
+        deadline = time.monotonic() + HANDSHAKE_DEADLINE
+        while self.connected and time.monotonic() < deadline:  # The reader clears connected if the port fails
+            future = self.submit({"op": "test"})
+            if future is None:
+                return False
+            try:
+                if future.result(timeout=min(HANDSHAKE_TIMEOUT, max(0.0, deadline - time.monotonic()))).ok:
+                    return True
+                time.sleep(HANDSHAKE_TIMEOUT)  # Rejected (e.g. garbled during boot): try again shortly
+            except FutureTimeoutError:
+                # Sent while the ESP32 was still booting: it will never answer, so don't count it as lost
+                self._forget(future)
+        return False
+    
+    def _forget(self, future):
+        """Drop a command's pending entry without counting it as unacked."""
+        with self._lock:
+            for seq, entry in list(self._pending.items()):
+                if entry[0] is future:
+                    del self._pending[seq]
+        future.cancel()
     
+    def _negotiate_binary(self):
+        """Ask the firmware to accept binary frames (it keeps accepting JSON too)."""
+        self.active_protocol = "json"
+        if not self.send_command({"op": "proto", "version": PROTOCOL_VERSION}):
+            return False
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            response = self.read_response(timeout=deadline - time.monotonic())
+            if isinstance(response, str) and response.startswith("OK: binary"):
+                self.active_protocol = "binary"
+                return True
+            if isinstance(response, str) and response.startswith("ERROR"):
+                return False  # Older firmware: "ERROR: Unknown operation - proto"
+        return False
+
     def disconnect(self):
-        """Disconnect from ESP32."""
+        """Disconnect from ESP32. Commands fail without reconnecting until connect() is called."""
+        self._closed = True
+        self._stop_reconnect()
+        self._stop_writer()
+        self._close_port()
+        self._expire_pending(force=True)
+        print("Disconnected from ESP32")
+    
+    def _close_port(self):
+        self._stop_reader()
         if self.serial_conn and self.serial_conn.is_open:
             self.serial_conn.close()
         self.connected = False
-        print("Disconnected from ESP32")
+        self.active_protocol = "json"
     
-    def send_command(self, command):
+    def _link_lost(self, stage, error):
+        """A read or write failed: mark the link down and reconnect in the background."""
+        SERIAL_ERRORS.inc(stage=stage)
+        print(f"Error {'reading response' if stage == 'read' else 'sending command'}: {error}")
+        self.connected = False
+        if self.auto_reconnect and not self._closed and self._start_reconnect():
+            print("ESP32 link lost, reconnecting in the background...")
+    
+    def _start_reconnect(self):
         """
-        Send command to ESP32.
+        Start the reconnect thread unless one is already running. The reader
+        and writer threads can both lose the link at once, hence the lock.
+        
+        Returns:
+            bool: True if this call started it
+        """
+        with self._lock:
+            if self._reconnector is not None or self._closed:
+                return False
+            self._reconnect_stop = threading.Event()
+            self._reconnector = threading.Thread(target=self._reconnect_loop, args=(self._reconnect_stop,),
+                                                 name="esp32-reconnect", daemon=True)
+            self._reconnector.start()
+        return True
+    
+    def _reconnect_loop(self, stop):
+        """Reconnect thread: retry connecting with exponential backoff until it works or stop is set."""
+        delay = RECONNECT_INITIAL_DELAY
+        while not stop.wait(delay) and not self._closed:
+            if self._connect(stop):
+                break
+            if self.detect_port:
+                self.port = None  # Find it again next time (e.g. re-enumerated under a new name)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        with self._lock:
+            if self._reconnector is threading.current_thread():
+                self._reconnector = None
+    
+    def _stop_reconnect(self):
+        """Stop the reconnect thread and wait for it (unless called from it)."""
+        with self._lock:
+            reconnector = self._reconnector
+            if reconnector is None:
+                return
+            self._reconnect_stop.set()
+            self._reconnector = None
+        if reconnector is not threading.current_thread():
+            reconnector.join(timeout=HANDSHAKE_DEADLINE + 1.0)
+    
+    def _start_reader(self):
+        """Start the thread that decodes everything the ESP32 sends."""
+        self._decoder = FrameDecoder()
+        with self._responses_ready:
+            self._responses.clear()
+        self._reader_stop.clear()
+        self._reader = threading.Thread(target=self._read_loop, args=(self.serial_conn,),
+                                        name="esp32-reader", daemon=True)
+        self._reader.start()
+    
+    def _stop_reader(self):
+        if self._reader is None:
+            return
+        self._reader_stop.set()
+        if self._reader is not threading.current_thread():
+            self._reader.join(timeout=1.0)
+        self._reader = None
+    
+    def _read_loop(self, conn):
+        """Reader thread: block on the port (up to READER_POLL_INTERVAL), decode, expire stale commands."""
+        while not self._reader_stop.is_set():
+            try:
+                data = conn.read(max(1, conn.in_waiting))
+            except Exception as e:
+                if not self._reader_stop.is_set():
+                    self._link_lost("read", e)
+                break
+            if data:
+                self._receive(data)
+            self._expire_pending()
+    
+    def _expire_pending(self, force=False):
+        """Resolve commands unanswered for ACK_TIMEOUT (all of them if force) as unacked."""
+        cutoff = time.monotonic() - ACK_TIMEOUT
+        with self._lock:
+            if not self._pending:
+                return
+            expired = [seq for seq, (_, sent, _) in self._pending.items() if force or sent < cutoff]
+            futures = [(seq, self._pending.pop(seq)[0]) for seq in expired]
+        for seq, future in futures:
+            self.unacked += 1
+            SERIAL_UNACKED.inc()
+            future.set_result(Ack(seq, False, None, None))
+    
+    @profiling.timed("send_command")
+    def submit(self, command):
+        """
+        Send a command without waiting for its reply.
+        
+        The reader thread resolves the returned future with an Ack when the
+        matching reply arrives (or with ok=False after ACK_TIMEOUT), so
+        callers can wait for confirmation with future.result(timeout) or
+        attach a callback (run on the reader thread). Seq numbers are 8 bits,
+        so at most 256 commands can await their ack at once.
         
         Args:
             command: dict with command data
         
         Returns:
-            bool: True if sent successfully, False otherwise
+            Future: Resolves to an Ack, or None if the command couldn't be sent.
+                    After disconnect(), or with auto_reconnect and the link down,
+                    an already failed Ack (seq None); in the latter case the
+                    reconnect runs in the background
         """
         if not self.connected:
+            if self._closed:
+                return _failed_future()  # disconnect() was called: don't reopen the port behind the caller's back
+            if self.auto_reconnect:
+                # Fail fast rather than block the caller for a whole handshake
+                self._start_reconnect()
+                return _failed_future()
             if not self.connect():
-                return False
+                return None
+        
+        future = Future()
+        binary = self.active_protocol == "binary"
+        with self._lock:
+            self._seq = (self._seq + 1) & 0xFF
+            seq = self._seq
+            data = encode_command(command, seq) if binary else None
+            json_mode = data is None
+            if json_mode:
+                # Convert command to JSON string (the firmware echoes seq in its reply)
+                data = (json.dumps(dict(command, seq=seq)) + '\n').encode('utf-8')
+            previous = self._pending.pop(seq, None)
+            self._pending[seq] = (future, time.monotonic(), json_mode)
+        if previous is not None:
+            # seq wrapped around onto a command that never got its reply
+            self.unacked += 1
+            SERIAL_UNACKED.inc()
+            previous[0].set_result(Ack(seq, False, None, None))
         
         try:
-            # Convert command to JSON string
-            json_str = json.dumps(command) + '\n'
-            self.serial_conn.write(json_str.encode('utf-8'))
-            self.serial_conn.flush()
-            return True
+            with self._write_lock:
+                self.serial_conn.write(data)
+                self.serial_conn.flush()
+            self.commands_sent += 1
+            SERIAL_BYTES_SENT.inc(len(data))
+            SERIAL_COMMANDS.inc(op=command.get("op", ""))
+            return future
         except Exception as e:
-            print(f"Error sending command: {e}")
-            self.connected = False
-            return False
+            self._link_lost("write", e)
+            with self._lock:
+                self._pending.pop(seq, None)
+            future.cancel()
+            return None
+    
+    def send_command(self, command):
+        """
+        Send command to ESP32.
+        
+        Args:
+            command: dict with command data
+        
+        Returns:
+            bool: True if sent successfully, False otherwise
+        """
+        return _was_sent(self.submit(command))
     
     def set_servos(self, base_us, shoulder_us, elbow_us, wrist_us=1500):
         """
@@ -135,16 +716,97 @@ class ESP32Controller:
             wrist_us: Wrist servo microseconds (900-2100) - Optional, defaults to 1500
         
         Returns:
-            bool: True if sent successfully, False otherwise
+            bool: True if sent (or queued, in coalesce mode) successfully, False otherwise
         """
-        command = {
-            "op": "servos",
-            "base": int(base_us),
-            "shoulder": int(shoulder_us),
-            "elbow": int(elbow_us),
-            "wrist": int(wrist_us)
-        }
-        return self.send_command(command)
+        return _was_sent(self.submit_servos(base_us, shoulder_us, elbow_us, wrist_us))
+    
+    def submit_servos(self, base_us, shoulder_us, elbow_us, wrist_us=1500):
+        """
+        Like set_servos, but returns the command's Future (see submit) to await the ESP32's ack.
+        
+        In coalesce mode the setpoint is queued for the writer thread instead.
+        Its future then resolves with the ack of whatever command carried the
+        arm to the latest target: a newer setpoint that replaced it, or the
+        earlier identical command it was deduplicated against.
+        
+        Returns:
+            Future: Resolves to an Ack, or None if the command couldn't be sent
+        """
+        values = (int(base_us), int(shoulder_us), int(elbow_us), int(wrist_us))
+        if not self.coalesce:
+            return self.submit(servos_command(values))
+        
+        with self._slot_ready:
+            if self._servo_slot is not None:
+                # Unsent setpoint: replace it, keeping its future
+                future = self._servo_slot[1]
+                self._servo_slot = (values, future)
+                self.coalesced += 1
+                SERIAL_COALESCED.inc()
+            elif self._is_duplicate(values):
+                self.deduplicated += 1
+                SERIAL_DEDUPLICATED.inc()
+                return self._servo_sent[1]
+            else:
+                future = Future()
+                self._servo_slot = (values, future)
+            self._slot_ready.notify()
+            if self._writer is None:
+                self._writer_stop.clear()
+                self._writer = threading.Thread(target=self._write_loop, name="esp32-writer", daemon=True)
+                self._writer.start()
+        return future
+    
+    def _is_duplicate(self, values):
+        """True if values is the target of the last servo command and that command hasn't failed (call with _slot_ready held)."""
+        if self._servo_sent is None or self._servo_sent[0] != values:
+            return False
+        sent = self._servo_sent[1]
+        return not (sent.done() and not sent.result().ok)  # Resend after a rejection or lost ack
+    
+    def _write_loop(self):
+        """Writer thread (coalesce mode): send the latest setpoint, at most max_send_rate per second."""
+        interval = 1.0 / self.max_send_rate if self.max_send_rate else 0.0
+        next_send = 0.0
+        while True:
+            with self._slot_ready:
+                self._slot_ready.wait_for(lambda: self._servo_slot is not None or self._writer_stop.is_set())
+            if self._writer_stop.is_set():
+                break
+            # Setpoints arriving while we wait out the rate limit replace the queued one
+            if self._writer_stop.wait(max(0.0, next_send - time.monotonic())):
+                break
+            with self._slot_ready:
+                values, future = self._servo_slot
+                self._servo_slot = None
+                duplicate = self._is_duplicate(values)
+                if duplicate:
+                    self.deduplicated += 1
+                    SERIAL_DEDUPLICATED.inc()
+                    sent = self._servo_sent[1]
+            if not duplicate:
+                sent = self.submit(servos_command(values))
+                next_send = time.monotonic() + interval
+                with self._slot_ready:
+                    self._servo_sent = (values, sent) if sent is not None else None
+            if sent is None:
+                future.set_result(Ack(None, False, None, None))
+            else:
+                _chain_future(sent, future)
+        with self._slot_ready:
+            if self._servo_slot is not None:
+                self._servo_slot[1].set_result(Ack(None, False, None, None))
+                self._servo_slot = None
+    
+    def _stop_writer(self):
+        if self._writer is None:
+            return
+        self._writer_stop.set()
+        with self._slot_ready:
+            self._slot_ready.notify_all()
+        if self._writer is not threading.current_thread():
+            self._writer.join(timeout=1.0)
+        self._writer = None
     
     def set_servos_from_us_list(self, us_list):
         """
@@ -175,20 +837,97 @@ class ESP32Controller:
             timeout: Timeout in seconds
         
         Returns:
-            str: Response string, or None if timeout
+            str or Frame: Response line (or binary frame), or None if timeout
         """
         if not self.connected:
             return None
         
-        try:
-            old_timeout = self.serial_conn.timeout
-            self.serial_conn.timeout = timeout
-            response = self.serial_conn.readline().decode('utf-8').strip()
-            self.serial_conn.timeout = old_timeout
-            return response if response else None
-        except Exception as e:
-            print(f"Error reading response: {e}")
+        with self._responses_ready:
+            if not self._responses_ready.wait_for(lambda: self._responses, timeout):
+                return None
+            return self._responses.popleft()
+    
+    def _receive(self, data):
+        """Decode received bytes (reader thread): count them, resolve acked commands and queue everything."""
+        SERIAL_BYTES_RECEIVED.inc(len(data))
+        items = self._decoder.feed(data)
+        now = time.monotonic()
+        for item in items:
+            ok = is_ack(item)
+            if ok:
+                self.last_ack_time = now
+                SERIAL_ACKS.inc()
+            seq = reply_seq(item)
+            if seq is not None:
+                self._resolve(seq, ok, item, now)
+        if items:
+            with self._responses_ready:
+                self._responses.extend(items)
+                self._responses_ready.notify_all()
+    
+    def _resolve(self, seq, ok, item, now):
+        """Complete the pending command a reply answers (the oldest JSON one if the reply has no seq)."""
+        with self._lock:
+            if seq < 0:
+                seq = next((s for s, (_, _, json_mode) in self._pending.items() if json_mode), None)
+            entry = self._pending.pop(seq, None)
+        if entry is None:
+            return  # Already expired, or a reply to nothing we sent
+        future, sent, _ = entry
+        round_trip = now - sent
+        self.round_trips.record(round_trip)
+        SERIAL_ROUND_TRIP_SECONDS.observe(round_trip)
+        profiling.record("serial_round_trip", round_trip)
+        if ok:
+            self.acked += 1
+        else:
+            self.nacked += 1
+            SERIAL_NACKS.inc()
+        future.set_result(Ack(seq, ok, item, round_trip))
+    
+    def poll_responses(self):
+        """
+        Return the responses received so far, without blocking.
+        
+        Returns:
+            list: Response strings, and Frame tuples for binary replies
+                  (describe_frame() renders them as text)
+        """
+        with self._responses_ready:
+            responses = list(self._responses)
+            self._responses.clear()
+        return responses
+    
+    @property
+    def pending_count(self):
+        """Commands sent but not yet acked (or expired)."""
+        return len(self._pending)
+    
+    def link_stats(self):
+        """
+        Command/ack bookkeeping for the current controller.
+        
+        Returns:
+            dict: 'sent', 'acked', 'nacked', 'unacked' (timed out), 'pending',
+                  'coalesced' and 'deduplicated' (coalesce mode) counts and
+                  'round_trip' (profiling.LatencyRing summary: p50_ms, p95_ms, ...)
+        """
+        return {
+            "sent": self.commands_sent,
+            "acked": self.acked,
+            "nacked": self.nacked,
+            "unacked": self.unacked,
+            "pending": self.pending_count,
+            "coalesced": self.coalesced,
+            "deduplicated": self.deduplicated,
+            "round_trip": self.round_trips.summary(),
+        }
+    
+    def seconds_since_ack(self):
+        """Seconds since the last OK response, or None if none yet."""
+        if self.last_ack_time is None:
             return None
+        return time.monotonic() - self.last_ack_time
     
     def __enter__(self):
         """Context manager entry."""
@@ -7,6 +7,16 @@
  * - Shoulder: GPIO 18 (D18) - MG996R 180°
  * - Elbow: GPIO 22 (D22) - MG996R 180°
  * 
+ * Protocol:
+ * - JSON lines: {"op":"servos",...}, {"op":"test"}, {"op":"proto","version":1}
+ *   A command with a "seq" field gets it echoed at the end of its reply
+ *   ("OK: ... seq=7") so the host can match replies to commands.
+ * - Binary frames (after the host sends "proto"):
+ *   0xA5 | opcode | seq | payload length | payload | CRC-16/CCITT-FALSE (LE)
+ *   The CRC covers opcode..payload. Every frame is answered with an ACK frame
+ *   carrying the same seq.
+ *   Both formats are accepted at any time (0xA5 never appears in the JSON text).
+ * 
  * Required library: ESP32Servo
  */
 
@@ -29,6 +39,30 @@ Servo servo_elbow;
 
 // JSON buffer size
 #define JSON_BUFFER_SIZE 256
+#define LINE_BUFFER_SIZE 256
+
+// Binary protocol (must match esp32_control.py)
+#define PROTOCOL_VERSION 1
+#define FRAME_SYNC 0xA5
+#define FRAME_HEADER_SIZE 4
+#define FRAME_MAX_PAYLOAD 32
+#define FRAME_TIMEOUT_MS 50   // Drop a frame that stops arriving partway through
+#define OP_SERVOS 0x01        // payload: base, shoulder, elbow, wrist (uint16 LE)
+#define OP_TEST 0x02
+#define OP_ACK 0x80           // payload: acked opcode, status[, data]
+#define ACK_OK 0
+#define ACK_BAD_CRC 1
+#define ACK_UNKNOWN_OP 2
+#define ACK_BAD_LENGTH 3
+
+// Receive state: bytes are consumed as they arrive, never waiting for more
+char lineBuffer[LINE_BUFFER_SIZE];
+size_t lineLength = 0;
+bool lineOverflow = false;
+uint8_t frameBuffer[FRAME_HEADER_SIZE + FRAME_MAX_PAYLOAD + 2];
+size_t frameLength = 0;
+size_t frameExpected = 0;
+unsigned long frameStartMs = 0;
 
 void setup() {
   Serial.begin(115200);
@@ -65,21 +99,162 @@ void setup() {
 }
 
 void loop() {
-  // Check for incoming serial data
-  if (Serial.available() > 0) {
-    String jsonString = Serial.readStringUntil('\n');
-    jsonString.trim();
-    
-    if (jsonString.length() > 0) {
-      processCommand(jsonString);
+  // Abandon a frame whose remaining bytes never came (e.g. host restarted mid-frame)
+  if (frameLength > 0 && millis() - frameStartMs > FRAME_TIMEOUT_MS) {
+    frameLength = 0;
+  }
+  
+  // Handle every byte that has arrived; commands run as soon as they're complete
+  while (Serial.available() > 0) {
+    uint8_t b = Serial.read();
+    if (frameLength > 0) {
+      feedFrame(b);
+    } else if (b == FRAME_SYNC) {
+      // Start of a binary frame (drops any partial text line)
+      lineLength = 0;
+      lineOverflow = false;
+      frameBuffer[0] = b;
+      frameLength = 1;
+      frameExpected = FRAME_HEADER_SIZE;
+      frameStartMs = millis();
+    } else {
+      feedLine(b);
     }
   }
+}
+
+void feedLine(uint8_t b) {
+  if (b == '\n') {
+    lineBuffer[lineLength] = '\0';
+    if (lineOverflow) {
+      Serial.println("ERROR: Command too long");
+    } else {
+      // Trim leading/trailing whitespace
+      char* start = lineBuffer;
+      while (*start == ' ' || *start == '\t') start++;
+      char* end = lineBuffer + lineLength;
+      while (end > start && (end[-1] == ' ' || end[-1] == '\t' || end[-1] == '\r')) end--;
+      *end = '\0';
+      if (end > start) {
+        processCommand(start);
+      }
+    }
+    lineLength = 0;
+    lineOverflow = false;
+  } else if (lineLength < LINE_BUFFER_SIZE - 1) {
+    lineBuffer[lineLength++] = b;
+  } else {
+    lineOverflow = true;
+  }
+}
+
+void feedFrame(uint8_t b) {
+  frameBuffer[frameLength++] = b;
+  if (frameLength == FRAME_HEADER_SIZE) {
+    uint8_t payloadLength = frameBuffer[3];
+    if (payloadLength > FRAME_MAX_PAYLOAD) {
+      sendAck(frameBuffer[1], frameBuffer[2], ACK_BAD_LENGTH, NULL, 0);
+      frameLength = 0;
+      return;
+    }
+    frameExpected = FRAME_HEADER_SIZE + payloadLength + 2;
+  }
+  if (frameLength == frameExpected) {
+    processFrame();
+    frameLength = 0;
+  }
+}
+
+uint16_t crc16(const uint8_t* data, size_t length) {
+  // CRC-16/CCITT-FALSE: poly 0x1021, init 0xFFFF
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+uint16_t readU16(const uint8_t* data) {
+  return data[0] | (data[1] << 8);
+}
+
+void writeU16(uint8_t* data, uint16_t value) {
+  data[0] = value & 0xFF;
+  data[1] = value >> 8;
+}
+
+void sendAck(uint8_t opcode, uint8_t seq, uint8_t status, const uint8_t* data, uint8_t dataLength) {
+  uint8_t out[FRAME_HEADER_SIZE + 2 + 8 + 2];
+  out[0] = FRAME_SYNC;
+  out[1] = OP_ACK;
+  out[2] = seq;
+  out[3] = 2 + dataLength;
+  out[4] = opcode;
+  out[5] = status;
+  for (uint8_t i = 0; i < dataLength; i++) {
+    out[6 + i] = data[i];
+  }
+  size_t length = 6 + dataLength;
+  writeU16(out + length, crc16(out + 1, length - 1));
+  Serial.write(out, length + 2);
+}
+
+void processFrame() {
+  uint8_t opcode = frameBuffer[1];
+  uint8_t seq = frameBuffer[2];
+  uint8_t payloadLength = frameBuffer[3];
+  const uint8_t* payload = frameBuffer + FRAME_HEADER_SIZE;
+  
+  if (crc16(frameBuffer + 1, FRAME_HEADER_SIZE - 1 + payloadLength) != readU16(payload + payloadLength)) {
+    sendAck(opcode, seq, ACK_BAD_CRC, NULL, 0);
+    return;
+  }
+  
+  if (opcode == OP_SERVOS) {
+    if (payloadLength != 8) {
+      sendAck(opcode, seq, ACK_BAD_LENGTH, NULL, 0);
+      return;
+    }
+    // wrist (4th value) is ignored, as in JSON mode
+    int applied[3];
+    setServos(readU16(payload), readU16(payload + 2), readU16(payload + 4), applied);
+    uint8_t data[6];
+    for (int i = 0; i < 3; i++) {
+      writeU16(data + 2 * i, applied[i]);
+    }
+    sendAck(opcode, seq, ACK_OK, data, sizeof(data));
+  } else if (opcode == OP_TEST) {
+    sendAck(opcode, seq, ACK_OK, NULL, 0);
+  } else {
+    sendAck(opcode, seq, ACK_UNKNOWN_OP, NULL, 0);
+  }
+}
+
+void setServos(int base_us, int shoulder_us, int elbow_us, int applied[3]) {
+  // Clamp values to valid range (900-2100)
+  applied[0] = constrain(base_us, 900, 2100);
+  applied[1] = constrain(shoulder_us, 900, 2100);
+  applied[2] = constrain(elbow_us, 900, 2100);
   
-  // Small delay to prevent overwhelming the processor
-  delay(10);
+  // Set servo positions
+  servo_base.writeMicroseconds(applied[0]);
+  servo_shoulder.writeMicroseconds(applied[1]);
+  servo_elbow.writeMicroseconds(applied[2]);
 }
 
-void processCommand(String jsonString) {
+void endReply(JsonDocument& doc) {
+  // Echo the command's seq so the host can match this reply to it
+  if (doc.containsKey("seq")) {
+    Serial.print(" seq=");
+    Serial.print(doc["seq"].as<unsigned int>());
+  }
+  Serial.println();
+}
+
+void processCommand(const char* jsonString) {
   // Parse JSON command
   StaticJsonDocument<JSON_BUFFER_SIZE> doc;
   DeserializationError error = deserializeJson(doc, jsonString);
@@ -91,40 +266,38 @@ void processCommand(String jsonString) {
   }
   
   // Check command operation
-  const char* op = doc["op"];
+  const char* op = doc["op"] | "";
   
   if (strcmp(op, "servos") == 0) {
     // Set all servos (only 3 servos: base, shoulder, elbow)
-    int base_us = doc["base"] | 1500;
-    int shoulder_us = doc["shoulder"] | 1500;
-    int elbow_us = doc["elbow"] | 1500;
     // wrist value is ignored (not used)
-    
-    // Clamp values to valid range (900-2100)
-    base_us = constrain(base_us, 900, 2100);
-    shoulder_us = constrain(shoulder_us, 900, 2100);
-    elbow_us = constrain(elbow_us, 900, 2100);
-    
-    // Set servo positions
-    servo_base.writeMicroseconds(base_us);
-    servo_shoulder.writeMicroseconds(shoulder_us);
-    servo_elbow.writeMicroseconds(elbow_us);
+    int applied[3];
+    setServos(doc["base"] | 1500, doc["shoulder"] | 1500, doc["elbow"] | 1500, applied);
     
     // Send confirmation
     Serial.print("OK: servos set to ");
-    Serial.print(base_us);
+    Serial.print(applied[0]);
     Serial.print(",");
-    Serial.print(shoulder_us);
+    Serial.print(applied[1]);
     Serial.print(",");
-    Serial.println(elbow_us);
+    Serial.print(applied[2]);
+    endReply(doc);
+    
+  } else if (strcmp(op, "proto") == 0) {
+    // Host asks for binary frames; JSON keeps working too
+    Serial.print("OK: binary ");
+    Serial.print(PROTOCOL_VERSION);
+    endReply(doc);
     
   } else if (strcmp(op, "test") == 0) {
     // Test command
-    Serial.println("OK: ESP32 is responding");
+    Serial.print("OK: ESP32 is responding");
+    endReply(doc);
     
   } else {
     Serial.print("ERROR: Unknown operation - ");
-    Serial.println(op);
+    Serial.print(op);
+    endReply(doc);
   }
 }
 
@@ -0,0 +1,139 @@
+"""
+JSON-lines event output.
+One JSON object per line (detections per frame, servo commands, ...) so runs
+can be diffed, grepped and timed with standard tools.
+
+Destinations:
+    -                   stdout
+    tcp://host:port     connect and stream lines (e.g. to `nc -l 9000`) from a
+                        background thread; a slow consumer loses the oldest lines
+    udp://host:port     one datagram per record
+    anything else       file path
+"""
+import json
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+from pipeline import DropOldestQueue
+
+TCP_QUEUE_SIZE = 1000  # Lines buffered for a slow TCP consumer before the oldest are dropped
+
+
+def _to_builtin(value):
+    """json.dumps fallback for numpy values."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _parse_address(destination, scheme):
+    host, _, port = destination[len(scheme):].rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Expected {scheme}host:port, got '{destination}'")
+    return host, int(port)
+
+
+class JsonLinesWriter:
+    """
+    Thread-safe compact JSON-lines writer.
+
+    Every record gets a 'type' and 'elapsed' (wall seconds since the writer
+    was created); everything else is up to the caller. Socket errors are
+    counted and reported once rather than stopping the caller. TCP sends run
+    on their own thread behind a drop-oldest queue, so a stalled consumer
+    never blocks the caller.
+    """
+
+    def __init__(self, path="-"):
+        """
+        Args:
+            path: Destination (see module docstring)
+        """
+        self.path = path
+        self.count = 0
+        self.errors = 0
+        self._file = None
+        self._sock = None
+        self._address = None
+        self._queue = None
+        self._sender = None
+
+        if path == "-":
+            self._file = sys.stdout
+        elif path.startswith("tcp://"):
+            self._sock = socket.create_connection(_parse_address(path, "tcp://"), timeout=5.0)
+            self._queue = DropOldestQueue(maxsize=TCP_QUEUE_SIZE, name="jsonl")
+            self._sender = threading.Thread(target=self._send_loop, name="jsonl-sender", daemon=True)
+            self._sender.start()
+        elif path.startswith("udp://"):
+            self._address = _parse_address(path, "udp://")
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            self._file = open(path, 'w')
+
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, record_type, **fields):
+        """Write one record of the given type."""
+        record = {"type": record_type, "elapsed": round(time.monotonic() - self._start, 6)}
+        record.update(fields)
+        line = json.dumps(record, separators=(",", ":"), default=_to_builtin) + "\n"
+        if self._queue is not None:
+            self._queue.put(line.encode())
+            return
+        with self._lock:
+            try:
+                if self._file is not None:
+                    self._file.write(line)
+                    self._file.flush()
+                else:
+                    self._sock.sendto(line.encode(), self._address)
+                self.count += 1
+            except (OSError, ValueError) as e:
+                self._report(e)
+
+    def _send_loop(self):
+        """TCP sender thread: stream queued lines until close() drains the queue."""
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            try:
+                self._sock.sendall(data)
+                self.count += 1
+            except OSError as e:
+                self._report(e)
+
+    def _report(self, error):
+        self.errors += 1
+        if self.errors == 1:
+            print(f"Warning: JSON-lines output to {self.path} failed: {error}", file=sys.stderr)
+
+    @property
+    def dropped(self):
+        """Lines discarded because the TCP consumer fell behind."""
+        return self._queue.dropped if self._queue is not None else 0
+
+    def close(self):
+        if self._queue is not None:
+            self._queue.close()
+            self._sender.join(timeout=1.0)
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+            elif self._file is not None and self._file is not sys.stdout and not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,350 @@
+"""
+Frame sources for running the vision loop without a camera.
+Video files, image directories and recorded sessions all look like
+camera.LatestFrameCapture (open/read_frame/read/stats/release), so main_sim
+can replay them on CI or an analysis machine.
+
+Pacing:
+    fast      Deliver every frame as soon as it is asked for (throughput runs;
+              fully deterministic).
+    realtime  Deliver frames on the recording's own clock. Frames the consumer
+              is too slow for are dropped, the way a live camera would drop them.
+"""
+import json
+import os
+import time
+
+import cv2
+
+import profiling
+from camera import CapturedFrame, LatestFrameCapture, load_camera_config
+
+PACE_MODES = ("fast", "realtime")
+SESSION_INDEX_FILE = "frames.jsonl"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+DEFAULT_FPS = 30.0
+
+
+class FileFrameSource:
+    """
+    Base class for offline sources: pacing, lookahead and counters.
+
+    Subclasses implement _open() and _read_next(), which returns the next
+    CapturedFrame (timestamp in seconds from the start of the recording) or
+    None at the end.
+    """
+
+    def __init__(self, pace="fast"):
+        """
+        Args:
+            pace: 'fast' or 'realtime' (see module docstring)
+        """
+        if pace not in PACE_MODES:
+            raise ValueError(f"Unknown pace '{pace}'. Choose from: {', '.join(PACE_MODES)}")
+        self.pace = pace
+        self.captured = 0
+        self.delivered = 0
+        self.dropped = 0
+
+        self._opened = False
+        self._ended = False
+        self._pending = None
+        self._clock_offset = None
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _read_next(self):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def open(self):
+        """
+        Open the source.
+
+        Returns:
+            bool: True if the source has frames to read
+        """
+        if not self._opened:
+            self._opened = self._open()
+        return self._opened
+
+    def _take(self):
+        if self._pending is not None:
+            item, self._pending = self._pending, None
+            return item
+        item = self._read_next()
+        if item is not None:
+            self.captured += 1
+        return item
+
+    def _peek(self):
+        if self._pending is None:
+            self._pending = self._take()
+        return self._pending
+
+    @profiling.timed("cap.read")
+    def read_frame(self, timeout=None):
+        """
+        Get the next frame, waiting for its turn in realtime mode.
+
+        Args:
+            timeout: Unused; accepted for compatibility with LatestFrameCapture
+
+        Returns:
+            CapturedFrame: (frame, timestamp, seq), or None at the end of the source
+        """
+        if not self._opened or self._ended:
+            return None
+
+        item = self._take()
+        if item is None:
+            self._ended = True
+            return None
+
+        if self.pace == "realtime":
+            if self._clock_offset is None:
+                self._clock_offset = time.monotonic() - item.timestamp
+            # Skip ahead while the following frame is already due
+            while True:
+                upcoming = self._peek()
+                if upcoming is None or self._clock_offset + upcoming.timestamp > time.monotonic():
+                    break
+                self.dropped += 1
+                item = self._take()
+            delay = self._clock_offset + item.timestamp - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        self.delivered += 1
+        return item
+
+    def read(self):
+        """cv2.VideoCapture-compatible read: (ok, frame)."""
+        captured = self.read_frame()
+        if captured is None:
+            return False, None
+        return True, captured.frame
+
+    def isOpened(self):
+        return self._opened and not self._ended
+
+    def stats(self):
+        """
+        Get source counters.
+
+        Returns:
+            dict: 'captured' (read from disk), 'delivered' and 'dropped' frame counts
+        """
+        return {"captured": self.captured, "delivered": self.delivered, "dropped": self.dropped}
+
+    def release(self):
+        self._close()
+        self._opened = False
+        self._pending = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class VideoFileSource(FileFrameSource):
+    """Frames from a video file, timestamped from the file's frame rate."""
+
+    def __init__(self, path, pace="fast", fps=None):
+        """
+        Args:
+            path: Video file path
+            pace: 'fast' or 'realtime'
+            fps: Frame rate override (default: the file's own, or 30)
+        """
+        super().__init__(pace)
+        self.path = path
+        self.fps = fps
+        self.cap = None
+        self._seq = 0
+
+    def _open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            print(f"Error: Could not open video {self.path}")
+            return False
+        if not self.fps:
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        print(f"Replaying video {self.path} at {self.fps:.1f} fps ({self.pace})")
+        return True
+
+    def _read_next(self):
+        ok, frame = self.cap.read()
+        if not ok:
+            return None
+        item = CapturedFrame(frame, self._seq / self.fps, self._seq)
+        self._seq += 1
+        return item
+
+    def _close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class ImageDirectorySource(FileFrameSource):
+    """Frames from the images in a directory, in file name order."""
+
+    def __init__(self, directory, pace="fast", fps=DEFAULT_FPS):
+        """
+        Args:
+            directory: Directory of images
+            pace: 'fast' or 'realtime'
+            fps: Frame rate used to timestamp the images
+        """
+        super().__init__(pace)
+        self.directory = directory
+        self.fps = fps or DEFAULT_FPS
+        self.paths = []
+        self._index = 0
+
+    def _open(self):
+        self.paths = sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self.paths:
+            print(f"Error: No images found in {self.directory}")
+            return False
+        print(f"Replaying {len(self.paths)} images from {self.directory} at {self.fps:.1f} fps ({self.pace})")
+        return True
+
+    def _read_next(self):
+        while self._index < len(self.paths):
+            seq = self._index
+            self._index += 1
+            frame = cv2.imread(self.paths[seq])
+            if frame is not None:
+                return CapturedFrame(frame, seq / self.fps, seq)
+            print(f"Warning: Could not read {self.paths[seq]}, skipping")
+        return None
+
+
+class SessionSource(FileFrameSource):
+    """
+    Frames from a session recorded with SessionRecorder.
+
+    The session's frames.jsonl keeps the original capture timestamps and
+    sequence numbers, so realtime replay reproduces the field timing,
+    including frames the camera dropped.
+    """
+
+    def __init__(self, directory, pace="fast"):
+        """
+        Args:
+            directory: Session directory containing frames.jsonl
+            pace: 'fast' or 'realtime'
+        """
+        super().__init__(pace)
+        self.directory = directory
+        self.entries = []
+        self._index = 0
+
+    def _open(self):
+        index_path = os.path.join(self.directory, SESSION_INDEX_FILE)
+        try:
+            with open(index_path, 'r') as f:
+                self.entries = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError) as e:
+            print(f"Error loading session {self.directory}: {e}")
+            return False
+        if not self.entries:
+            print(f"Error: Session {self.directory} has no frames")
+            return False
+        print(f"Replaying session {self.directory}: {len(self.entries)} frames ({self.pace})")
+        return True
+
+    def _read_next(self):
+        while self._index < len(self.entries):
+            entry = self.entries[self._index]
+            self._index += 1
+            frame = cv2.imread(os.path.join(self.directory, entry["file"]))
+            if frame is not None:
+                return CapturedFrame(frame, entry["t"], entry["seq"])
+            print(f"Warning: Could not read {entry['file']}, skipping")
+        return None
+
+
+class SessionRecorder:
+    """
+    Record captured frames to a session directory for later replay.
+
+    Writes one image per frame plus frames.jsonl with each frame's file name,
+    timestamp (seconds since the first frame) and capture sequence number.
+    """
+
+    def __init__(self, directory, ext=".jpg"):
+        """
+        Args:
+            directory: Output directory (created if needed)
+            ext: Image format extension ('.png' for lossless)
+        """
+        self.directory = directory
+        self.ext = ext
+        self.count = 0
+        self._start = None
+        os.makedirs(directory, exist_ok=True)
+        self._index = open(os.path.join(directory, SESSION_INDEX_FILE), 'w')
+        print(f"Recording session to {directory}")
+
+    def write(self, captured):
+        """Save one CapturedFrame."""
+        if self._start is None:
+            self._start = captured.timestamp
+        name = f"frame_{self.count:06d}{self.ext}"
+        cv2.imwrite(os.path.join(self.directory, name), captured.frame)
+        entry = {"file": name, "t": round(captured.timestamp - self._start, 6), "seq": captured.seq}
+        self._index.write(json.dumps(entry) + "\n")
+        self.count += 1
+
+    def close(self):
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+            print(f"Recorded {self.count} frames to {self.directory}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_frame_source(source=None, pace="realtime", fps=None):
+    """
+    Create a frame source from a command-line style spec.
+
+    Args:
+        source: None or a camera index for a live camera; a video file; an
+                image directory; or a session directory (has frames.jsonl)
+        pace: 'fast' or 'realtime' for offline sources (ignored for cameras)
+        fps: Frame rate override for video files and image directories
+
+    Returns:
+        Frame source (not opened yet)
+    """
+    if source is None or str(source).isdigit():
+        config = load_camera_config()
+        if source is not None:
+            config["index"] = int(source)
+            config["fallback_index"] = None
+        return LatestFrameCapture(config)
+
+    if os.path.isdir(source):
+        if os.path.exists(os.path.join(source, SESSION_INDEX_FILE)):
+            return SessionSource(source, pace=pace)
+        return ImageDirectorySource(source, pace=pace, fps=fps)
+    if os.path.isfile(source):
+        return VideoFileSource(source, pace=pace, fps=fps)
+    raise FileNotFoundError(f"Frame source not found: {source}")
@@ -0,0 +1,397 @@
+"""
+Generic serial kinematic chain with vectorized forward kinematics, Jacobians
+and a damped-least-squares (DLS) numeric IK solver.
+
+The chain is loaded from the arm spec (arm_spec_template.json). A spec with a
+"kinematic_chain" section describes any number of revolute joints as a
+link/joint list:
+
+    "kinematic_chain": {
+        "joints": [
+            {"name": "base", "axis": [0, 0, 1], "origin_m": [0, 0, 0]},
+            {"name": "shoulder", "axis": [0, -1, 0], "origin_m": [0, 0, 0.156]},
+            {"name": "elbow", "axis": [0, -1, 0], "origin_m": [0.12, 0, 0],
+             "direction": -1, "zero_deg": 180},
+            ...
+        ],
+        "tool_m": [0.06, 0, 0]
+    }
+
+Each joint's origin is a translation in the previous joint's frame (applied
+before the joint rotates), and its physical rotation is
+direction * angle + zero_deg about its axis. Limits and home come from the
+joint entry ("min_deg", "max_deg", "home_deg") or else from the spec's
+joint_limits_deg. Links point along local +x at zero rotation, so a pitch
+axis of [0, -1, 0] makes positive angles raise the link.
+
+Without that section the current 4-DOF arm is built from arm_geometry, with
+the same joint conventions as kinematics.calculate_arm_angles for base,
+shoulder and elbow, and the wrist at 0 when the hand is perpendicular to the
+lower arm. The tool frame's +x axis is the hand's approach direction.
+
+Usage:
+    chain = load_chain()
+    solver = DLSSolver(chain)
+    result = solver.solve(0.15, 0.05, 0.02, approach=APPROACH_DOWN)
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+import profiling
+from kinematics import load_calibration
+
+ARM_SPEC_FILE = "arm_spec_template.json"
+APPROACH_DOWN = (0.0, 0.0, -1.0)  # Hand pointing straight down at the table
+
+
+def load_arm_spec(path=ARM_SPEC_FILE):
+    """Load the arm spec JSON, or an empty spec if it's missing or invalid."""
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading arm spec {path}: {e}, using calibration geometry")
+    return {}
+
+
+class Joint:
+    """One revolute joint: where it sits on its parent link, its axis and limits."""
+
+    def __init__(self, name, axis, origin, direction=1, zero_deg=0.0, min_deg=None, max_deg=None, home_deg=0.0):
+        """
+        Args:
+            name: Joint name (result keys are '<name>_deg')
+            axis: Rotation axis in the joint's frame
+            origin: Translation from the previous joint (meters, previous joint's frame)
+            direction: +1 or -1, sign between joint angle and physical rotation
+            zero_deg: Physical rotation at joint angle 0
+            min_deg, max_deg: Joint angle limits (None = unlimited)
+            home_deg: Rest angle, used as the IK start without a warm start
+        """
+        axis = np.asarray(axis, dtype=np.float64)
+        self.name = name
+        self.axis = axis / np.linalg.norm(axis)
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.direction = float(direction)
+        self.zero_deg = float(zero_deg)
+        self.min_deg = -np.inf if min_deg is None else float(min_deg)
+        self.max_deg = np.inf if max_deg is None else float(max_deg)
+        self.home_deg = float(home_deg)
+
+
+def _cross(a, b):
+    """np.cross for (..., 3) arrays without its per-call overhead (it dominates small batches)."""
+    a0, a1, a2 = a[..., 0], a[..., 1], a[..., 2]
+    b0, b1, b2 = b[..., 0], b[..., 1], b[..., 2]
+    return np.stack([a1 * b2 - a2 * b1, a2 * b0 - a0 * b2, a0 * b1 - a1 * b0], axis=-1)
+
+
+class KinematicChain:
+    """Serial chain of revolute joints ending in a tool point."""
+
+    def __init__(self, joints, tool_offset):
+        """
+        Args:
+            joints: List of Joint, base first
+            tool_offset: Tool point in the last joint's frame (meters)
+        """
+        self.joints = list(joints)
+        self.tool_offset = np.asarray(tool_offset, dtype=np.float64)
+        self.names = [joint.name for joint in self.joints]
+        self.min_deg = np.array([joint.min_deg for joint in self.joints])
+        self.max_deg = np.array([joint.max_deg for joint in self.joints])
+        self.home_deg = np.array([joint.home_deg for joint in self.joints])
+        self.directions = np.array([joint.direction for joint in self.joints])
+        self.zero_deg = np.array([joint.zero_deg for joint in self.joints])
+
+        # Rodrigues terms per joint: R(t) = I + sin(t) K + (1 - cos(t)) K^2
+        self._k = np.array([[[0, -z, y], [z, 0, -x], [-y, x, 0]] for x, y, z in (j.axis for j in self.joints)])
+        self._k2 = self._k @ self._k
+
+    @property
+    def dof(self):
+        return len(self.joints)
+
+    def _frames(self, q_deg):
+        """Tool position and rotation plus every joint's world origin and axis, for (N, dof) angles."""
+        n = q_deg.shape[0]
+        theta = np.radians(q_deg * self.directions + self.zero_deg)[..., None, None]
+        joint_rotations = np.eye(3) + np.sin(theta) * self._k + (1 - np.cos(theta)) * self._k2
+        rotation = np.broadcast_to(np.eye(3), (n, 3, 3))
+        position = np.zeros((n, 3))
+        origins = np.empty((n, self.dof, 3))
+        axes = np.empty((n, self.dof, 3))
+        for i, joint in enumerate(self.joints):
+            position = position + rotation @ joint.origin
+            origins[:, i] = position
+            axes[:, i] = rotation @ joint.axis
+            rotation = rotation @ joint_rotations[:, i]
+        return position + rotation @ self.tool_offset, rotation, origins, axes
+
+    def forward_kinematics(self, q_deg):
+        """
+        Tool pose for one or many joint configurations.
+
+        Args:
+            q_deg: (dof,) or (N, dof) joint angles in degrees
+
+        Returns:
+            tuple: (position, rotation) - (..., 3) meters and (..., 3, 3) tool frame
+                   (column 0 is the approach direction)
+        """
+        q = np.asarray(q_deg, dtype=np.float64)
+        position, rotation, _, _ = self._frames(np.atleast_2d(q))
+        if q.ndim == 1:
+            return position[0], rotation[0]
+        return position, rotation
+
+    def _jacobian(self, position, rotation, origins, axes, orientation_weight=0.0):
+        """Stacked (N, 3 or 6, dof) Jacobian per radian of joint angle from _frames() output."""
+        # Revolute joint: dp/dq = axis x (tool - joint origin); the approach axis turns the same way
+        linear = _cross(axes, position[:, None, :] - origins) * self.directions[:, None]
+        if not orientation_weight:
+            return linear.transpose(0, 2, 1)
+        angular = _cross(axes, rotation[:, None, :, 0]) * self.directions[:, None] * orientation_weight
+        return np.concatenate([linear, angular], axis=2).transpose(0, 2, 1)
+
+    def jacobian(self, q_deg, orientation_weight=0.0):
+        """
+        Tool Jacobian per radian of joint angle.
+
+        Args:
+            q_deg: (dof,) or (N, dof) joint angles in degrees
+            orientation_weight: If nonzero, add 3 rows for the approach direction,
+                                scaled by this weight
+
+        Returns:
+            (3 or 6, dof) or (N, 3 or 6, dof) array
+        """
+        q = np.asarray(q_deg, dtype=np.float64)
+        jac = self._jacobian(*self._frames(np.atleast_2d(q)), orientation_weight=orientation_weight)
+        return jac[0] if q.ndim == 1 else jac
+
+    def clip(self, q_deg):
+        """Clamp joint angles to the limits."""
+        return np.clip(q_deg, self.min_deg, self.max_deg)
+
+    def angles_dict(self, q_deg):
+        """{'<name>_deg': angle} for one configuration, like calculate_arm_angles returns."""
+        return {f"{name}_deg": float(angle) for name, angle in zip(self.names, q_deg)}
+
+
+class DLSSolver:
+    """
+    Damped-least-squares IK: q += J^T (J J^T + damping^2 I)^-1 error, clamped to
+    the joint limits after every step.
+
+    solve() starts from the previous converged solution, so tracking a target
+    that moves a little between frames takes a few iterations instead of a
+    full solve from home. Targets that stall (typically pinned against a joint
+    limit) are retried from a few seeded random configurations.
+    """
+
+    def __init__(self, chain, damping=0.01, max_iterations=100, tolerance_m=1e-4,
+                 orientation_weight=0.05, max_step_deg=20.0, restarts=8, seed=0):
+        """
+        Args:
+            chain: KinematicChain
+            damping: DLS damping (meters); trades accuracy for stability near singularities
+            max_iterations: Iteration cap per attempt
+            tolerance_m: Converged when the weighted task error is below this
+            orientation_weight: Meters of position error one radian of approach error is worth
+            max_step_deg: Largest joint change per iteration
+            restarts: Extra attempts from random configurations for targets that don't converge
+            seed: Random seed for the restart configurations (results are repeatable)
+        """
+        self.chain = chain
+        self.damping = damping
+        self.max_iterations = max_iterations
+        self.tolerance_m = tolerance_m
+        self.orientation_weight = orientation_weight
+        self.max_step_deg = max_step_deg
+        self.restarts = restarts
+        self.seed = seed
+        self.last_solution = None
+
+    def _iterate(self, targets, q, approach, weight):
+        """Run DLS on every row of q in place; returns (converged, error_m, iterations)."""
+        chain = self.chain
+        n = targets.shape[0]
+        converged = np.zeros(n, dtype=bool)
+        iterations = np.zeros(n, dtype=np.int64)
+        error_m = np.zeros(n)
+        active = np.arange(n)
+        damping_sq = self.damping ** 2
+        max_step = math.radians(self.max_step_deg)
+        min_step = math.degrees(self.tolerance_m * 1e-3)  # Below this a row has stalled
+        for iteration in range(self.max_iterations + 1):
+            position, rotation, origins, axes = chain._frames(q[active])
+            error = targets[active] - position
+            error_m[active] = np.linalg.norm(error, axis=1)
+            if weight:
+                error = np.concatenate([error, weight * (approach[active] - rotation[:, :, 0])], axis=1)
+            done = np.linalg.norm(error, axis=1) < self.tolerance_m
+            converged[active[done]] = True
+            if iteration == self.max_iterations or done.all():
+                break
+            keep = ~done
+            active, error = active[keep], error[keep]
+            jac = chain._jacobian(position[keep], rotation[keep], origins[keep], axes[keep], weight)
+
+            # dq = J^T (J J^T + lambda^2 I)^-1 e, one small solve per target
+            jjt = jac @ jac.transpose(0, 2, 1) + damping_sq * np.eye(jac.shape[1])
+            step = (jac.transpose(0, 2, 1) @ np.linalg.solve(jjt, error[..., None]))[..., 0]
+            scale = np.minimum(1.0, max_step / np.maximum(np.abs(step).max(axis=1), 1e-12))
+            previous = q[active]
+            q[active] = chain.clip(previous + np.degrees(step * scale[:, None]))
+            iterations[active] += 1
+
+            moving = np.abs(q[active] - previous).max(axis=1) > min_step
+            if not moving.all():
+                active = active[moving]
+                if not len(active):
+                    break
+        return converged, error_m, iterations
+
+    def solve_batch(self, targets, q0=None, approach=None):
+        """
+        Solve many targets at once (vectorized over targets).
+
+        Args:
+            targets: (N, 3) tool positions in meters
+            q0: (N, dof) or (dof,) start angles in degrees (default: home)
+            approach: (3,) or (N, 3) desired approach direction, or None for position only
+
+        Returns:
+            dict: 'q_deg' (N, dof), 'converged' (N,) bool, 'error_m' (N,) final
+                  position error, 'iterations' (N,) iterations used over all attempts
+        """
+        chain = self.chain
+        targets = np.atleast_2d(np.asarray(targets, dtype=np.float64))
+        n = targets.shape[0]
+        start = chain.home_deg if q0 is None else np.asarray(q0, dtype=np.float64)
+        q = chain.clip(np.broadcast_to(start, (n, chain.dof)).copy())
+        weight = self.orientation_weight if approach is not None else 0.0
+        if approach is not None:
+            approach = np.asarray(approach, dtype=np.float64)
+            approach = np.broadcast_to(approach / np.linalg.norm(approach, axis=-1, keepdims=True), (n, 3))
+
+        converged, error_m, iterations = self._iterate(targets, q, approach, weight)
+
+        rng = np.random.default_rng(self.seed)
+        low = np.where(np.isfinite(chain.min_deg), chain.min_deg, -180.0)
+        high = np.where(np.isfinite(chain.max_deg), chain.max_deg, 180.0)
+        for _ in range(self.restarts):
+            retry = np.flatnonzero(~converged)
+            if not len(retry):
+                break
+            q_retry = rng.uniform(low, high, (len(retry), chain.dof))
+            retry_approach = approach[retry] if approach is not None else None
+            ok, retry_error, retry_iterations = self._iterate(targets[retry], q_retry, retry_approach, weight)
+            iterations[retry] += retry_iterations
+            # Keep whichever attempt got closer
+            better = ok | (retry_error < error_m[retry])
+            q[retry[better]] = q_retry[better]
+            error_m[retry[better]] = retry_error[better]
+            converged[retry[better]] = ok[better]
+
+        return {"q_deg": q, "converged": converged, "error_m": error_m, "iterations": iterations}
+
+    @profiling.timed("dls_ik")
+    def solve(self, x, y, z, approach=None, q0=None):
+        """
+        Solve one target, warm-starting from the previous converged solution.
+
+        Args:
+            x, y, z: Tool position in table coordinates (meters)
+            approach: Desired approach direction (e.g. APPROACH_DOWN), or None for position only
+            q0: Start angles in degrees (default: previous solution, else home)
+
+        Returns:
+            dict: '<joint>_deg' angles plus 'converged', 'error_m' and 'iterations'
+        """
+        if q0 is None:
+            q0 = self.last_solution
+        result = self.solve_batch([(x, y, z)], q0=q0, approach=approach)
+        q = result["q_deg"][0]
+        if result["converged"][0]:
+            self.last_solution = q
+        angles = self.chain.angles_dict(q)
+        angles.update(converged=bool(result["converged"][0]), error_m=float(result["error_m"][0]),
+                      iterations=int(result["iterations"][0]))
+        return angles
+
+    def reset(self):
+        """Forget the warm start (e.g. after the arm was moved by hand)."""
+        self.last_solution = None
+
+
+def _limits(spec, name):
+    limits = spec.get("joint_limits_deg", {}).get(name, {})
+    return limits.get("min"), limits.get("max"), limits.get("home", 0.0)
+
+
+def chain_from_spec(spec, calibration=None):
+    """
+    Build a KinematicChain from an arm spec dict (see module docstring).
+
+    Args:
+        spec: Arm spec dict (e.g. from load_arm_spec())
+        calibration: Calibration dict; for the derived 4-DOF chain its geometry
+                     and arm base position take precedence over the spec's, so
+                     the chain matches calculate_arm_angles
+
+    Returns:
+        KinematicChain
+    """
+    if "kinematic_chain" in spec:
+        section = spec["kinematic_chain"]
+        joints = []
+        for entry in section["joints"]:
+            min_deg, max_deg, home_deg = _limits(spec, entry["name"])
+            joints.append(Joint(
+                entry["name"], entry["axis"], entry.get("origin_m", (0, 0, 0)),
+                direction=entry.get("direction", 1), zero_deg=entry.get("zero_deg", 0.0),
+                min_deg=entry.get("min_deg", min_deg), max_deg=entry.get("max_deg", max_deg),
+                home_deg=entry.get("home_deg", home_deg),
+            ))
+        return KinematicChain(joints, section.get("tool_m", (0, 0, 0)))
+
+    if calibration is None:
+        calibration = load_calibration()
+    geometry = spec.get("arm_geometry", {})
+    mounting = spec.get("mounting", {})
+
+    def value(key, spec_value, default):
+        return calibration.get(key, spec_value if spec_value is not None else default)
+
+    base_x = value("arm_base_x", mounting.get("arm_base_x_m"), 0.0)
+    base_y = value("arm_base_y", mounting.get("arm_base_y_m"), 0.0)
+    shoulder_z = (value("base_height_m", geometry.get("base_height_m"), 0.0612) +
+                  value("shoulder_height_m", geometry.get("shoulder_height_m"), 0.095))
+    upper = value("upper_arm_length_m", geometry.get("upper_arm_length_m"), 0.12)
+    lower = value("lower_arm_length_m", geometry.get("lower_arm_length_m"), 0.09)
+    hand = value("hand_length_m", geometry.get("gripper_length_m"), 0.06)
+
+    pitch = (0, -1, 0)
+    joints = []
+    for name, axis, origin, direction, zero_deg in (
+        ("base", (0, 0, 1), (base_x, base_y, 0.0), 1, 0.0),
+        ("shoulder", pitch, (0.0, 0.0, shoulder_z), 1, 0.0),
+        # Elbow angle is the interior angle between the arm segments (180 = straight)
+        ("elbow", pitch, (upper, 0.0, 0.0), -1, 180.0),
+        # Wrist 0 = hand perpendicular to the lower arm, bent down
+        ("wrist", pitch, (lower, 0.0, 0.0), 1, -90.0),
+    ):
+        min_deg, max_deg, home_deg = _limits(spec, name)
+        joints.append(Joint(name, axis, origin, direction, zero_deg, min_deg, max_deg, home_deg))
+    return KinematicChain(joints, (hand, 0.0, 0.0))
+
+
+def load_chain(path=ARM_SPEC_FILE, calibration=None):
+    """Load the arm spec and build its kinematic chain."""
+    return chain_from_spec(load_arm_spec(path), calibration)
@@ -6,6 +6,10 @@ Optimized for bird's eye view (top-down camera) setup.
 import json
 import os
 
+import numpy as np
+
+import profiling
+
 # Calibration parameters (can be saved/loaded from file)
 CALIBRATION_FILE = "calibration.json"
 
@@ -65,37 +69,157 @@ def save_calibration(calibration=None):
         return False
 
 
-def px_to_table(cx, cy, calibration=None):
+class CalibrationTransform:
+    """
+    Pixel <-> table mapping compiled from a calibration dict.
+    
+    The mapping is a 3x3 homogeneous matrix (pixel -> table meters) plus its
+    inverse. It is built from origin_px/scale/flip, or taken directly from a
+    "homography" entry when the calibration has one (e.g. a tilted camera).
+    Both directions accept scalars or NumPy arrays of any shape.
+    
+    Instances are immutable; use get_transform() to get one that is rebuilt
+    only when the calibration values change.
     """
-    Convert pixel coordinates to table coordinates (meters) for bird's eye view.
+    
+    __slots__ = ("matrix", "inverse", "_offset", "_scale")
+    
+    def __init__(self, calibration):
+        """
+        Args:
+            calibration: Calibration dict
+        """
+        if calibration.get("homography") is not None:
+            matrix = np.array(calibration["homography"], dtype=np.float64).reshape(3, 3)
+            offset = scale = None
+        else:
+            origin_x, origin_y = calibration["origin_px"]
+            sx = -calibration["scale_x"] if calibration.get("flip_x", False) else calibration["scale_x"]
+            sy = -calibration["scale_y"] if calibration.get("flip_y", True) else calibration["scale_y"]
+            matrix = np.array([[sx, 0.0, -origin_x * sx],
+                               [0.0, sy, -origin_y * sy],
+                               [0.0, 0.0, 1.0]])
+            offset = (float(origin_x), float(origin_y))
+            scale = (float(sx), float(sy))
+        inverse = np.linalg.inv(matrix)
+        matrix.flags.writeable = False
+        inverse.flags.writeable = False
+        
+        object.__setattr__(self, "matrix", matrix)
+        object.__setattr__(self, "inverse", inverse)
+        # Origin/scale form of the matrix: evaluating (px - origin) * scale and
+        # origin + x / scale keeps results bit-identical to the formulas the
+        # pixel/table functions have always used (table_to_px truncates, so
+        # one-ulp differences would move points by a pixel)
+        object.__setattr__(self, "_offset", offset)
+        object.__setattr__(self, "_scale", scale)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("CalibrationTransform is immutable")
+    
+    @staticmethod
+    def _as_input(u, v):
+        """Scalars pass through untouched (plain float math is fastest); anything else becomes float arrays."""
+        if isinstance(u, _SCALAR_TYPES) and isinstance(v, _SCALAR_TYPES):
+            return u, v
+        return np.asarray(u, dtype=np.float64), np.asarray(v, dtype=np.float64)
+    
+    @classmethod
+    def _project(cls, matrix, u, v):
+        """Apply a 3x3 homogeneous matrix to scalar or array points."""
+        u, v = cls._as_input(u, v)
+        w = matrix[2, 0] * u + matrix[2, 1] * v + matrix[2, 2]
+        x = (matrix[0, 0] * u + matrix[0, 1] * v + matrix[0, 2]) / w
+        y = (matrix[1, 0] * u + matrix[1, 1] * v + matrix[1, 2]) / w
+        return x, y
+    
+    def px_to_table(self, cx, cy):
+        """
+        Map pixel coordinates to table coordinates (meters).
+        
+        Args:
+            cx, cy: Pixel coordinates (scalars or arrays)
+        
+        Returns:
+            tuple: (x, y) in meters, floats or arrays matching the input
+        """
+        if self._scale is None:
+            return self._project(self.matrix, cx, cy)
+        cx, cy = self._as_input(cx, cy)
+        return (cx - self._offset[0]) * self._scale[0], (cy - self._offset[1]) * self._scale[1]
+    
+    def table_to_px(self, x, y):
+        """
+        Map table coordinates (meters) to pixel coordinates, unrounded.
+        
+        Args:
+            x, y: Table coordinates in meters (scalars or arrays)
+        
+        Returns:
+            tuple: (cx, cy) pixel coordinates as floats or arrays
+        """
+        if self._scale is None:
+            return self._project(self.inverse, x, y)
+        x, y = self._as_input(x, y)
+        return self._offset[0] + x / self._scale[0], self._offset[1] + y / self._scale[1]
+
+
+_SCALAR_TYPES = (int, float, np.number)
+
+_transform_cache = (None, None)
+
+
+def _transform_signature(calibration):
+    """The calibration values a CalibrationTransform depends on."""
+    origin_px = calibration["origin_px"]
+    homography = calibration.get("homography")
+    return (
+        origin_px[0],
+        origin_px[1],
+        calibration["scale_x"],
+        calibration["scale_y"],
+        calibration.get("flip_x", False),
+        calibration.get("flip_y", True),
+        None if homography is None else str(homography),
+    )
+
+
+def get_transform(calibration=None):
+    """
+    Get the CalibrationTransform for a calibration, rebuilding it only when
+    the calibration's mapping values change (dicts edited in place included).
     
     Args:
-        cx, cy: Centroid pixel coordinates
         calibration: Calibration dict (uses loaded calibration if None)
     
     Returns:
-        tuple: (x, y) in meters relative to table origin
+        CalibrationTransform
     """
+    global _transform_cache
     if calibration is None:
         calibration = load_calibration()
     
-    origin_px = calibration["origin_px"]
-    scale_x = calibration["scale_x"]
-    scale_y = calibration["scale_y"]
-    flip_x = calibration.get("flip_x", False)
-    flip_y = calibration.get("flip_y", True)
-    
-    # Convert pixel offset to meters
-    dx = (cx - origin_px[0]) * scale_x
-    dy = (cy - origin_px[1]) * scale_y
+    signature = _transform_signature(calibration)
+    cached_signature, transform = _transform_cache
+    if transform is None or signature != cached_signature:
+        transform = CalibrationTransform(calibration)
+        _transform_cache = (signature, transform)
+    return transform
+
+
+@profiling.timed("px_to_table")
+def px_to_table(cx, cy, calibration=None):
+    """
+    Convert pixel coordinates to table coordinates (meters) for bird's eye view.
     
-    # Apply flips
-    if flip_x:
-        dx = -dx
-    if flip_y:
-        dy = -dy
+    Args:
+        cx, cy: Centroid pixel coordinates (scalars, or arrays for many points)
+        calibration: Calibration dict (uses loaded calibration if None)
     
-    return dx, dy
+    Returns:
+        tuple: (x, y) in meters relative to table origin
+    """
+    return get_transform(calibration).px_to_table(cx, cy)
 
 
 def table_to_px(x, y, calibration=None):
@@ -104,34 +228,19 @@ def table_to_px(x, y, calibration=None):
     Inverse of px_to_table.
     
     Args:
-        x, y: Table coordinates in meters
+        x, y: Table coordinates in meters (scalars, or arrays for many points)
         calibration: Calibration dict (uses loaded calibration if None)
     
     Returns:
-        tuple: (cx, cy) pixel coordinates
+        tuple: (cx, cy) pixel coordinates, truncated to int (int arrays for array input)
     """
-    if calibration is None:
-        calibration = load_calibration()
-    
-    origin_px = calibration["origin_px"]
-    scale_x = calibration["scale_x"]
-    scale_y = calibration["scale_y"]
-    flip_x = calibration.get("flip_x", False)
-    flip_y = calibration.get("flip_y", True)
-    
-    # Apply flips
-    if flip_x:
-        x = -x
-    if flip_y:
-        y = -y
-    
-    # Convert meters to pixel offset
-    cx = origin_px[0] + (x / scale_x)
-    cy = origin_px[1] + (y / scale_y)
-    
-    return int(cx), int(cy)
+    cx, cy = get_transform(calibration).table_to_px(x, y)
+    if isinstance(cx, _SCALAR_TYPES):
+        return int(cx), int(cy)
+    return cx.astype(np.int64), cy.astype(np.int64)
 
 
+@profiling.timed("calculate_arm_angles")
 def calculate_arm_angles(x, y, z=0.02, calibration=None):
     """
     Calculate robot arm joint angles for a given target position.
@@ -281,6 +390,134 @@ def fake_ik_to_us(x, y, z=0.02, calibration=None):
     return list(map(clamp, [base_us, shoulder_us, elbow_us, wrist_us]))
 
 
+def calculate_arm_angles_batch(x, y, z=0.02, calibration=None):
+    """
+    Vectorized calculate_arm_angles for many targets at once.
+    
+    Same geometry and math as the scalar function, evaluated over NumPy
+    arrays: targets beyond max reach are scaled back onto the reach sphere
+    (without printing a warning per target), and `reachable` reports which
+    targets needed no such correction.
+    
+    Args:
+        x, y: Target positions in meters (arrays or scalars, broadcast together)
+        z: Target height(s) above table in meters (default: 0.02)
+        calibration: Calibration dict (uses loaded calibration if None)
+    
+    Returns:
+        dict: 'base_deg', 'shoulder_deg', 'elbow_deg', 'wrist_deg' arrays and
+              'reachable' boolean mask (within max reach and not closer to the
+              shoulder than |upper - lower| arm length). Targets exactly at the
+              shoulder get NaN angles.
+    """
+    if calibration is None:
+        calibration = load_calibration()
+    
+    # Geometry looked up once for the whole batch
+    arm_base_x = calibration.get("arm_base_x", 0.0)
+    arm_base_y = calibration.get("arm_base_y", 0.0)
+    base_height = calibration.get("base_height_m", 0.0612)
+    shoulder_height = calibration.get("shoulder_height_m", 0.095)
+    upper_arm_length = calibration.get("upper_arm_length_m", 0.12)
+    lower_arm_length = calibration.get("lower_arm_length_m", 0.09)
+    hand_length = calibration.get("hand_length_m", 0.06)
+    
+    x, y, z = np.broadcast_arrays(np.asarray(x, dtype=np.float64),
+                                  np.asarray(y, dtype=np.float64),
+                                  np.asarray(z, dtype=np.float64))
+    
+    rel_x = x - arm_base_x
+    rel_y = y - arm_base_y
+    base_angle_deg = np.degrees(np.arctan2(rel_y, rel_x))
+    
+    xy_dist = np.sqrt(rel_x**2 + rel_y**2)
+    target_z_relative = (z + hand_length) - (base_height + shoulder_height)
+    target_dist = np.sqrt(xy_dist**2 + target_z_relative**2)
+    
+    max_reach = upper_arm_length + lower_arm_length
+    min_reach = abs(upper_arm_length - lower_arm_length)
+    reachable = (target_dist <= max_reach) & (target_dist >= min_reach) & (target_dist > 0)
+    
+    # Scale out-of-reach targets back to max reach, like the scalar version
+    too_far = target_dist > max_reach
+    if too_far.any():
+        scale = np.where(too_far, max_reach / np.where(too_far, target_dist, 1.0), 1.0)
+        xy_dist = xy_dist * scale
+        target_z_relative = target_z_relative * scale
+        target_dist = np.where(too_far, max_reach, target_dist)
+    
+    target_angle_deg = np.degrees(np.arctan2(target_z_relative, xy_dist))
+    
+    cos_elbow = (upper_arm_length**2 + lower_arm_length**2 - target_dist**2) / (2 * upper_arm_length * lower_arm_length)
+    elbow_angle_deg = np.degrees(np.arccos(np.clip(cos_elbow, -1, 1)))
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos_angle_between = (upper_arm_length**2 + target_dist**2 - lower_arm_length**2) / (2 * upper_arm_length * target_dist)
+    angle_between_deg = np.degrees(np.arccos(np.clip(cos_angle_between, -1, 1)))
+    
+    shoulder_angle_deg = target_angle_deg - angle_between_deg
+    wrist_angle_deg = 90 - (shoulder_angle_deg + elbow_angle_deg)
+    
+    return {
+        "base_deg": base_angle_deg,
+        "shoulder_deg": shoulder_angle_deg,
+        "elbow_deg": elbow_angle_deg,
+        "wrist_deg": wrist_angle_deg,
+        "reachable": reachable,
+    }
+
+
+def angles_to_us(angles_deg):
+    """
+    Map joint angles to clamped servo microseconds (same mapping as fake_ik_to_us).
+    
+    Args:
+        angles_deg: Array of angles in degrees (any shape)
+    
+    Returns:
+        np.ndarray: int microseconds in the 900-2100 range
+    """
+    # int() truncates toward zero; NaN angles (unsolvable targets) map to center
+    us = 1500 + np.trunc(np.nan_to_num(np.asarray(angles_deg, dtype=np.float64)) * 600 / 90)
+    return np.clip(us, 900, 2100).astype(np.int64)
+
+
+def within_servo_range(angles_deg):
+    """
+    Which angles angles_to_us maps to servo microseconds without clamping.
+    
+    Args:
+        angles_deg: Array of angles in degrees (any shape)
+    
+    Returns:
+        np.ndarray: bool mask, False for angles outside 900-2100 us and for NaN
+    """
+    angles_deg = np.asarray(angles_deg, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        us = 1500 + np.trunc(angles_deg * 600 / 90)
+        return (us >= 900) & (us <= 2100)
+
+
+def fake_ik_to_us_batch(x, y, z=0.02, calibration=None):
+    """
+    Vectorized fake_ik_to_us for many targets at once.
+    
+    Args:
+        x, y: Target positions in meters (arrays or scalars, broadcast together)
+        z: Target height(s) above table in meters (default: 0.02)
+        calibration: Calibration dict (uses loaded calibration if None)
+    
+    Returns:
+        tuple: (us, reachable) where us is an (..., 4) int array of
+               [base_us, shoulder_us, elbow_us, wrist_us] and reachable is the
+               mask from calculate_arm_angles_batch
+    """
+    angles = calculate_arm_angles_batch(x, y, z, calibration)
+    joints = np.stack([angles["base_deg"], angles["shoulder_deg"],
+                       angles["elbow_deg"], angles["wrist_deg"]], axis=-1)
+    return angles_to_us(joints), angles["reachable"]
+
+
 def get_arm_orientation_info(x, y, z=0.02, calibration=None):
     """
     Get detailed orientation information for debugging.
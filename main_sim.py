@@ -2,14 +2,27 @@
 Main simulation script for robot arm control.
 Uses webcam with YOLOv8 to detect objects and executes tasks based on data-driven decisions.
 Tasks are generated from agricultural data thresholds and executed using computer vision.
+
+Importing this module has no side effects; AuraApp.start() opens the camera,
+loads the model and connects the ESP32 (concurrently), and stop() releases them.
 """
+import argparse
 import cv2
 import json
 import time
-import sys
 import threading
-from detect import find_cup, detect_all_objects
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from detect import find_cup, detect_all_objects, warmup_yolo_model, TrackingDetector, MotionGate, COCO_CLASS_IDS
 from kinematics import px_to_table, load_calibration
+from workspace import load_workspace
+from trajectory import WAYPOINT_SETTLE, sequence_moves, stream_move
+from servo_timing import sequence_delays
+from frame_sources import PACE_MODES, SessionRecorder, open_frame_source
+from event_log import JsonLinesWriter
+from pipeline import DropOldestQueue, Pipeline
+import profiling
+import metrics
 
 # Try to import keyboard listener (for macOS compatibility)
 try:
@@ -17,7 +30,6 @@ try:
     KEYBOARD_LISTENER_AVAILABLE = True
 except ImportError:
     KEYBOARD_LISTENER_AVAILABLE = False
-    print("Note: pynput not installed. Install with: pip install pynput")
 
 # Try to import ESP32 controller (optional)
 try:
@@ -25,58 +37,80 @@ try:
     ESP32_AVAILABLE = True
 except ImportError:
     ESP32_AVAILABLE = False
-    print("Note: ESP32 control not available (pyserial not installed). Running in simulation mode.")
-
-PRINT_JSON_ONLY = False  # True to suppress windows
-USE_ESP32 = False  # Set to True to control real servos
-esp32_controller = None
-
-cap = cv2.VideoCapture(0)
-if not cap.isOpened():
-    print("Error: Camera 0 not available. Trying camera 1...")
-    cap = cv2.VideoCapture(1)
-    if not cap.isOpened():
-        raise SystemExit("Error: No camera available. Check camera permissions in System Settings > Privacy & Security > Camera")
-    else:
-        print("Using camera 1")
-else:
-    print("Using camera 0")
-
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-print("Camera initialized successfully")
-
-# Load calibration
-calibration = load_calibration()
-print("Calibration loaded")
-
-# Initialize ESP32 controller if requested
-if ESP32_AVAILABLE and len(sys.argv) > 1 and sys.argv[1] == "--esp32":
-    USE_ESP32 = True
-    port = sys.argv[2] if len(sys.argv) > 2 else None
-    print("\nConnecting to ESP32...")
-    esp32_controller = ESP32Controller(port=port)
-    if esp32_controller.connect():
-        print("✅ ESP32 connected! Servos will be controlled in real-time.")
-        USE_ESP32 = True
-    else:
-        print("❌ Failed to connect to ESP32. Running in simulation mode.")
-        USE_ESP32 = False
-        esp32_controller = None
-elif ESP32_AVAILABLE:
-    print("\n💡 Tip: Run with '--esp32 [port]' to control real servos")
-    print("   Example: python main_sim.py --esp32 /dev/cu.usbserial-*")
-    print("   Or: python main_sim.py --esp32  (auto-detect port)")
-
-print("\nControls: q=quit, g=grab/harvest bottle (moves it to the side)")
-
-
-def draw_ui(frame, bottle=None, all_detections=None):
+
+PRINT_JSON_ONLY = False  # True to always run headless (same as --headless)
+USE_TRACKING = True  # Track the bottle with crop-only inference once found
+USE_MOTION_GATE = True  # Reuse the last detections while the scene is static
+MOTION_GATE_MAX_AGE = 2.0  # Seconds before a static scene is re-detected anyway
+PIPELINE_STATS_INTERVAL = 10.0  # Seconds between per-stage stats printouts (0 = only on exit)
+WINDOW_NAME = "A.U.R.A. FARM - Bottle Detection"
+PROFILE_OVERLAY_INTERVAL = 0.5  # Seconds between overlay latency refreshes
+SHOW_WORKSPACE_OVERLAY = True  # Outline the arm's reachable table area on the overlay
+# How sequence steps are timed: 'trajectory' = stream smooth moves timed from servo limits,
+# 'model' = one command per step, then the dwell servo_timing.py computes for it,
+# 'fixed' = one command per step, then the step's hand-tuned 'delay'
+SEQUENCE_TIMING = "trajectory"
+SEQUENCE_TIMING_MODES = ("trajectory", "model", "fixed")
+# ESP32 link: 'json' text lines, 'auto' = binary frames if the firmware supports them,
+# 'binary' = refuse firmware without them (see esp32_control.PROTOCOLS)
+SERIAL_PROTOCOL = "json"
+SERIAL_PROTOCOLS = ("json", "auto", "binary")
+# Cap on servo commands per second; setting it also coalesces setpoints (latest wins,
+# unchanged targets dropped) so a fast producer never queues stale ones. None = send every one
+SERIAL_MAX_SEND_RATE = None
+SEQUENCE_STOP_TIMEOUT = 5.0  # Seconds stop() waits for an aborted sequence before disconnecting the ESP32
+
+# Metrics updated on the hot path (cheap in-place updates; see metrics.py)
+INFERENCE_SECONDS = metrics.histogram("aura_inference_seconds", "Inference time per inferred frame (detection stage)")
+DETECTIONS = metrics.counter("aura_detections_total", "Objects found by full-frame detection passes", labels=("label",))
+SEQUENCES = metrics.counter("aura_sequences_total", "Harvesting sequences run")
+SEQUENCE_SECONDS = metrics.histogram("aura_sequence_duration_seconds", "Harvesting sequence duration",
+                                     buckets=(1, 2, 5, 10, 15, 20, 30, 60))
+
+
+def parse_args(argv=None):
+    """Parse main_sim command-line options."""
+    parser = argparse.ArgumentParser(description="A.U.R.A. bottle detection and harvesting")
+    parser.add_argument("--esp32", nargs="?", const="", default=None, metavar="PORT",
+                        help="Control real servos over serial (port auto-detected if omitted)")
+    parser.add_argument("--source", default=None,
+                        help="Camera index, video file, image directory or recorded session (default: camera)")
+    parser.add_argument("--pace", choices=PACE_MODES, default="realtime",
+                        help="Offline sources: 'fast' = every frame as fast as possible, "
+                             "'realtime' = recording's own timing with live-camera frame drops")
+    parser.add_argument("--fps", type=float, default=None, help="Frame rate override for video files and image directories")
+    parser.add_argument("--jsonl", default=None, metavar="PATH", help="Write detections and servo commands as JSON lines ('-' = stdout)")
+    parser.add_argument("--record", default=None, metavar="DIR", help="Record captured frames as a replayable session")
+    parser.add_argument("--headless", action="store_true",
+                        help="No window or drawing; stream one JSON record per frame (to stdout unless --jsonl is given)")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PORT",
+                        help=f"Serve Prometheus metrics on http://{metrics.METRICS_HOST}:PORT/metrics")
+    parser.add_argument("--sequence-timing", choices=SEQUENCE_TIMING_MODES, default=SEQUENCE_TIMING,
+                        help="How harvesting steps are timed (default: %(default)s)")
+    parser.add_argument("--serial-protocol", choices=SERIAL_PROTOCOLS, default=SERIAL_PROTOCOL,
+                        help="ESP32 serial protocol (default: %(default)s)")
+    parser.add_argument("--max-send-rate", type=float, default=SERIAL_MAX_SEND_RATE, metavar="HZ",
+                        help="Cap servo commands per second, keeping only the latest setpoint (default: no cap)")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Record per-stage latencies (also ${profiling.PROFILE_ENV_VAR}=1); shown on the overlay and dumped on exit")
+    args = parser.parse_args(argv)
+    args.headless = PRINT_JSON_ONLY or args.headless
+    if args.headless and not args.jsonl:
+        args.jsonl = "-"
+    return args
+
+
+@profiling.timed("draw_ui")
+def draw_ui(frame, bottle=None, all_detections=None, calibration=None, workspace_contours=None):
     """
     Draw detection UI on frame.
     """
     vis = frame.copy()
     
+    # Outline the area the arm can reach
+    if workspace_contours:
+        cv2.drawContours(vis, workspace_contours, -1, (255, 200, 0), 1)
+    
     # Draw all detections in gray (for reference)
     if all_detections:
         for det in all_detections:
@@ -92,29 +126,36 @@ def draw_ui(frame, bottle=None, all_detections=None):
     if bottle:
         cx, cy = bottle["cx"], bottle["cy"]
         x, y, w, h = bottle["bbox"]
+        # Green if the arm can reach it, red if not
+        color = (0, 255, 0) if bottle.get("reachable", True) else (0, 0, 255)
         
-        # Draw bounding box in green
-        cv2.rectangle(vis, (x, y), (x + w, y + h), (0, 255, 0), 3)
+        # Draw bounding box
+        cv2.rectangle(vis, (x, y), (x + w, y + h), color, 3)
         
         # Draw centroid
-        cv2.circle(vis, (cx, cy), 8, (0, 255, 0), -1)
-        cv2.circle(vis, (cx, cy), 12, (0, 255, 0), 2)
+        cv2.circle(vis, (cx, cy), 8, color, -1)
+        cv2.circle(vis, (cx, cy), 12, color, 2)
         
         # Draw label
-        label = f"BOTTLE ({bottle.get('confidence', 0):.2f})"
+        if "track_id" in bottle:
+            label = f"BOTTLE #{bottle['track_id']} ({bottle.get('confidence', 0):.2f})"
+        else:
+            label = f"BOTTLE ({bottle.get('confidence', 0):.2f})"
+        if not bottle.get("reachable", True):
+            label += " OUT OF REACH"
         cv2.putText(vis, label, (x, max(0, y - 10)), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
         
         # Draw coordinates
         x_table, y_table = px_to_table(cx, cy, calibration=calibration)
         coord_text = f"Table: ({x_table:.3f}m, {y_table:.3f}m)"
         cv2.putText(vis, coord_text, (x, y + h + 20), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
         
         # Draw pixel coordinates
         px_text = f"Pixel: ({cx}, {cy})"
         cv2.putText(vis, px_text, (x, y + h + 40), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
     
     # Draw status
     status = "BOTTLE DETECTED" if bottle else "No bottle detected"
@@ -130,6 +171,21 @@ def draw_ui(frame, bottle=None, all_detections=None):
     return vis
 
 
+def draw_profile(vis, stats):
+    """
+    Draw live p50/p95 latencies in the top-right corner of an overlay (in place).
+    
+    Args:
+        vis: Overlay image from draw_ui
+        stats: profiling.summary() dict
+    """
+    x = vis.shape[1] - 250
+    for i, (name, s) in enumerate(stats.items()):
+        text = f"{name[:20]:<20} {s['p50_ms']:6.1f} / {s['p95_ms']:6.1f} ms"
+        cv2.putText(vis, text, (x, 20 + i * 16), cv2.FONT_HERSHEY_PLAIN, 0.9, (255, 255, 0), 1)
+    return vis
+
+
 # Hardcoded pickup sequence positions
 # Servo microseconds: 1500 = center (90°), 900 = 0°, 2100 = 180°
 # Base (D5): lower = left, higher = right
@@ -140,6 +196,7 @@ def draw_ui(frame, bottle=None, all_detections=None):
 HOME = [1500, 1500, 1500]  # [base, shoulder, elbow]
 
 # Hardcoded pickup sequence for object directly in front
+# ('delay' is only used with --sequence-timing fixed; the other modes time steps from servo speed)
 PICKUP_SEQUENCE = [
     # 1. Approach position (arm extended forward, above object)
     {"name": "approach", "servos": [1500, 1600, 1800], "delay": 2.5},
@@ -160,191 +217,616 @@ PICKUP_SEQUENCE = [
     {"name": "home", "servos": HOME, "delay": 2.5},
 ]
 
-# Flag to prevent multiple sequences running at once
-sequence_running = False
 
-# Global flag for keyboard input
-key_pressed = None
-key_lock = threading.Lock()
 
-def on_key_press(key):
-    """Handle keyboard press events."""
-    global key_pressed
-    try:
-        # Debug: print what key was received
-        print(f"\n[DEBUG] Key received: {key}, type: {type(key)}")
-        
-        if hasattr(key, 'char') and key.char:
-            with key_lock:
-                key_pressed = key.char.lower()
-                print(f"\n>>> ✅ Key pressed via listener: '{key_pressed}'")
-        elif key == keyboard.Key.space:
-            with key_lock:
-                key_pressed = ' '
-                print(f"\n>>> ✅ Space pressed via listener")
-        elif key == keyboard.Key.esc:
-            with key_lock:
-                key_pressed = 'q'
-                print(f"\n>>> ✅ ESC pressed via listener")
-        else:
-            print(f"[DEBUG] Key not recognized: {key}")
-    except Exception as e:
-        print(f"[ERROR] Exception in on_key_press: {e}")
+def _timed(fn, *args):
+    """Run fn(*args) and return (result, seconds)."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
 
-def on_key_release(key):
-    """Handle keyboard release events."""
-    pass
 
-# Start keyboard listener in background thread
-keyboard_listener = None
-if KEYBOARD_LISTENER_AVAILABLE:
-    try:
-        keyboard_listener = keyboard.Listener(on_press=on_key_press, on_release=on_key_release, suppress=False)
-        keyboard_listener.start()
-        print("✅ Background keyboard listener started (works even when window not focused)")
-        print("   NOTE: On macOS, you may need to grant Accessibility permissions")
-        print("   System Settings > Privacy & Security > Accessibility > Terminal (or Python)")
-        time.sleep(0.5)  # Give listener time to start
-    except Exception as e:
-        print(f"⚠️  Could not start keyboard listener: {e}")
-        print("   Falling back to OpenCV window input only")
-        KEYBOARD_LISTENER_AVAILABLE = False
-else:
-    print("⚠️  pynput not available - using OpenCV window input only")
-    print("   Install with: pip install pynput")
-
-def execute_harvesting_sequence(bottle):
+class AuraApp:
     """
-    Execute the hardcoded harvesting sequence: grab bottle and move it to the left.
-    Runs in a separate thread so it doesn't block the camera.
-    
-    Args:
-        bottle: Bottle detection dict with 'cx', 'cy', 'bbox' (used for display only)
+    Bottle detection and harvesting runtime.
+
+    Construction only stores options. start() brings up the frame source,
+    the YOLO model (warmed up with a dummy inference) and the ESP32 link
+    concurrently and starts the pipeline; run() drives display and keyboard
+    input on the calling (main) thread until quit or end of source; stop()
+    releases everything and prints stats.
     """
-    global sequence_running
-    
-    if sequence_running:
-        print("\n⚠️  Sequence already running. Please wait...")
-        return
-    
-    def run_sequence():
-        global sequence_running
-        sequence_running = True
+
+    def __init__(self, args):
+        """
+        Args:
+            args: Options from parse_args()
+        """
+        self.args = args
+        self.headless = args.headless
+        self.cap = None
+        self.events = None
+        self.recorder = None
+        self.calibration = None
+        self.workspace = None
+        self.esp32_controller = None
+        self.use_esp32 = False
+        self.servo_position = list(HOME)  # Last commanded servos (the firmware boots at HOME)
+        self.keyboard_listener = None
+        self.keyboard_available = KEYBOARD_LISTENER_AVAILABLE
+        self.pipeline = None
+        self.metrics_server = None
+        self.startup_times = {}
+
+        # Flag to prevent multiple sequences running at once
+        self.sequence_running = False
+        self.sequence_abort = threading.Event()  # Set by stop(): the sequence ends at the next setpoint or step
+
+        # Keyboard input from the background listener
+        self.key_pressed = None
+        self.key_lock = threading.Lock()
+
+        # Detection state (only touched by the detect stage)
+        self.frame_count = 0
+        self.inference_count = 0
+        self.all_detections = []
+        self.bottle = None
+        self.bottle_tracker = TrackingDetector(classes=[COCO_CLASS_IDS['bottle']], confidence=0.25)
+        self.motion_gate = MotionGate(max_age=MOTION_GATE_MAX_AGE)
+
+        self._launch_time = None
+        self._first_frame_time = None
+        self._stdout = None
+        self._profile_stats = {}
+        self._profile_stats_time = 0.0
+
+    # ----- startup / shutdown -----
+
+    def _open_source(self, source):
+        return source if source.open() else None
+
+    def _connect_esp32(self):
+        controller = ESP32Controller(port=self.args.esp32 or None, protocol=self.args.serial_protocol,
+                                     max_send_rate=self.args.max_send_rate)
+        return controller if controller.connect() else None
+
+    def _start_keyboard_listener(self):
+        if not self.keyboard_available:
+            print("⚠️  pynput not available - using OpenCV window input only")
+            print("   Install with: pip install pynput")
+            return
+        try:
+            # The listener comes up on its own thread; no need to wait for it
+            self.keyboard_listener = keyboard.Listener(on_press=self.on_key_press, on_release=self.on_key_release,
+                                                       suppress=False)
+            self.keyboard_listener.start()
+            print("✅ Background keyboard listener started (works even when window not focused)")
+            print("   NOTE: On macOS, you may need to grant Accessibility permissions")
+            print("   System Settings > Privacy & Security > Accessibility > Terminal (or Python)")
+        except Exception as e:
+            print(f"⚠️  Could not start keyboard listener: {e}")
+            print("   Falling back to OpenCV window input only")
+            self.keyboard_available = False
+
+    def start(self):
+        """
+        Bring up camera, model and ESP32 concurrently, then start the pipeline.
+
+        Raises:
+            SystemExit: If the frame source can't be opened
+        """
+        self._launch_time = time.perf_counter()
+        args = self.args
+        if args.profile:
+            profiling.enable()
+
+        # With records on stdout, keep stdout clean for them and send log output to stderr
+        if args.jsonl:
+            self.events = JsonLinesWriter(args.jsonl)
+            if args.jsonl == "-":
+                self._stdout = sys.stdout
+                sys.stdout = sys.stderr
+
+        if not KEYBOARD_LISTENER_AVAILABLE:
+            print("Note: pynput not installed. Install with: pip install pynput")
+        if not ESP32_AVAILABLE:
+            print("Note: ESP32 control not available (pyserial not installed). Running in simulation mode.")
+
+        try:
+            source = open_frame_source(args.source, pace=args.pace, fps=args.fps)
+        except (FileNotFoundError, ValueError) as e:
+            raise SystemExit(f"Error: {e}")
+        camera_config = getattr(source, "config", {})
+        frame_shape = (camera_config.get("height") or 480, camera_config.get("width") or 640, 3)
+
+        # Camera open, model load + warmup and the ESP32 connect (a handshake
+        # that takes ~2 s if the board resets) are independent, so overlap them
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="startup") as pool:
+            source_future = pool.submit(_timed, self._open_source, source)
+            model_future = pool.submit(warmup_yolo_model, frame_shape)
+            esp32_future = None
+            if ESP32_AVAILABLE and args.esp32 is not None:
+                print("\nConnecting to ESP32...")
+                esp32_future = pool.submit(_timed, self._connect_esp32)
+
+            self.calibration, self.startup_times["calibration"] = _timed(load_calibration)
+            print("Calibration loaded")
+            # Reachability grid: loaded from workspace_cache/ unless the arm geometry changed
+            self.workspace, self.startup_times["workspace"] = _timed(load_workspace, self.calibration)
+            self._start_keyboard_listener()
+
+            self.cap, self.startup_times["camera"] = source_future.result()
+            load_seconds, warmup_seconds = model_future.result()
+            self.startup_times["model load"] = load_seconds
+            self.startup_times["model warmup"] = warmup_seconds
+            if esp32_future is not None:
+                self.esp32_controller, self.startup_times["esp32"] = esp32_future.result()
+
+        if self.cap is None:
+            if args.source is None:
+                raise SystemExit("Error: No camera available. Check camera permissions in System Settings > Privacy & Security > Camera")
+            raise SystemExit(f"Error: Could not open frame source {args.source}")
+        print("Frame source initialized successfully")
+
+        if esp32_future is not None:
+            if self.esp32_controller:
+                print("✅ ESP32 connected! Servos will be controlled in real-time.")
+                self.use_esp32 = True
+            else:
+                print("❌ Failed to connect to ESP32. Running in simulation mode.")
+        elif ESP32_AVAILABLE:
+            print("\n💡 Tip: Run with '--esp32 [port]' to control real servos")
+            print("   Example: python main_sim.py --esp32 /dev/cu.usbserial-*")
+            print("   Or: python main_sim.py --esp32  (auto-detect port)")
+
+        self.recorder = SessionRecorder(args.record) if args.record else None
+        self._build_pipeline()
+        if args.metrics_port is not None:
+            self._start_metrics_server(args.metrics_port)
+        self.pipeline.start()
+
+        self.startup_times["total"] = time.perf_counter() - self._launch_time
+        print("\nStartup times:")
+        for name, seconds in self.startup_times.items():
+            print(f"  {name:<13}{seconds * 1000:>8.0f} ms")
+        print("\nControls: q=quit, g=grab/harvest bottle (moves it to the side)")
+
+    def _build_pipeline(self):
+        # Fast replay must see every frame to be deterministic, so capture waits for
+        # detection instead of dropping frames
+        lossless = getattr(self.cap, "pace", None) == "fast"
+
+        # Stages joined by bounded drop-oldest queues: rendering never blocks
+        # detection, and detection never blocks the motion worker
+        self.detect_queue = DropOldestQueue(maxsize=1, name="detect", block=lossless)
+        self.render_queue = DropOldestQueue(maxsize=1, name="render")
+        self.display_queue = DropOldestQueue(maxsize=1, name="display")
+        self.motion_queue = DropOldestQueue(maxsize=1, name="motion")
+
+        self.pipeline = Pipeline()
+        self.pipeline.add_stage("capture", self.capture_stage, output_queue=self.detect_queue)
+        if self.headless:
+            # No render stage: nothing copies or draws on frames nobody will see
+            self._detect_worker = self.pipeline.add_stage("detect", self.detect_stage, self.detect_queue)
+        else:
+            self._detect_worker = self.pipeline.add_stage("detect", self.detect_stage, self.detect_queue, self.render_queue)
+            self.pipeline.add_stage("render", self.render_stage, self.render_queue, self.display_queue)
+        self._motion_worker = self.pipeline.add_stage("motion", self.run_harvesting_sequence, self.motion_queue,
+                                                      frame_path=False)
+
+    def _start_metrics_server(self, port):
+        """Register scrape-time metrics for this run and serve them on a background thread."""
+        def dropped():
+            counts = {"camera": self.cap.stats()["dropped"] if self.cap else 0}
+            counts["pipeline"] = sum(queue.stats()["dropped"] for queue in (self.detect_queue, self.render_queue))
+            return counts
         
-        # Convert pixel coordinates to table coordinates (for display)
-        cx, cy = bottle["cx"], bottle["cy"]
-        x, y = px_to_table(cx, cy, calibration=calibration)
+        def seconds_since_ack():
+            seconds = self.esp32_controller.seconds_since_ack() if self.esp32_controller else None
+            return float("nan") if seconds is None else seconds
+        
+        metrics.callback("aura_frames_captured_total", "Frames read from the frame source",
+                         lambda: self.cap.stats()["captured"], metric_type="counter")
+        metrics.callback("aura_frames_processed_total", "Frames through the detection stage",
+                         lambda: self.frame_count, metric_type="counter")
+        metrics.callback("aura_frames_dropped_total", "Frames dropped as stale, by where they were dropped",
+                         dropped, labels=("where",), metric_type="counter")
+        metrics.callback("aura_inferences_total", "Frames that ran inference (the rest reused detections)",
+                         lambda: self.inference_count, metric_type="counter")
+        metrics.callback("aura_stage_utilization", "Fraction of time each pipeline stage is busy",
+                         lambda: {name: s["utilization"] for name, s in self.pipeline.stats().items()},
+                         labels=("stage",))
+        metrics.callback("aura_sequence_running", "1 while a harvesting sequence runs", lambda: int(self.sequence_running))
+        metrics.callback("aura_esp32_connected", "1 while the ESP32 serial link is up",
+                         lambda: int(bool(self.esp32_controller and self.esp32_controller.connected)))
+        metrics.callback("aura_esp32_seconds_since_last_ack", "Seconds since the ESP32 last answered OK (NaN = never)",
+                         seconds_since_ack)
+        metrics.callback("aura_esp32_commands_pending", "Commands sent to the ESP32 and not yet acked",
+                         lambda: self.esp32_controller.pending_count if self.esp32_controller else 0)
         
-        print(f"\n{'='*60}")
-        print(f"HARVESTING SEQUENCE INITIATED")
-        print(f"{'='*60}")
-        print(f"Bottle detected at pixel: ({cx}, {cy})")
-        print(f"Table coordinates: ({x:.3f}m, {y:.3f}m)")
-        print(f"\nExecuting hardcoded pickup sequence...")
-        print(f"{'='*60}")
+        self.metrics_server = metrics.MetricsServer(port=port)
+        try:
+            self.metrics_server.start()
+        except OSError as e:
+            print(f"⚠️  Could not start metrics server on port {port}: {e}")
+            self.metrics_server = None
+
+    def stop(self):
+        """Stop the pipeline, release devices and print run stats. Safe after a partial start()."""
+        if self.pipeline is not None:
+            # Abort a running sequence and wait for it, so the ESP32 isn't disconnected mid-move
+            self.sequence_abort.set()
+            self._motion_worker.stop(timeout=SEQUENCE_STOP_TIMEOUT)
+            self.pipeline.stop()
+            print("\n" + self.pipeline.format_stats())
+            self.pipeline = None
+
+        if profiling.is_enabled():
+            print("\n" + profiling.format_summary())
+            if self.events:
+                self.events.write("profile", timers=profiling.summary())
+
+        if self.cap is not None:
+            capture_stats = self.cap.stats()
+            print(f"Frames: {capture_stats['captured']} captured, {capture_stats['dropped']} dropped as stale")
+            self.cap.release()
+            self.cap = None
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+        if self.events:
+            self.events.close()
+            self.events = None
+        if not self.headless:
+            cv2.destroyAllWindows()
+
+        # Stop keyboard listener
+        if self.keyboard_listener:
+            self.keyboard_listener.stop()
+            self.keyboard_listener = None
+
+        # Disconnect ESP32 if connected
+        if self.esp32_controller:
+            link = self.esp32_controller.link_stats()
+            print(f"ESP32 link: {link['sent']} commands, {link['acked']} acked, {link['nacked']} rejected, "
+                  f"{link['unacked']} unanswered, {link['coalesced']} coalesced, {link['deduplicated']} deduplicated; "
+                  f"round trip p50 {link['round_trip']['p50_ms']:.1f} ms, p95 {link['round_trip']['p95_ms']:.1f} ms")
+            self.esp32_controller.disconnect()
+            self.esp32_controller = None
+
+        if USE_MOTION_GATE and self.frame_count:
+            gate_stats = self.motion_gate.stats()
+            print(f"Motion gate: {gate_stats['executed']} inferences run, {gate_stats['skipped']} skipped "
+                  f"({gate_stats['skip_ratio']*100:.0f}% of frames reused previous detections)")
+
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+
+        print("Camera released. Exiting.")
+        if self._stdout is not None:
+            sys.stdout = self._stdout
+            self._stdout = None
+
+    # ----- keyboard -----
+
+    def on_key_press(self, key):
+        """Handle keyboard press events."""
+        try:
+            # Debug: print what key was received
+            print(f"\n[DEBUG] Key received: {key}, type: {type(key)}")
+            
+            if hasattr(key, 'char') and key.char:
+                with self.key_lock:
+                    self.key_pressed = key.char.lower()
+                    print(f"\n>>> ✅ Key pressed via listener: '{self.key_pressed}'")
+            elif key == keyboard.Key.space:
+                with self.key_lock:
+                    self.key_pressed = ' '
+                    print(f"\n>>> ✅ Space pressed via listener")
+            elif key == keyboard.Key.esc:
+                with self.key_lock:
+                    self.key_pressed = 'q'
+                    print(f"\n>>> ✅ ESC pressed via listener")
+            else:
+                print(f"[DEBUG] Key not recognized: {key}")
+        except Exception as e:
+            print(f"[ERROR] Exception in on_key_press: {e}")
+
+    def on_key_release(self, key):
+        """Handle keyboard release events."""
+        pass
+
+    def read_key(self):
+        """
+        Get a pending key press, or None.
+        The background listener works without window focus; the OpenCV window
+        (not available headless) is the fallback.
+        """
+        # Method 1: Background keyboard listener (works without window focus) - check first
+        if self.keyboard_available:
+            with self.key_lock:
+                if self.key_pressed:
+                    k = self.key_pressed
+                    self.key_pressed = None  # Reset after reading
+                    print(f"\n>>> ✅ Using key from listener: '{k}'")
+                    return k
         
-        for i, step in enumerate(PICKUP_SEQUENCE, 1):
-            print(f"\n[{i}/{len(PICKUP_SEQUENCE)}] {step['name'].upper()}")
-            print(f"  Servos: Base(D5)={step['servos'][0]}us, Shoulder(D18)={step['servos'][1]}us, "
-                  f"Elbow(D22)={step['servos'][2]}us")
+        # Method 2: OpenCV window input (requires window focus) - fallback
+        if not self.headless:
+            cv_key = cv2.waitKey(1) & 0xFF
+            if cv_key != 255 and cv_key != 0:
+                try:
+                    k = chr(cv_key).lower()
+                    print(f"\n>>> ✅ Key from OpenCV window: '{k}'")
+                    return k
+                except:
+                    pass
+        return None
+
+    # ----- harvesting -----
+
+    def run_harvesting_sequence(self, bottle):
+        """
+        Run the hardcoded harvesting sequence: grab bottle and move it to the left.
+        Called on the motion stage's worker, so it never blocks the camera.
+        
+        Args:
+            bottle: Bottle detection dict with 'cx', 'cy', 'bbox' (used for display only)
+        """
+        self.sequence_running = True
+        try:
+            sequence_start = time.monotonic()
+        
+            # Convert pixel coordinates to table coordinates (for display)
+            cx, cy = bottle["cx"], bottle["cy"]
+            x, y = px_to_table(cx, cy, calibration=self.calibration)
+        
+            print(f"\n{'='*60}")
+            print(f"HARVESTING SEQUENCE INITIATED")
+            print(f"{'='*60}")
+            print(f"Bottle detected at pixel: ({cx}, {cy})")
+            print(f"Table coordinates: ({x:.3f}m, {y:.3f}m)")
+            print(f"\nExecuting hardcoded pickup sequence...")
+            print(f"{'='*60}")
+        
+            connected = self.use_esp32 and self.esp32_controller
+            send = self.esp32_controller.set_servos_from_us_list if connected else (lambda setpoint: None)
+            mode = self.args.sequence_timing
+            moves = sequence_moves(self.servo_position, PICKUP_SEQUENCE)
+            delays = sequence_delays(self.servo_position, PICKUP_SEQUENCE) if mode == "model" else None
+            for i, (step, move) in enumerate(zip(PICKUP_SEQUENCE, moves), 1):
+                if self.sequence_abort.is_set():
+                    break
+                print(f"\n[{i}/{len(PICKUP_SEQUENCE)}] {step['name'].upper()}")
+                print(f"  Servos: Base(D5)={step['servos'][0]}us, Shoulder(D18)={step['servos'][1]}us, "
+                      f"Elbow(D22)={step['servos'][2]}us")
             
-            # Send command to ESP32 if connected
-            if USE_ESP32 and esp32_controller:
-                success = esp32_controller.set_servos_from_us_list(step['servos'])
-                if success:
-                    print(f"  ✅ Command sent to ESP32")
+                if mode == "trajectory":
+                    # Stream intermediate setpoints; the move takes as long as the servo limits require
+                    result = stream_move(move, send, abort=self.sequence_abort)
+                    if result["aborted"]:
+                        break  # The arm stopped short of this waypoint
+                    success = result["failed"] == 0 if connected else None
+                    print(f"  Moved in {result['elapsed']:.2f}s (planned {move.duration:.2f}s, "
+                          f"{result['setpoints']} setpoints)")
+                    if success is False:
+                        print(f"  ❌ {result['failed']} setpoints failed to send to ESP32")
+                    elif not connected:
+                        print(f"  (Simulation mode - no ESP32)")
+                    self.sequence_abort.wait(WAYPOINT_SETTLE + step.get('hold', 0.0))
+                    timing = {"duration": round(result['elapsed'], 3), "planned": round(move.duration, 3)}
                 else:
-                    print(f"  ❌ Failed to send command to ESP32")
+                    # Send command to ESP32 if connected
+                    success = None
+                    if connected:
+                        success = send(step['servos'])
+                        if success:
+                            print(f"  ✅ Command sent to ESP32")
+                        else:
+                            print(f"  ❌ Failed to send command to ESP32")
+                    else:
+                        print(f"  (Simulation mode - no ESP32)")
+                
+                    # Wait for movement
+                    delay = delays[i - 1] if delays else step['delay']
+                    self.sequence_abort.wait(delay)
+                    timing = {"delay": round(delay, 3)}
+                self.servo_position = list(step['servos'])
+            
+                if self.events:
+                    self.events.write("servo", step=step['name'], index=i, servos=step['servos'], sent=success, **timing)
+        
+            if self.sequence_abort.is_set():
+                print("\nHarvesting sequence aborted (shutting down)")
+                return
+            
+            print(f"\n{'='*60}")
+            print(f"HARVESTING SEQUENCE COMPLETE ({time.monotonic() - sequence_start:.1f}s)")
+            print(f"{'='*60}\n")
+        
+            SEQUENCES.inc()
+            SEQUENCE_SECONDS.observe(time.monotonic() - sequence_start)
+        finally:
+            self.sequence_running = False
+
+    def execute_harvesting_sequence(self, bottle):
+        """
+        Queue the harvesting sequence on the motion stage.
+        
+        Args:
+            bottle: Bottle detection dict with 'cx', 'cy', 'bbox' (used for display only)
+        """
+        if self.sequence_running or len(self.motion_queue):
+            print("\n⚠️  Sequence already running. Please wait...")
+            return
+        
+        self.motion_queue.put(bottle)
+
+    # ----- pipeline stages -----
+
+    def capture_stage(self):
+        """Source stage: newest camera frame."""
+        captured = self.cap.read_frame()
+        if captured is None:
+            raise StopIteration
+        if self.recorder:
+            self.recorder.write(captured)
+        return captured, time.perf_counter()
+
+    def detection_record(self, det):
+        """Compact JSON form of a detection, with its table coordinates."""
+        x_table, y_table = px_to_table(det["cx"], det["cy"], calibration=self.calibration)
+        record = {
+            "label": det.get("label"),
+            "confidence": round(det.get("confidence", 0), 3),
+            "cx": det["cx"],
+            "cy": det["cy"],
+            "bbox": det["bbox"],
+            "table": [round(x_table, 4), round(y_table, 4)],
+            "reachable": bool(self.workspace.is_reachable(x_table, y_table)),
+        }
+        if "track_id" in det:
+            record["track_id"] = det["track_id"]
+        return record
+
+    def mark_reachable(self, det):
+        """Flag a detection with whether its table position is inside the arm's workspace."""
+        x_table, y_table = px_to_table(det["cx"], det["cy"], calibration=self.calibration)
+        det["reachable"] = bool(self.workspace.is_reachable(x_table, y_table))
+        return det["reachable"]
+
+    def detect_stage(self, item):
+        """Detection stage: flip, motion gate, bottle tracking and all-object detection."""
+        captured, read_at = item
+        start = time.perf_counter()
+        
+        # Flip frame horizontally
+        frame = cv2.flip(captured.frame, 1)
+        
+        # Skip inference while the table is static, reusing the last detections.
+        # The gate runs on the frame's own timestamp so replays age it identically.
+        inferred = not USE_MOTION_GATE or self.motion_gate.check(frame, now=captured.timestamp)
+        if inferred:
+            # Detect all objects every 5th inference (for display only)
+            # Runs first so find_cup below reuses this all-class inference
+            if self.inference_count % 5 == 0:
+                self.all_detections, _ = detect_all_objects(frame, confidence=0.25, frame_id=self.frame_count)
+                for det in self.all_detections:
+                    DETECTIONS.inc(label=det["label"])
+            
+            if USE_TRACKING:
+                # Track the bottle: YOLO on a crop around its last position,
+                # full-frame re-detection periodically or when the track is lost
+                bottle_tracks = self.bottle_tracker.update(frame, frame_id=self.frame_count)
+                # Target the best bottle the arm can reach; show an unreachable one only if that's all there is
+                reachable = [track for track in bottle_tracks if self.mark_reachable(track)]
+                self.bottle = (reachable or bottle_tracks or [None])[0]
             else:
-                print(f"  (Simulation mode - no ESP32)")
+                # Detect bottle every frame (bottle-only inference on the other frames)
+                self.bottle, _ = find_cup(frame, confidence=0.25, frame_id=self.frame_count)
+                if self.bottle:
+                    self.mark_reachable(self.bottle)
             
-            # Wait for movement
-            time.sleep(step['delay'])
+            self.inference_count += 1
+            INFERENCE_SECONDS.observe(time.perf_counter() - start)
         
-        print(f"\n{'='*60}")
-        print(f"HARVESTING SEQUENCE COMPLETE")
-        print(f"{'='*60}\n")
+        if self.events:
+            done = time.perf_counter()
+            self.events.write(
+                "frame", frame=self.frame_count, seq=captured.seq, t=round(captured.timestamp, 6), inferred=inferred,
+                bottle=self.detection_record(self.bottle) if self.bottle else None,
+                detections=[self.detection_record(det) for det in self.all_detections],
+                timing={"queue_ms": round((start - read_at) * 1000, 2), "detect_ms": round((done - start) * 1000, 2)},
+            )
         
-        sequence_running = False
-    
-    # Run sequence in separate thread
-    thread = threading.Thread(target=run_sequence, daemon=True)
-    thread.start()
+        if self.frame_count == 0:
+            self._first_frame_time = time.perf_counter() - self._launch_time
+            print(f"First frame processed {self._first_frame_time * 1000:.0f} ms after start")
+        
+        self.frame_count += 1
+        if self.headless:
+            return None
+        return {"frame": frame, "seq": captured.seq, "bottle": self.bottle, "all_detections": self.all_detections}
 
+    def render_stage(self, result):
+        """Render stage: draw the overlay."""
+        contours = None
+        if SHOW_WORKSPACE_OVERLAY:
+            # Rendered once per calibration, then reused
+            contours = self.workspace.overlay_contours(result["frame"].shape, self.calibration)
+        vis = draw_ui(result["frame"], result["bottle"], result["all_detections"], calibration=self.calibration,
+                      workspace_contours=contours)
+        if profiling.is_enabled():
+            now = time.monotonic()
+            if now - self._profile_stats_time >= PROFILE_OVERLAY_INTERVAL:
+                self._profile_stats = profiling.summary()
+                self._profile_stats_time = now
+            draw_profile(vis, self._profile_stats)
+        return vis
 
-# Main loop
-frame_count = 0
-all_detections = []
+    # ----- main loop -----
 
-while True:
-    ok, frame = cap.read()
-    if not ok:
-        break
-    
-    # Flip frame horizontally
-    frame = cv2.flip(frame, 1)
-    
-    # Detect bottle every frame
-    bottle, _ = find_cup(frame, confidence=0.25)
-    
-    # Detect all objects every 5 frames (for display only)
-    if frame_count % 5 == 0:
-        all_detections, _ = detect_all_objects(frame, confidence=0.25)
-    
-    frame_count += 1
-    
-    # Draw UI
-    vis = draw_ui(frame, bottle, all_detections)
-    
-    if not PRINT_JSON_ONLY:
-        cv2.imshow("A.U.R.A. FARM - Bottle Detection", vis)
-    
-    # Check for keyboard input from both OpenCV window and background listener
-    k = None
-    
-    # Method 1: Background keyboard listener (works without window focus) - check first
-    if KEYBOARD_LISTENER_AVAILABLE:
-        with key_lock:
-            if key_pressed:
-                k = key_pressed
-                key_pressed = None  # Reset after reading
-                print(f"\n>>> ✅ Using key from listener: '{k}'")
-    
-    # Method 2: OpenCV window input (requires window focus) - fallback
-    if not k:
-        cv_key = cv2.waitKey(1) & 0xFF
-        if cv_key != 255 and cv_key != 0:
-            try:
-                k = chr(cv_key).lower()
-                print(f"\n>>> ✅ Key from OpenCV window: '{k}'")
-            except:
-                pass
-    
-    # Process key press
-    if k:
-        if k == 'q':
-            print("\nQuitting...")
-            break
+    def run(self):
+        """Display and keyboard loop on the calling thread (HighGUI must stay on the main thread)."""
+        last_stats_time = time.monotonic()
         
-        if k == 'g':
-            # Grab/harvest command - run hardcoded sequence regardless of bottle detection
-            print("\n" + "="*60)
-            print("🔄 INITIATING HARVESTING SEQUENCE...")
-            print("="*60)
-            print("   (Running hardcoded sequence - bottle detection is for display only)")
-            # Use a dummy bottle dict for display purposes
-            dummy_bottle = {"cx": 320, "cy": 240, "bbox": (280, 200, 80, 80), "confidence": 1.0}
-            execute_harvesting_sequence(dummy_bottle)
-
-cap.release()
-cv2.destroyAllWindows()
-
-# Stop keyboard listener
-if keyboard_listener:
-    keyboard_listener.stop()
-
-# Disconnect ESP32 if connected
-if esp32_controller:
-    esp32_controller.disconnect()
-
-print("Camera released. Exiting.")
+        while True:
+            if self.headless:
+                if self._detect_worker.finished:
+                    print("\nEnd of frame source.")
+                    break
+                try:
+                    time.sleep(0.05)
+                except KeyboardInterrupt:
+                    print("\nQuitting...")
+                    break
+            else:
+                vis = self.display_queue.get(timeout=0.1)
+                if vis is None and self.display_queue.closed:
+                    print("\nEnd of frame source.")
+                    break
+                if vis is not None:
+                    cv2.imshow(WINDOW_NAME, vis)
+            
+            if PIPELINE_STATS_INTERVAL and time.monotonic() - last_stats_time >= PIPELINE_STATS_INTERVAL:
+                print("\n" + self.pipeline.format_stats())
+                if profiling.is_enabled() and self.events:
+                    self.events.write("profile", timers=profiling.summary())
+                last_stats_time = time.monotonic()
+            
+            # Check for keyboard input from both OpenCV window and background listener
+            k = self.read_key()
+            
+            # Process key press
+            if k:
+                if k == 'q':
+                    print("\nQuitting...")
+                    break
+                
+                if k == 'g':
+                    # Grab/harvest command - run hardcoded sequence regardless of bottle detection.
+                    # The sequence doesn't aim at the bottle, so reachability is only a warning
+                    bottle = self.bottle
+                    if bottle and not bottle.get("reachable", True):
+                        print("\n⚠️  Detected bottle is outside the arm's reach (the hardcoded sequence runs anyway)")
+                    print("\n" + "="*60)
+                    print("🔄 INITIATING HARVESTING SEQUENCE...")
+                    print("="*60)
+                    print("   (Running hardcoded sequence - bottle detection is for display only)")
+                    # Use a dummy bottle dict for display purposes
+                    dummy_bottle = {"cx": 320, "cy": 240, "bbox": (280, 200, 80, 80), "confidence": 1.0}
+                    self.execute_harvesting_sequence(dummy_bottle)
+
+
+def main(argv=None):
+    app = AuraApp(parse_args(argv))
+    try:
+        app.start()
+        app.run()
+    finally:
+        app.stop()
+
+
+if __name__ == "__main__":
+    main()
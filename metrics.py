@@ -0,0 +1,264 @@
+"""
+Prometheus metrics and a local HTTP endpoint to scrape them.
+Counters, gauges and histograms are updated in place by the code that owns
+them (a lock-protected add, no I/O); the text exposition is only built when
+something scrapes /metrics, on the server's own thread.
+
+Usage:
+    frames = metrics.counter("aura_frames_processed_total", "Frames through detection")
+    frames.inc()
+
+    server = metrics.MetricsServer(port=9108)
+    server.start()      # http://127.0.0.1:9108/metrics
+"""
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metric:
+    """Base class: name, help text, label names and per-label-set values."""
+
+    type = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self):
+        """List of (suffix, label values, extra label, value) for exposition."""
+        with self._lock:
+            return [("", key, None, value) for key, value in self._values.items()]
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.label_names, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    type = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        if not self.label_names:
+            self._values[()] = 0  # Export 0 before the first increment
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram of observed values (e.g. latencies in seconds)."""
+
+    type = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        if not self.label_names:
+            self._values[()] = [[0] * len(self.buckets), 0.0, 0]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        samples = []
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", key, ("le", _format_value(float(bound))), cumulative))
+            samples.append(("_bucket", key, ("le", "+Inf"), count))
+            samples.append(("_sum", key, None, total))
+            samples.append(("_count", key, None, count))
+        return samples
+
+
+class CallbackMetric(Metric):
+    """
+    Metric read from a function at scrape time, for values another object
+    already tracks (camera stats, queue depths, time since an event).
+
+    The function returns a number, or a dict {label value: number} when the
+    metric has one label.
+    """
+
+    def __init__(self, name, help_text, fn, labels=(), metric_type="gauge"):
+        super().__init__(name, help_text, labels)
+        self.fn = fn
+        self.type = metric_type
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if isinstance(value, dict):
+            return [("", (str(label),), None, v) for label, v in value.items()]
+        return [("", (), None, value)]
+
+
+class Registry:
+    """Named metrics; registering an existing name returns the existing metric."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(name, lambda: Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._register(name, lambda: Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(name, lambda: Histogram(name, help_text, labels, buckets))
+
+    def callback(self, name, help_text, fn, labels=(), metric_type="gauge"):
+        """Register (or replace) a metric computed by fn() at scrape time."""
+        metric = CallbackMetric(name, help_text, fn, labels, metric_type)
+        with self._lock:
+            self._metrics[name] = metric
+        return metric
+
+    def exposition(self):
+        """Prometheus text format for every metric."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.exposition())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+callback = REGISTRY.callback
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the console
+
+
+class MetricsServer:
+    """HTTP server for /metrics on a background daemon thread."""
+
+    def __init__(self, host=METRICS_HOST, port=METRICS_PORT, registry=REGISTRY):
+        """
+        Args:
+            host: Bind address (default: localhost only)
+            port: TCP port (0 = pick a free one)
+            registry: Registry to expose
+        """
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Start serving. Returns the URL."""
+        handler = type("MetricsHandler", (_MetricsHandler,), {"registry": self.registry})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        url = f"http://{self.host}:{self.port}/metrics"
+        print(f"Metrics available at {url}")
+        return url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
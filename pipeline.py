@@ -0,0 +1,268 @@
+"""
+Staged processing pipeline.
+Each stage runs on its own worker thread and stages are joined by bounded
+drop-oldest queues, so a slow stage sheds stale work instead of making every
+other stage wait for it.
+"""
+import threading
+import time
+from collections import deque
+
+
+class DropOldestQueue:
+    """
+    Bounded queue whose put() never blocks.
+
+    When the queue is full, the oldest item is discarded to make room. That
+    is what a real-time pipeline wants: the consumer always gets the newest
+    work, and the producer never stalls behind it.
+    """
+
+    def __init__(self, maxsize=1, name=None, block=False):
+        """
+        Args:
+            maxsize: Maximum number of queued items
+            name: Optional name used in stats
+            block: Make put() wait for room instead of dropping (lossless, for
+                   deterministic offline replay)
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.block = block
+        self.put_count = 0
+        self.dropped = 0
+        self._items = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        """
+        Add an item, dropping the oldest one if the queue is full.
+
+        In blocking mode this waits for room instead, and gives up (dropping
+        the new item) only if the queue is closed.
+
+        Returns:
+            bool: True if an item was dropped
+        """
+        with self._cond:
+            if self.block:
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    self.dropped += 1
+                    return True
+            dropped = False
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                dropped = True
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify_all()
+            return dropped
+
+    def get(self, timeout=None):
+        """
+        Take the oldest queued item, waiting for one if needed.
+
+        Args:
+            timeout: Seconds to wait (None = until an item arrives or the queue closes)
+
+        Returns:
+            The item, or None on timeout or once the queue is closed and empty
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._items:
+                if self._closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """Wake all waiting consumers; get() returns None once drained."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def stats(self):
+        """
+        Get queue counters.
+
+        Returns:
+            dict: 'depth', 'maxsize', 'put' and 'dropped'
+        """
+        with self._cond:
+            return {"depth": len(self._items), "maxsize": self.maxsize,
+                    "put": self.put_count, "dropped": self.dropped}
+
+
+class Stage:
+    """
+    One pipeline stage running on its own worker thread.
+
+    A stage with an input queue calls fn(item) for each item; a source stage
+    (no input queue) calls fn() repeatedly. Non-None results go to the output
+    queue. A source ends the stage by raising StopIteration.
+    """
+
+    def __init__(self, name, fn, input_queue=None, output_queue=None, frame_path=True):
+        """
+        Args:
+            name: Stage name used in stats
+            fn: Work function
+            input_queue: DropOldestQueue to read from (None for a source stage)
+            output_queue: DropOldestQueue to write results to (None for a sink)
+            frame_path: Whether the stage is on the per-frame path (and can limit FPS)
+        """
+        self.name = name
+        self.frame_path = frame_path
+        self.fn = fn
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.finished = False
+        self._started_at = None
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread."""
+        self._running = True
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f"stage-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self._running:
+            if self.input_queue is not None:
+                item = self.input_queue.get(timeout=0.1)
+                if item is None:
+                    if self.input_queue.closed:
+                        break
+                    continue
+
+            start = time.perf_counter()
+            try:
+                result = self.fn(item) if self.input_queue is not None else self.fn()
+            except StopIteration:
+                break
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] Pipeline stage '{self.name}': {e}")
+                continue
+            finally:
+                self.busy_seconds += time.perf_counter() - start
+
+            self.processed += 1
+            if result is not None and self.output_queue is not None:
+                self.output_queue.put(result)
+
+        self.finished = True
+        if self.output_queue is not None:
+            self.output_queue.close()
+
+    def stop(self, timeout=1.0):
+        """Ask the worker to stop and wait for it."""
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+
+    def stats(self):
+        """
+        Get stage throughput counters.
+
+        Returns:
+            dict: 'processed', 'errors', 'throughput' (items/s), 'mean_ms'
+                  (time per item) and 'utilization' (fraction of time busy)
+        """
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "processed": self.processed,
+            "errors": self.errors,
+            "throughput": self.processed / elapsed if elapsed > 0 else 0.0,
+            "mean_ms": self.busy_seconds / self.processed * 1000 if self.processed else 0.0,
+            "utilization": self.busy_seconds / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+class Pipeline:
+    """A set of stages started, stopped and reported on together."""
+
+    def __init__(self):
+        self.stages = []
+
+    def add_stage(self, name, fn, input_queue=None, output_queue=None, frame_path=True):
+        """Create a stage and add it to the pipeline."""
+        stage = Stage(name, fn, input_queue, output_queue, frame_path)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        for stage in self.stages:
+            stage._running = False
+            if stage.output_queue is not None:
+                stage.output_queue.close()
+        for stage in self.stages:
+            stage.stop()
+
+    def stats(self):
+        """
+        Get per-stage stats, including the depth of each stage's input queue.
+
+        Returns:
+            dict: stage name -> stats dict
+        """
+        stats = {}
+        for stage in self.stages:
+            stage_stats = stage.stats()
+            if stage.input_queue is not None:
+                queue_stats = stage.input_queue.stats()
+                stage_stats["queue_depth"] = queue_stats["depth"]
+                stage_stats["queue_dropped"] = queue_stats["dropped"]
+            stats[stage.name] = stage_stats
+        return stats
+
+    def bottleneck(self):
+        """
+        Name of the stage limiting FPS: the busiest frame-path stage.
+
+        Sources are left out since their busy time is mostly waiting for input.
+        """
+        candidates = [stage for stage in self.stages
+                      if stage.frame_path and stage.input_queue is not None]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda stage: stage.stats()["utilization"]).name
+
+    def format_stats(self):
+        """Human-readable stats table with the limiting stage."""
+        stats = self.stats()
+        lines = [f"{'stage':<10}{'items/s':>9}{'ms/item':>9}{'busy':>7}{'queue':>7}{'dropped':>9}"]
+        for name, s in stats.items():
+            lines.append(f"{name:<10}{s['throughput']:>9.1f}{s['mean_ms']:>9.1f}{s['utilization']*100:>6.0f}%"
+                         f"{s.get('queue_depth', '-'):>7}{s.get('queue_dropped', '-'):>9}")
+        bottleneck = self.bottleneck()
+        if bottleneck:
+            lines.append(f"Limiting stage: {bottleneck}")
+        return "\n".join(lines)
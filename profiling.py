@@ -0,0 +1,183 @@
+"""
+Lightweight latency instrumentation.
+Named timers keep their most recent durations in fixed-size ring buffers and
+summarize them as p50/p95/p99. Profiling is off unless enabled with
+enable() or AURA_PROFILE=1; while off, an instrumented call costs one flag
+check.
+
+Usage:
+    @profiling.timed("find_cup")
+    def find_cup(...): ...
+
+    with profiling.span("cap.read"):
+        frame = cap.read_frame()
+
+    print(profiling.format_summary())
+"""
+import functools
+import os
+import threading
+import time
+
+import numpy as np
+
+PROFILE_ENV_VAR = "AURA_PROFILE"
+RING_SIZE = 1024  # Durations kept per timer
+
+_enabled = os.environ.get(PROFILE_ENV_VAR, "").lower() in ("1", "true", "yes")
+_timers = {}
+_timers_lock = threading.Lock()
+
+
+class LatencyRing:
+    """Fixed-size ring buffer of durations (seconds) with percentile summaries."""
+
+    def __init__(self, name, size=RING_SIZE):
+        """
+        Args:
+            name: Timer name
+            size: Number of most recent durations kept
+        """
+        self.name = name
+        self.size = size
+        self.count = 0
+        self.total_seconds = 0.0
+        self._values = np.zeros(size, dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._values[self.count % self.size] = seconds
+            self.count += 1
+            self.total_seconds += seconds
+
+    def summary(self):
+        """
+        Summarize the durations in the ring.
+
+        Returns:
+            dict: 'count' (all-time), 'window' (samples summarized), and
+                  'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms' over the window
+        """
+        with self._lock:
+            window = min(self.count, self.size)
+            values = self._values[:window].copy()
+            count = self.count
+        if window == 0:
+            return {"count": 0, "window": 0, "mean_ms": 0.0, "p50_ms": 0.0,
+                    "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        p50, p95, p99 = np.percentile(values, (50, 95, 99)) * 1000
+        return {
+            "count": count,
+            "window": window,
+            "mean_ms": float(values.mean() * 1000),
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(values.max() * 1000),
+        }
+
+
+def enable(on=True):
+    """Turn recording on (or off with on=False)."""
+    global _enabled
+    _enabled = on
+
+
+def is_enabled():
+    return _enabled
+
+
+def get_timer(name):
+    """Get (creating if needed) the ring buffer for a timer."""
+    timer = _timers.get(name)
+    if timer is None:
+        with _timers_lock:
+            timer = _timers.setdefault(name, LatencyRing(name))
+    return timer
+
+
+def record(name, seconds):
+    """Record one duration for a timer (no-op while disabled)."""
+    if _enabled:
+        get_timer(name).record(seconds)
+
+
+def timed(name):
+    """Decorator that records each call's duration under `name`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                get_timer(name).record(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        get_timer(self.name).record(time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Context manager that records the duration of its block under `name`."""
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def summary():
+    """
+    Summaries for every timer that has recorded something.
+
+    Returns:
+        dict: timer name -> LatencyRing.summary()
+    """
+    with _timers_lock:
+        timers = list(_timers.values())
+    return {timer.name: timer.summary() for timer in timers if timer.count}
+
+
+def reset():
+    """Drop all recorded durations."""
+    with _timers_lock:
+        _timers.clear()
+
+
+def format_summary():
+    """Human-readable table of all timers."""
+    stats = summary()
+    if not stats:
+        return "No timings recorded"
+    width = max(12, max(len(name) for name in stats) + 2)
+    lines = [f"{'timer':<{width}}{'calls':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)"]
+    for name, s in stats.items():
+        lines.append(f"{name:<{width}}{s['count']:>8}{s['mean_ms']:>9.2f}{s['p50_ms']:>9.2f}"
+                     f"{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['max_ms']:>9.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,227 @@
+"""
+Servo timing model for sizing sequence step delays.
+Predicts how long a servo takes to travel between two microsecond setpoints
+and settle, from its type's rated speed derated for the load on that joint,
+so each step of a waypoint sequence can wait just as long as the slowest
+joint needs instead of a hand-tuned constant.
+
+Settings live in servo_timing.json (defaults below). Speeds and settle
+times can be fitted from measured moves.
+
+Usage:
+    python servo_timing.py                      # predicted vs current cycle time per sequence
+    python servo_timing.py --fit moves.csv      # fit joints from measurements (joint,delta_us,seconds)
+    python servo_timing.py --fit moves.csv --save
+"""
+import argparse
+import copy
+import csv
+import json
+import os
+
+import numpy as np
+
+SERVO_TIMING_FILE = "servo_timing.json"
+JOINT_ORDER = ("base", "shoulder", "elbow", "wrist")  # Order of servo lists in the sequences
+
+DEFAULT_SERVO_TIMING = {
+    "servo_types": {
+        # Datasheet no-load speed at 4.8 V; settle = time to stop hunting after arriving
+        "MG996R": {"seconds_per_60deg": 0.17, "settle_s": 0.10, "deg_per_us": 0.09},
+        "SG90": {"seconds_per_60deg": 0.10, "settle_s": 0.05, "deg_per_us": 0.09},
+    },
+    "joints": {
+        # load_derating = fraction of no-load speed reached on this joint under load
+        "base": {"type": "MG996R", "load_derating": 0.8},
+        "shoulder": {"type": "MG996R", "load_derating": 0.5},
+        "elbow": {"type": "MG996R", "load_derating": 0.65},
+        "wrist": {"type": "SG90", "load_derating": 0.8},
+    },
+    "safety_margin": 1.2,  # Multiplier on every predicted dwell
+}
+
+_servo_timing = None
+
+
+def load_servo_timing():
+    """Load the timing model from file, filling in defaults for missing entries."""
+    global _servo_timing
+    if _servo_timing is not None:
+        return _servo_timing
+
+    timing = copy.deepcopy(DEFAULT_SERVO_TIMING)
+    if os.path.exists(SERVO_TIMING_FILE):
+        try:
+            with open(SERVO_TIMING_FILE, 'r') as f:
+                saved = json.load(f)
+            for section in ("servo_types", "joints"):
+                for name, values in saved.get(section, {}).items():
+                    timing[section].setdefault(name, {}).update(values)
+            timing["safety_margin"] = saved.get("safety_margin", timing["safety_margin"])
+            print(f"Loaded servo timing from {SERVO_TIMING_FILE}")
+        except Exception as e:
+            print(f"Error loading servo timing: {e}, using defaults")
+    _servo_timing = timing
+    return _servo_timing
+
+
+def save_servo_timing(timing):
+    """Save the timing model to file."""
+    global _servo_timing
+    try:
+        with open(SERVO_TIMING_FILE, 'w') as f:
+            json.dump(timing, f, indent=2)
+        _servo_timing = timing
+        print(f"Servo timing saved to {SERVO_TIMING_FILE}")
+        return True
+    except Exception as e:
+        print(f"Error saving servo timing: {e}")
+        return False
+
+
+def joint_parameters(joint, timing=None):
+    """
+    Effective timing for one joint.
+
+    Returns:
+        tuple: (seconds per microsecond of travel, settle seconds)
+    """
+    if timing is None:
+        timing = load_servo_timing()
+    settings = timing["joints"][joint]
+    servo = timing["servo_types"][settings["type"]]
+    if "seconds_per_us" in settings:  # Fitted from measurements
+        seconds_per_us = settings["seconds_per_us"]
+    else:
+        deg_per_second = 60.0 / servo["seconds_per_60deg"] * settings.get("load_derating", 1.0)
+        seconds_per_us = servo["deg_per_us"] / deg_per_second
+    return seconds_per_us, settings.get("settle_s", servo["settle_s"])
+
+
+def move_time(joint, delta_us, timing=None):
+    """Predicted seconds for one joint to travel delta_us and settle (0 if it doesn't move)."""
+    if not delta_us:
+        return 0.0
+    seconds_per_us, settle = joint_parameters(joint, timing)
+    return abs(delta_us) * seconds_per_us + settle
+
+
+def step_dwell(previous_us, next_us, timing=None):
+    """
+    Minimum safe wait after commanding next_us when the servos were at previous_us.
+
+    Args:
+        previous_us: Servo microseconds before the step (base, shoulder, elbow[, wrist])
+        next_us: Servo microseconds commanded by the step
+
+    Returns:
+        float: Seconds until the slowest joint has arrived and settled, with the safety margin
+    """
+    if timing is None:
+        timing = load_servo_timing()
+    slowest = max(
+        (move_time(joint, b - a, timing) for joint, a, b in zip(JOINT_ORDER, previous_us, next_us)),
+        default=0.0,
+    )
+    return slowest * timing["safety_margin"]
+
+
+def sequence_delays(start, steps, timing=None):
+    """
+    Computed delay for every step of a sequence.
+
+    Args:
+        start: Servo microseconds before the first step (e.g. HOME)
+        steps: Sequence steps with 'servos' (e.g. PICKUP_SEQUENCE)
+
+    Returns:
+        list: Seconds to wait after each step's command
+    """
+    delays = []
+    previous = start
+    for step in steps:
+        delays.append(step_dwell(previous, step["servos"], timing))
+        previous = step["servos"]
+    return delays
+
+
+def fit_joint(deltas_us, seconds):
+    """
+    Fit seconds = seconds_per_us * |delta_us| + settle_s to measured moves of one joint.
+
+    Returns:
+        dict: {'seconds_per_us', 'settle_s'}
+    """
+    deltas = np.abs(np.asarray(deltas_us, dtype=np.float64))
+    seconds = np.asarray(seconds, dtype=np.float64)
+    if len(np.unique(deltas)) < 2:
+        raise ValueError("Need moves of at least two different sizes to fit speed and settle time")
+    slope, intercept = np.polyfit(deltas, seconds, 1)
+    return {"seconds_per_us": float(slope), "settle_s": float(max(intercept, 0.0))}
+
+
+def fit_from_csv(path, timing=None):
+    """
+    Fit every joint that has measurements in a CSV with columns joint,delta_us,seconds.
+
+    Returns:
+        dict: Updated copy of the timing model
+    """
+    timing = copy.deepcopy(timing if timing is not None else load_servo_timing())
+    samples = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            samples.setdefault(row["joint"], []).append((float(row["delta_us"]), float(row["seconds"])))
+    for joint, moves in samples.items():
+        if joint not in timing["joints"]:
+            print(f"Warning: Unknown joint '{joint}' in {path}, skipping")
+            continue
+        deltas, seconds = zip(*moves)
+        fitted = fit_joint(deltas, seconds)
+        timing["joints"][joint].update(fitted)
+        print(f"{joint}: {len(moves)} moves -> {fitted['seconds_per_us'] * 1000:.3f} ms/us, "
+              f"settle {fitted['settle_s'] * 1000:.0f} ms")
+    return timing
+
+
+def sequence_report(name, start, steps, timing=None):
+    """Per-step table of current delays vs model dwell vs streamed trajectory time."""
+    from trajectory import WAYPOINT_SETTLE, sequence_moves
+
+    delays = sequence_delays(start, steps, timing)
+    moves = sequence_moves(start, steps)
+    lines = [f"{name} ({len(steps)} steps)",
+             f"  {'step':<16}{'current s':>10}{'model s':>9}{'trajectory s':>14}"]
+    totals = [0.0, 0.0, 0.0]
+    for step, delay, move in zip(steps, delays, moves):
+        trajectory_s = move.duration + WAYPOINT_SETTLE + step.get("hold", 0.0)
+        row = (step["delay"], delay, trajectory_s)
+        totals = [total + value for total, value in zip(totals, row)]
+        lines.append(f"  {step['name']:<16}{row[0]:>10.2f}{row[1]:>9.2f}{row[2]:>14.2f}")
+    lines.append(f"  {'cycle':<16}{totals[0]:>10.2f}{totals[1]:>9.2f}{totals[2]:>14.2f}"
+                 f"   (model saves {totals[0] - totals[1]:.1f}s, {1 - totals[1] / totals[0]:.0%})")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servo timing model: sequence cycle time report and fitting")
+    parser.add_argument("--fit", metavar="CSV", help="Fit joint speed/settle from measured moves (joint,delta_us,seconds)")
+    parser.add_argument("--save", action="store_true", help=f"Save the fitted model to {SERVO_TIMING_FILE}")
+    args = parser.parse_args()
+
+    timing = load_servo_timing()
+    if args.fit:
+        timing = fit_from_csv(args.fit, timing)
+        if args.save:
+            save_servo_timing(timing)
+
+    import main_sim
+    import simple_pickup
+    print()
+    print(sequence_report("main_sim.PICKUP_SEQUENCE", main_sim.HOME, main_sim.PICKUP_SEQUENCE, timing))
+    print()
+    print(sequence_report("simple_pickup.PICKUP_SEQUENCE", simple_pickup.HOME, simple_pickup.PICKUP_SEQUENCE, timing))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,9 @@ Picks up cup directly in front and moves it to the left.
 import time
 import sys
 
+from servo_timing import sequence_delays
+from trajectory import run_sequence as run_trajectories, sequence_duration
+
 # Try to import ESP32 controller (optional)
 try:
     from esp32_control import ESP32Controller
@@ -13,6 +16,11 @@ except ImportError:
     ESP32_AVAILABLE = False
     print("Note: ESP32 control not available. Running in simulation mode.")
 
+# How steps are timed: 'trajectory' = stream smooth moves timed from servo limits,
+# 'model' = one command per step, then the dwell servo_timing.py computes for it,
+# 'fixed' = one command per step, then the step's hand-tuned 'delay'
+SEQUENCE_TIMING = "trajectory"
+
 # Hardcoded servo positions (microseconds)
 # Format: [base, shoulder, elbow, wrist]
 # 1500 = center (90°), 900 = 0°, 2100 = 180°
@@ -26,6 +34,7 @@ HOME = [1500, 1500, 1500, 1500]
 # Shoulder: lower = arm up, higher = arm down
 # Elbow: lower = elbow up, higher = elbow down
 # Wrist: compensates to keep hand level
+# 'delay' is only used with SEQUENCE_TIMING = "fixed"; the other modes time steps from servo speed
 
 PICKUP_SEQUENCE = [
     # 1. Approach position (above cup, directly in front, arm extended forward)
@@ -70,6 +79,11 @@ def run_sequence(controller=None):
     print("(Press Ctrl+C to cancel)")
     time.sleep(2)
     
+    if SEQUENCE_TIMING == "trajectory":
+        run_trajectory_sequence(controller)
+        return
+    
+    delays = sequence_delays(HOME, PICKUP_SEQUENCE) if SEQUENCE_TIMING == "model" else None
     for i, step in enumerate(PICKUP_SEQUENCE, 1):
         print(f"\n[{i}/{len(PICKUP_SEQUENCE)}] {step['name'].upper()}")
         print(f"  Servos: Base={step['servos'][0]}us, Shoulder={step['servos'][1]}us, "
@@ -86,12 +100,33 @@ def run_sequence(controller=None):
             print(f"  (Simulation mode - no ESP32)")
         
         # Wait for movement
-        time.sleep(step['delay'])
+        time.sleep(delays[i - 1] if delays else step['delay'])
     
     print("\n" + "="*60)
     print("SEQUENCE COMPLETE!")
     print("="*60 + "\n")
 
+def run_trajectory_sequence(controller=None):
+    """Run PICKUP_SEQUENCE as smooth streamed moves, starting from HOME."""
+    send = controller.set_servos_from_us_list if controller else (lambda setpoint: None)
+    
+    def on_step(i, step, move):
+        print(f"\n[{i}/{len(PICKUP_SEQUENCE)}] {step['name'].upper()}")
+        print(f"  Servos: Base={step['servos'][0]}us, Shoulder={step['servos'][1]}us, "
+              f"Elbow={step['servos'][2]}us, Wrist={step['servos'][3]}us")
+        print(f"  Moving for {move.duration:.2f}s" + ("" if controller else " (Simulation mode - no ESP32)"))
+    
+    print(f"Planned sequence time: {sequence_duration(HOME, PICKUP_SEQUENCE):.1f}s")
+    start = time.monotonic()
+    results = run_trajectories(PICKUP_SEQUENCE, send, HOME, on_step=on_step)
+    failed = sum(result["failed"] for result in results)
+    if controller and failed:
+        print(f"\n  ❌ {failed} setpoints failed to send")
+    
+    print("\n" + "="*60)
+    print(f"SEQUENCE COMPLETE! ({time.monotonic() - start:.1f}s)")
+    print("="*60 + "\n")
+
 def main():
     """Main function."""
     controller = None
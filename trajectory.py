@@ -0,0 +1,198 @@
+"""
+Smooth joint-space moves between servo waypoints.
+Each move interpolates every joint along a straight line in joint space with
+a trapezoidal velocity profile (accelerate, cruise, decelerate), timed so no
+joint exceeds its velocity or acceleration limit, and is streamed to the
+servos as setpoints at a fixed rate. Sequence time then follows from servo
+speed instead of fixed per-step delays.
+
+Positions are servo microseconds, like PICKUP_SEQUENCE and
+ESP32Controller.set_servos_from_us_list.
+
+Usage:
+    move = plan_move([1500, 1500, 1500], [1500, 1200, 2100])
+    result = stream_move(move, controller.set_servos_from_us_list)
+    print(f"predicted {move.duration:.2f}s, took {result['elapsed']:.2f}s")
+"""
+import math
+import time
+
+import numpy as np
+
+# Default limits per joint in servo microseconds. With the MG996R's ~0.09 deg/us
+# (arm_spec_template.json) that is ~135 deg/s and ~540 deg/s^2, well inside its
+# ~350 deg/s no-load speed so the horn keeps up with the setpoints under load.
+MAX_VELOCITY_US = 1500.0  # us/s
+MAX_ACCELERATION_US = 6000.0  # us/s^2
+STREAM_RATE_HZ = 50.0  # Setpoints per second (the servo PWM frame rate; faster gains nothing)
+WAYPOINT_SETTLE = 0.1  # Seconds to hold at each waypoint so the servos finish the move
+
+
+class Move:
+    """
+    Straight joint-space move from start to end with a trapezoidal profile.
+
+    All joints share one normalized profile s(t) in [0, 1], scaled so the joint
+    that is slowest to cover its distance sets the duration; the others move
+    proportionally slower and everything arrives together.
+    """
+
+    def __init__(self, start, end, max_velocity=MAX_VELOCITY_US, max_acceleration=MAX_ACCELERATION_US):
+        """
+        Args:
+            start, end: Joint positions (same length)
+            max_velocity: Velocity limit, one value or one per joint (units/s)
+            max_acceleration: Acceleration limit, one value or one per joint (units/s^2)
+        """
+        self.start = np.asarray(start, dtype=np.float64)
+        self.end = np.asarray(end, dtype=np.float64)
+        if self.start.shape != self.end.shape:
+            raise ValueError(f"Waypoints have different joint counts: {len(self.start)} and {len(self.end)}")
+        self.delta = self.end - self.start
+
+        distance = np.abs(self.delta)
+        moving = distance > 0
+        if not moving.any():
+            self.velocity = self.acceleration = self.accel_time = self.duration = 0.0
+            return
+
+        # Limits on the normalized path parameter s from the most constrained joint
+        velocity = np.broadcast_to(np.asarray(max_velocity, dtype=np.float64), distance.shape)
+        acceleration = np.broadcast_to(np.asarray(max_acceleration, dtype=np.float64), distance.shape)
+        self.velocity = float(np.min(velocity[moving] / distance[moving]))
+        self.acceleration = float(np.min(acceleration[moving] / distance[moving]))
+
+        if self.velocity ** 2 / self.acceleration >= 1.0:
+            # Too short to reach cruise speed: triangular profile
+            self.accel_time = math.sqrt(1.0 / self.acceleration)
+            self.velocity = self.acceleration * self.accel_time
+            self.duration = 2 * self.accel_time
+        else:
+            self.accel_time = self.velocity / self.acceleration
+            self.duration = 1.0 / self.velocity + self.accel_time
+
+    def progress(self, t):
+        """Normalized position s(t) in [0, 1] along the move."""
+        if t >= self.duration:
+            return 1.0
+        if t <= 0:
+            return 0.0
+        a, ta = self.acceleration, self.accel_time
+        if t < ta:
+            return 0.5 * a * t * t
+        remaining = self.duration - t
+        if remaining < ta:
+            return 1.0 - 0.5 * a * remaining * remaining
+        return 0.5 * a * ta * ta + self.velocity * (t - ta)
+
+    def at(self, t):
+        """Joint positions t seconds into the move."""
+        return self.start + self.delta * self.progress(t)
+
+    def setpoints(self, rate_hz=STREAM_RATE_HZ):
+        """
+        Setpoints sampled at a fixed rate, ending exactly on the end position.
+
+        Yields:
+            tuple: (t seconds from the move start, [int positions])
+        """
+        period = 1.0 / rate_hz
+        steps = max(1, math.ceil(self.duration * rate_hz - 1e-9))
+        for k in range(1, steps + 1):
+            t = min(k * period, self.duration)
+            yield t, [int(round(v)) for v in self.at(t)]
+
+
+def plan_move(start, end, max_velocity=MAX_VELOCITY_US, max_acceleration=MAX_ACCELERATION_US):
+    """Plan a Move between two waypoints (see Move)."""
+    return Move(start, end, max_velocity, max_acceleration)
+
+
+def stream_move(move, send, rate_hz=STREAM_RATE_HZ, abort=None):
+    """
+    Send a move's setpoints at a fixed rate.
+
+    Setpoints are sent on absolute deadlines from the start of the move, so
+    a slow send doesn't stretch the whole move.
+
+    Args:
+        move: Move to execute
+        send: Function taking a list of positions (e.g. set_servos_from_us_list);
+              a falsy return counts as a failed send
+        rate_hz: Setpoint rate
+        abort: Optional threading.Event; once set, no further setpoints are sent
+
+    Returns:
+        dict: 'elapsed' (actual seconds), 'setpoints' sent, 'failed' sends and
+              'aborted' (True if abort cut the move short)
+    """
+    start = time.monotonic()
+    sent = failed = 0
+    aborted = False
+    for t, setpoint in move.setpoints(rate_hz):
+        delay = start + t - time.monotonic()
+        if abort is not None:
+            if abort.wait(max(0.0, delay)):
+                aborted = True
+                break
+        elif delay > 0:
+            time.sleep(delay)
+        if send(setpoint) is False:
+            failed += 1
+        sent += 1
+    return {"elapsed": time.monotonic() - start, "setpoints": sent, "failed": failed, "aborted": aborted}
+
+
+def sequence_moves(start, steps, max_velocity=MAX_VELOCITY_US, max_acceleration=MAX_ACCELERATION_US):
+    """
+    Plan the moves for a waypoint sequence.
+
+    Args:
+        start: Joint positions before the first step
+        steps: Sequence steps with 'servos' waypoints (e.g. PICKUP_SEQUENCE)
+
+    Returns:
+        list: One Move per step
+    """
+    moves = []
+    current = start
+    for step in steps:
+        moves.append(Move(current, step["servos"], max_velocity, max_acceleration))
+        current = step["servos"]
+    return moves
+
+
+def sequence_duration(start, steps, settle=WAYPOINT_SETTLE, **limits):
+    """Predicted seconds to run a sequence with trajectories (moves, settles and holds)."""
+    moves = sequence_moves(start, steps, **limits)
+    return sum(move.duration + settle + step.get("hold", 0.0) for move, step in zip(moves, steps))
+
+
+def run_sequence(steps, send, start, rate_hz=STREAM_RATE_HZ, settle=WAYPOINT_SETTLE, on_step=None, **limits):
+    """
+    Run a waypoint sequence as streamed trajectories.
+
+    After each move the arm holds for `settle` plus the step's optional
+    'hold' seconds (e.g. to let a gripper close).
+
+    Args:
+        steps: Sequence steps with 'servos' waypoints
+        send: Setpoint function (see stream_move)
+        start: Joint positions before the first step (e.g. HOME after connect)
+        rate_hz: Setpoint rate
+        settle: Seconds to hold at each waypoint
+        on_step: Optional callback(index, step, move) before each move (1-based index)
+        **limits: max_velocity / max_acceleration overrides
+
+    Returns:
+        list: stream_move() result per step, each with the step's 'predicted' duration
+    """
+    results = []
+    for i, (step, move) in enumerate(zip(steps, sequence_moves(start, steps, **limits)), 1):
+        if on_step:
+            on_step(i, step, move)
+        result = stream_move(move, send, rate_hz)
+        result["predicted"] = move.duration
+        time.sleep(settle + step.get("hold", 0.0))
+        results.append(result)
+    return results
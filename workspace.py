@@ -0,0 +1,231 @@
+"""
+Precomputed arm workspace: reachability and IK solutions on a table-plane grid.
+Built once from the arm geometry in the calibration with the batch IK, cached
+to disk under a hash of that geometry, and then answers "can the arm reach
+this point?" with an array lookup instead of solving IK.
+
+Usage:
+    ws = load_workspace()
+    if ws.is_reachable(x, y):
+        angles = ws.lookup(x, y)   # interpolated; run exact IK before moving
+"""
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+
+from kinematics import calculate_arm_angles_batch, get_transform, load_calibration, within_servo_range
+
+WORKSPACE_CACHE_DIR = "workspace_cache"
+WORKSPACE_VERSION = 2  # Bump when the grid contents or file format change
+DEFAULT_RESOLUTION = 0.002  # Grid spacing in meters
+DEFAULT_Z = 0.02  # Grabbing height above the table in meters
+JOINTS = ("base_deg", "shoulder_deg", "elbow_deg", "wrist_deg")
+
+# Calibration entries the IK depends on (pixel mapping is not part of the key)
+GEOMETRY_KEYS = {
+    "arm_base_x": 0.0,
+    "arm_base_y": 0.0,
+    "base_height_m": 0.0612,
+    "shoulder_height_m": 0.095,
+    "upper_arm_length_m": 0.12,
+    "lower_arm_length_m": 0.09,
+    "hand_length_m": 0.06,
+}
+
+
+def geometry_hash(calibration, z=DEFAULT_Z, resolution=DEFAULT_RESOLUTION):
+    """Short hash of the arm geometry and grid settings, used as the cache key."""
+    key = {name: float(calibration.get(name, default)) for name, default in GEOMETRY_KEYS.items()}
+    key.update({"z": float(z), "resolution": float(resolution), "version": WORKSPACE_VERSION})
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class WorkspaceGrid:
+    """
+    Reachability mask and joint angles sampled on a regular table-plane grid.
+
+    Cell (row, col) is at x = x0 + col * resolution, y = y0 + row * resolution.
+    """
+
+    def __init__(self, x0, y0, resolution, z, reachable, angles, key=None):
+        """
+        Args:
+            x0, y0: Table coordinates of cell (0, 0) in meters
+            resolution: Grid spacing in meters
+            z: Grabbing height the grid was solved for
+            reachable: (rows, cols) bool mask (within reach and every joint inside the servo range)
+            angles: (4, rows, cols) float32 joint angles in JOINTS order
+            key: Geometry hash the grid was built for
+        """
+        self.x0 = float(x0)
+        self.y0 = float(y0)
+        self.resolution = float(resolution)
+        self.z = float(z)
+        self.reachable = reachable
+        self.angles = angles
+        self.key = key
+        self.rows, self.cols = reachable.shape
+        self._overlay_key = None
+        self._overlay_mask = None
+        self._overlay_contours = None
+
+    @classmethod
+    def build(cls, calibration=None, z=DEFAULT_Z, resolution=DEFAULT_RESOLUTION):
+        """Solve IK over a square grid covering the arm's maximum reach."""
+        if calibration is None:
+            calibration = load_calibration()
+        base_x = calibration.get("arm_base_x", GEOMETRY_KEYS["arm_base_x"])
+        base_y = calibration.get("arm_base_y", GEOMETRY_KEYS["arm_base_y"])
+        reach = (calibration.get("upper_arm_length_m", GEOMETRY_KEYS["upper_arm_length_m"]) +
+                 calibration.get("lower_arm_length_m", GEOMETRY_KEYS["lower_arm_length_m"]))
+
+        cells = int(np.ceil(reach / resolution)) + 1
+        offsets = np.arange(-cells, cells + 1) * resolution
+        x0, y0 = base_x + offsets[0], base_y + offsets[0]
+        ys, xs = np.meshgrid(base_y + offsets, base_x + offsets, indexing="ij")
+
+        solution = calculate_arm_angles_batch(xs, ys, z, calibration)
+        angles = np.stack([solution[joint] for joint in JOINTS]).astype(np.float32)
+        # Within reach isn't enough: every joint must also fit the servo range,
+        # otherwise angles_to_us clamps and the arm goes somewhere else
+        reachable = solution["reachable"] & np.all(within_servo_range(angles), axis=0)
+        return cls(x0, y0, resolution, z, reachable, angles,
+                   key=geometry_hash(calibration, z, resolution))
+
+    def save(self, path):
+        np.savez_compressed(path, x0=self.x0, y0=self.y0, resolution=self.resolution, z=self.z,
+                            reachable=self.reachable, angles=self.angles, key=self.key)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(float(data["x0"]), float(data["y0"]), float(data["resolution"]), float(data["z"]),
+                       data["reachable"], data["angles"], key=str(data["key"]))
+
+    def _cell(self, x, y):
+        """Nearest cell indices and an in-grid mask (scalars or arrays)."""
+        col = np.rint((np.asarray(x, dtype=np.float64) - self.x0) / self.resolution).astype(np.int64)
+        row = np.rint((np.asarray(y, dtype=np.float64) - self.y0) / self.resolution).astype(np.int64)
+        inside = (row >= 0) & (row < self.rows) & (col >= 0) & (col < self.cols)
+        return np.clip(row, 0, self.rows - 1), np.clip(col, 0, self.cols - 1), inside
+
+    def is_reachable(self, x, y):
+        """
+        Check targets against the reachability grid (nearest cell).
+
+        Args:
+            x, y: Table coordinates in meters (scalars or arrays)
+
+        Returns:
+            bool, or bool array for array input
+        """
+        if isinstance(x, (int, float)) and isinstance(y, (int, float)):
+            # Plain-float fast path: a couple of arithmetic ops and one index
+            col = int(round((x - self.x0) / self.resolution))
+            row = int(round((y - self.y0) / self.resolution))
+            return 0 <= row < self.rows and 0 <= col < self.cols and bool(self.reachable[row, col])
+        row, col, inside = self._cell(x, y)
+        return inside & self.reachable[row, col]
+
+    def lookup(self, x, y):
+        """
+        Bilinearly interpolated joint angles for targets.
+
+        Accurate to the grid resolution away from the reach boundary; use it for
+        screening and ranking, and calculate_arm_angles for the final command.
+
+        Args:
+            x, y: Table coordinates in meters (scalars or arrays)
+
+        Returns:
+            dict: JOINTS angle arrays plus 'reachable'
+        """
+        fx = np.clip((np.asarray(x, dtype=np.float64) - self.x0) / self.resolution, 0, self.cols - 1)
+        fy = np.clip((np.asarray(y, dtype=np.float64) - self.y0) / self.resolution, 0, self.rows - 1)
+        c0 = np.minimum(np.floor(fx).astype(np.int64), self.cols - 2)
+        r0 = np.minimum(np.floor(fy).astype(np.int64), self.rows - 2)
+        tx = fx - c0
+        ty = fy - r0
+
+        a = self.angles
+        interpolated = (a[:, r0, c0] * (1 - tx) * (1 - ty) + a[:, r0, c0 + 1] * tx * (1 - ty) +
+                        a[:, r0 + 1, c0] * (1 - tx) * ty + a[:, r0 + 1, c0 + 1] * tx * ty)
+        result = {joint: interpolated[i] for i, joint in enumerate(JOINTS)}
+        result["reachable"] = self.is_reachable(x, y)
+        return result
+
+    def overlay_mask(self, frame_shape, calibration=None):
+        """
+        Reachable region in image pixels, as a uint8 mask (255 = reachable).
+
+        Cached for the frame size and pixel mapping, so it is only rendered again
+        when the calibration changes.
+
+        Args:
+            frame_shape: (height, width[, channels]) of the camera frame
+            calibration: Calibration dict (uses loaded calibration if None)
+        """
+        transform = get_transform(calibration)
+        overlay_key = (tuple(frame_shape[:2]), transform)
+        if self._overlay_key != overlay_key:
+            height, width = frame_shape[:2]
+            px, py = np.meshgrid(np.arange(width), np.arange(height))
+            table_x, table_y = transform.px_to_table(px, py)
+            self._overlay_mask = self.is_reachable(table_x, table_y).astype(np.uint8) * 255
+            self._overlay_contours, _ = cv2.findContours(self._overlay_mask, cv2.RETR_EXTERNAL,
+                                                         cv2.CHAIN_APPROX_SIMPLE)
+            self._overlay_key = overlay_key
+        return self._overlay_mask
+
+    def overlay_contours(self, frame_shape, calibration=None):
+        """Outline of overlay_mask() as cv2 contours (cached the same way)."""
+        self.overlay_mask(frame_shape, calibration)
+        return self._overlay_contours
+
+
+_workspace = None
+
+
+def load_workspace(calibration=None, z=DEFAULT_Z, resolution=DEFAULT_RESOLUTION, cache_dir=WORKSPACE_CACHE_DIR):
+    """
+    Get the workspace grid for a calibration's arm geometry.
+
+    Loads <cache_dir>/workspace_<hash>.npz when it exists; otherwise builds the
+    grid and saves it there. The last grid is also kept in memory.
+
+    Args:
+        calibration: Calibration dict (uses loaded calibration if None)
+        z: Grabbing height in meters
+        resolution: Grid spacing in meters
+        cache_dir: Cache directory (None = don't touch disk)
+
+    Returns:
+        WorkspaceGrid
+    """
+    global _workspace
+    if calibration is None:
+        calibration = load_calibration()
+    key = geometry_hash(calibration, z, resolution)
+    if _workspace is not None and _workspace.key == key:
+        return _workspace
+
+    path = os.path.join(cache_dir, f"workspace_{key}.npz") if cache_dir else None
+    if path and os.path.exists(path):
+        try:
+            _workspace = WorkspaceGrid.load(path)
+            return _workspace
+        except Exception as e:
+            print(f"Error loading workspace cache {path}: {e}, rebuilding")
+
+    _workspace = WorkspaceGrid.build(calibration, z, resolution)
+    if path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            _workspace.save(path)
+            print(f"Workspace grid saved to {path}")
+        except OSError as e:
+            print(f"Error saving workspace cache: {e}")
+    return _workspace
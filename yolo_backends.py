@@ -0,0 +1,473 @@
+"""
+Pluggable YOLO inference backends.
+Runs YOLOv8 through ultralytics/PyTorch, or through an exported ONNX graph with
+ONNX Runtime, OpenCV DNN or OpenVINO so CPU-only machines can skip PyTorch.
+
+Select a backend with the AURA_YOLO_BACKEND environment variable (or
+detect.set_yolo_backend) and optionally point AURA_YOLO_MODEL at the weights:
+
+    AURA_YOLO_BACKEND=onnxruntime python main_sim.py
+    AURA_YOLO_BACKEND=onnxruntime-int8 AURA_YOLO_CALIB_DIR=./frames python main_sim.py
+
+The int8 backend quantizes the ONNX graph on first use, calibrating on the
+frames in AURA_YOLO_CALIB_DIR. Use at least MIN_CALIBRATION_IMAGES frames
+from the real camera; the few ultralytics sample images used otherwise
+give poor int8 scales. Delete the .int8.onnx file to recalibrate.
+
+Every backend returns a BackendResult with the same xyxy/conf/cls arrays, so
+detect.py produces the same detection dicts whichever one is used.
+"""
+import os
+import cv2
+import numpy as np
+
+BACKEND_ENV_VAR = "AURA_YOLO_BACKEND"
+MODEL_ENV_VAR = "AURA_YOLO_MODEL"
+CALIB_DIR_ENV_VAR = "AURA_YOLO_CALIB_DIR"
+
+DEFAULT_BACKEND = "ultralytics"
+DEFAULT_WEIGHTS = "yolov8n.pt"  # nano model for speed
+DEFAULT_ONNX = "yolov8n.onnx"
+
+BACKENDS = ("ultralytics", "onnxruntime", "onnxruntime-int8", "opencv-dnn", "openvino")
+
+# Same defaults as ultralytics predict()
+IMGSZ = 640
+IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+
+MIN_CALIBRATION_IMAGES = 50  # Fewer representative frames than this give unreliable int8 scales
+
+
+def _empty_arrays():
+    return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+
+class BackendResult:
+    """Detections from one inference, as plain NumPy arrays."""
+
+    def __init__(self, frame_bgr, xyxy, conf, cls, class_names=None, plot_fn=None):
+        """
+        Args:
+            frame_bgr: Frame the detections belong to
+            xyxy: (N, 4) float array of box corners in frame pixels
+            conf: (N,) float array of confidences
+            cls: (N,) int array of class ids
+            class_names: Optional list of class names for plotting
+            plot_fn: Optional callable returning an annotated frame
+        """
+        self.frame = frame_bgr
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.class_names = class_names
+        self._plot_fn = plot_fn
+
+    def __len__(self):
+        return len(self.conf)
+
+    def plot(self):
+        """Draw the detections on a copy of the frame."""
+        if self._plot_fn is not None:
+            return self._plot_fn()
+
+        vis = self.frame.copy()
+        for (x1, y1, x2, y2), conf, cls_id in zip(self.xyxy.astype(int).tolist(), self.conf.tolist(), self.cls.tolist()):
+            if self.class_names and cls_id < len(self.class_names):
+                name = self.class_names[cls_id]
+            else:
+                name = str(cls_id)
+            cv2.rectangle(vis, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            cv2.putText(vis, f"{name} {conf:.2f}", (x1, max(0, y1 - 5)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+        return vis
+
+
+class UltralyticsBackend:
+    """YOLOv8 through ultralytics/PyTorch (the original path)."""
+
+    name = "ultralytics"
+
+    def __init__(self, model_path=DEFAULT_WEIGHTS, class_names=None):
+        try:
+            from ultralytics import YOLO
+        except ImportError:
+            raise ImportError("ultralytics not installed. Run: pip install ultralytics")
+        self.model_path = model_path
+        self.class_names = class_names
+        self.model = YOLO(model_path)
+
+    def predict(self, frame_bgr, conf=0.25, classes=None, imgsz=None):
+        """
+        Run detection on a frame.
+
+        Args:
+            frame_bgr: Input frame in BGR format
+            conf: Minimum confidence threshold
+            classes: Optional list of class ids to keep
+            imgsz: Optional network input size (e.g. smaller for crops)
+
+        Returns:
+            BackendResult: Detections for the frame
+        """
+        if imgsz is None:
+            results = self.model(frame_bgr, conf=conf, classes=classes, verbose=False)
+        else:
+            results = self.model(frame_bgr, conf=conf, classes=classes, imgsz=imgsz, verbose=False)
+        if not results or len(results) == 0:
+            return BackendResult(frame_bgr, *_empty_arrays(), self.class_names)
+
+        result = results[0]
+        if result.boxes is None or len(result.boxes) == 0:
+            return BackendResult(frame_bgr, *_empty_arrays(), self.class_names, result.plot)
+
+        # Pull everything off the device once rather than per box
+        boxes = result.boxes
+        return BackendResult(
+            frame_bgr,
+            boxes.xyxy.cpu().numpy(),
+            boxes.conf.cpu().numpy(),
+            boxes.cls.cpu().numpy().astype(np.int64),
+            self.class_names,
+            result.plot
+        )
+
+
+def letterbox(frame_bgr, imgsz=IMGSZ):
+    """
+    Resize and pad a frame to a square network input, as ultralytics does.
+
+    Args:
+        frame_bgr: Input frame in BGR format
+        imgsz: Network input size in pixels
+
+    Returns:
+        tuple: (NCHW float32 RGB blob in [0, 1], scale ratio, (pad_x, pad_y))
+    """
+    h, w = frame_bgr.shape[:2]
+    ratio = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    pad_x, pad_y = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+
+    if (new_w, new_h) != (w, h):
+        resized = cv2.resize(frame_bgr, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    else:
+        resized = frame_bgr
+
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    padded = cv2.copyMakeBorder(resized, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+    blob = cv2.dnn.blobFromImage(padded, scalefactor=1 / 255.0, swapRB=True)
+    return blob, ratio, (left, top)
+
+
+def postprocess(output, frame_shape, ratio, pad, conf=0.25, classes=None,
+                iou=IOU_THRESHOLD, max_det=MAX_DETECTIONS):
+    """
+    Decode a raw YOLOv8 output tensor into boxes in frame pixels.
+
+    Args:
+        output: Raw network output, shape (1, 4 + num_classes, num_anchors)
+        frame_shape: Shape of the original frame
+        ratio: Letterbox scale ratio
+        pad: Letterbox (pad_x, pad_y)
+        conf: Minimum confidence threshold
+        classes: Optional list of class ids to keep
+        iou: NMS IoU threshold
+        max_det: Maximum number of detections to keep
+
+    Returns:
+        tuple: (xyxy, conf, cls) NumPy arrays
+    """
+    preds = np.asarray(output)[0].T  # (num_anchors, 4 + num_classes)
+    scores = preds[:, 4:]
+
+    if classes is not None:
+        class_ids = np.asarray(sorted(classes), dtype=np.int64)
+        scores = scores[:, class_ids]
+    else:
+        class_ids = None
+
+    best = scores.argmax(axis=1)
+    best_conf = scores[np.arange(len(scores)), best]
+    keep = best_conf >= conf
+    if not keep.any():
+        return _empty_arrays()
+
+    boxes = preds[keep, :4]
+    best_conf = best_conf[keep]
+    best = best[keep]
+    cls = class_ids[best] if class_ids is not None else best.astype(np.int64)
+
+    # cx, cy, w, h -> x1, y1, x2, y2 in letterboxed pixels
+    xyxy = np.empty_like(boxes)
+    xyxy[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+    xyxy[:, 2:] = boxes[:, :2] + boxes[:, 2:] / 2
+
+    # Class-aware NMS: offset boxes per class so different classes never overlap
+    offsets = cls[:, None].astype(np.float32) * 4096
+    nms_boxes = xyxy + offsets
+    nms_xywh = np.concatenate([nms_boxes[:, :2], nms_boxes[:, 2:] - nms_boxes[:, :2]], axis=1)
+    indices = cv2.dnn.NMSBoxes(nms_xywh.tolist(), best_conf.tolist(), conf, iou, top_k=max_det)
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1)[:max_det]
+
+    xyxy = xyxy[indices]
+    xyxy[:, [0, 2]] -= pad[0]
+    xyxy[:, [1, 3]] -= pad[1]
+    xyxy /= ratio
+    h, w = frame_shape[:2]
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+
+    return xyxy.astype(np.float32), best_conf[indices].astype(np.float32), cls[indices]
+
+
+class _OnnxGraphBackend:
+    """
+    Shared pre/post-processing for backends that run an exported ONNX graph.
+
+    Graphs exported with a fixed input size always run at that size; export
+    with dynamic=True to let predict() run smaller inputs (e.g. for crops).
+    """
+
+    name = None
+    dynamic_input = False
+
+    def __init__(self, model_path=DEFAULT_ONNX, class_names=None, imgsz=IMGSZ):
+        self.model_path = ensure_onnx(model_path)
+        self.class_names = class_names
+        self.imgsz = imgsz
+
+    def _forward(self, blob):
+        raise NotImplementedError
+
+    def predict(self, frame_bgr, conf=0.25, classes=None, imgsz=None):
+        """
+        Run detection on a frame.
+
+        Args:
+            frame_bgr: Input frame in BGR format
+            conf: Minimum confidence threshold
+            classes: Optional list of class ids to keep
+            imgsz: Optional network input size (ignored for fixed-size graphs)
+
+        Returns:
+            BackendResult: Detections for the frame
+        """
+        size = imgsz if imgsz and self.dynamic_input else self.imgsz
+        blob, ratio, pad = letterbox(frame_bgr, size)
+        output = self._forward(blob)
+        xyxy, scores, cls = postprocess(output, frame_bgr.shape, ratio, pad, conf, classes)
+        return BackendResult(frame_bgr, xyxy, scores, cls, self.class_names)
+
+
+class OnnxRuntimeBackend(_OnnxGraphBackend):
+    """Exported ONNX graph through ONNX Runtime's CPU execution provider."""
+
+    name = "onnxruntime"
+
+    def __init__(self, model_path=DEFAULT_ONNX, class_names=None, imgsz=IMGSZ, int8=False, calibration_dir=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("onnxruntime not installed. Run: pip install onnxruntime")
+        super().__init__(model_path, class_names, imgsz)
+
+        if int8:
+            self.name = "onnxruntime-int8"
+            self.model_path = ensure_int8_onnx(self.model_path, calibration_dir=calibration_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Dynamic axes show up as names instead of ints
+        self.dynamic_input = not all(isinstance(dim, int) for dim in model_input.shape[2:])
+
+    def _forward(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenCVDnnBackend(_OnnxGraphBackend):
+    """Exported ONNX graph through cv2.dnn (no extra dependencies)."""
+
+    name = "opencv-dnn"
+
+    def __init__(self, model_path=DEFAULT_ONNX, class_names=None, imgsz=IMGSZ):
+        super().__init__(model_path, class_names, imgsz)
+        self.net = cv2.dnn.readNetFromONNX(self.model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def _forward(self, blob):
+        self.net.setInput(blob)
+        return self.net.forward()
+
+
+class OpenVinoBackend(_OnnxGraphBackend):
+    """Exported ONNX graph through the OpenVINO runtime on CPU."""
+
+    name = "openvino"
+
+    def __init__(self, model_path=DEFAULT_ONNX, class_names=None, imgsz=IMGSZ):
+        try:
+            import openvino as ov
+        except ImportError:
+            raise ImportError("openvino not installed. Run: pip install openvino")
+        super().__init__(model_path, class_names, imgsz)
+        core = ov.Core()
+        self.compiled = core.compile_model(self.model_path, "CPU", {"PERFORMANCE_HINT": "LATENCY"})
+        self.output = self.compiled.output(0)
+        self.dynamic_input = self.compiled.input(0).get_partial_shape().is_dynamic
+
+    def _forward(self, blob):
+        return self.compiled(blob)[self.output]
+
+
+def ensure_onnx(model_path=DEFAULT_ONNX, weights=DEFAULT_WEIGHTS, imgsz=IMGSZ):
+    """
+    Make sure an exported ONNX graph exists, exporting it with ultralytics if not.
+
+    Export only needs ultralytics once (e.g. on a dev machine); copy the .onnx
+    file to field PCs so they never import PyTorch.
+
+    Args:
+        model_path: Path to the ONNX file
+        weights: PyTorch weights to export from if the file is missing
+        imgsz: Export input size
+
+    Returns:
+        str: Path to the ONNX file
+    """
+    if os.path.exists(model_path):
+        return model_path
+
+    try:
+        from ultralytics import YOLO
+    except ImportError:
+        raise FileNotFoundError(
+            f"{model_path} not found and ultralytics is not installed to export it. "
+            f"Export on another machine with: yolo export model={weights} format=onnx imgsz={imgsz}"
+        )
+
+    print(f"Exporting {weights} to ONNX...")
+    exported = YOLO(weights).export(format="onnx", imgsz=imgsz, opset=12)
+    if os.path.abspath(exported) != os.path.abspath(model_path):
+        os.replace(exported, model_path)
+    return model_path
+
+
+def int8_path(model_path):
+    """Path of the int8-quantized copy of an ONNX graph."""
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.int8{ext}"
+
+
+def ensure_int8_onnx(model_path=DEFAULT_ONNX, calibration_images=None, calibration_dir=None):
+    """
+    Make sure an int8-quantized copy of an ONNX graph exists.
+
+    Uses ONNX Runtime static quantization (QDQ format), calibrated on
+    representative frames so activations get sensible ranges. Warns when
+    there are fewer than MIN_CALIBRATION_IMAGES of them.
+
+    Args:
+        model_path: Path to the float ONNX file
+        calibration_images: List of image paths
+        calibration_dir: Directory of calibration frames, used when
+                         calibration_images is None (default:
+                         $AURA_YOLO_CALIB_DIR, else ultralytics' sample images)
+
+    Returns:
+        str: Path to the quantized ONNX file
+    """
+    quantized_path = int8_path(model_path)
+    if os.path.exists(quantized_path):
+        return quantized_path
+
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    images = calibration_images or sample_images(calibration_dir or os.environ.get(CALIB_DIR_ENV_VAR))
+    if not images:
+        raise FileNotFoundError("No calibration images found for int8 quantization")
+    if len(images) < MIN_CALIBRATION_IMAGES:
+        print(f"Warning: only {len(images)} int8 calibration images; the quantized model may lose accuracy. "
+              f"Point {CALIB_DIR_ENV_VAR} (or --calib-dir) at {MIN_CALIBRATION_IMAGES}+ representative camera frames")
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class _ImageReader(CalibrationDataReader):
+        def __init__(self):
+            self._blobs = iter([letterbox(cv2.imread(path))[0] for path in images])
+
+        def get_next(self):
+            blob = next(self._blobs, None)
+            return None if blob is None else {input_name: blob}
+
+    print(f"Quantizing {model_path} to int8 ({len(images)} calibration images)...")
+    quantize_static(
+        model_path, quantized_path, _ImageReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True
+    )
+    return quantized_path
+
+
+def sample_images(directory=None):
+    """
+    Get sample image paths for offline benchmarking and calibration.
+
+    Args:
+        directory: Image directory (default: images bundled with ultralytics)
+
+    Returns:
+        list: Sorted image paths
+    """
+    if directory is None:
+        try:
+            from ultralytics.utils import ASSETS
+            directory = str(ASSETS)
+        except ImportError:
+            return []
+
+    extensions = (".jpg", ".jpeg", ".png", ".bmp")
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(extensions)
+    )
+
+
+def load_backend(name=None, model_path=None, class_names=None, calibration_dir=None):
+    """
+    Create an inference backend.
+
+    Args:
+        name: Backend name from BACKENDS (default: $AURA_YOLO_BACKEND or "ultralytics")
+        model_path: Weights/graph path (default: $AURA_YOLO_MODEL or the backend's default)
+        class_names: Optional list of class names for plotting
+        calibration_dir: int8 calibration frames (see ensure_int8_onnx)
+
+    Returns:
+        Backend object with a predict(frame_bgr, conf, classes) method
+    """
+    name = (name or os.environ.get(BACKEND_ENV_VAR) or DEFAULT_BACKEND).lower()
+    model_path = model_path or os.environ.get(MODEL_ENV_VAR)
+
+    if name == "ultralytics":
+        return UltralyticsBackend(model_path or DEFAULT_WEIGHTS, class_names)
+    if name == "onnxruntime":
+        return OnnxRuntimeBackend(model_path or DEFAULT_ONNX, class_names)
+    if name == "onnxruntime-int8":
+        return OnnxRuntimeBackend(model_path or DEFAULT_ONNX, class_names, int8=True,
+                                  calibration_dir=calibration_dir)
+    if name == "opencv-dnn":
+        return OpenCVDnnBackend(model_path or DEFAULT_ONNX, class_names)
+    if name == "openvino":
+        return OpenVinoBackend(model_path or DEFAULT_ONNX, class_names)
+
+    raise ValueError(f"Unknown YOLO backend '{name}'. Choose from: {', '.join(BACKENDS)}")